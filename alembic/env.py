@@ -9,7 +9,7 @@ from app.config import get_settings
 from app.db.session import Base
 
 # Import all models so Alembic can detect them
-from app.models import user, wallet, transaction, referral, validator_key, protocol  # noqa: F401
+from app.models import user, wallet, transaction, posting, referral, validator_key, protocol  # noqa: F401
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
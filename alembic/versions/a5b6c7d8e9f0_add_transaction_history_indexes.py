@@ -0,0 +1,32 @@
+"""add (party, created_at, id) indexes for transaction history
+
+Revision ID: a5b6c7d8e9f0
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'a5b6c7d8e9f0'
+down_revision: Union[str, Sequence[str], None] = 'f4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_transactions_actor_created': 'actor_user_id',
+    'ix_transactions_from_created': 'from_user_id',
+    'ix_transactions_to_created': 'to_user_id',
+}
+
+
+def upgrade() -> None:
+    for name, col in INDEXES.items():
+        op.create_index(name, 'transactions', [col, 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name='transactions')
@@ -0,0 +1,66 @@
+"""add postings (double-entry ledger) with opening balances
+
+Revision ID: b6c7d8e9f0a1
+Revises: a5b6c7d8e9f0
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b6c7d8e9f0a1'
+down_revision: Union[str, Sequence[str], None] = 'a5b6c7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SHARD_KARMA = "COALESCE((SELECT SUM(s.karma_balance) FROM wallet_shards s WHERE s.wallet_id = w.id), 0)"
+
+# asset -> (wallet amount expression, running balance tracked for sharded wallets)
+OPENING = {
+    'KARMA': (f"w.karma_balance + {SHARD_KARMA}", False),
+    'STAKED': ("w.staked_amount", True),
+    'CHILIZ': ("w.chiliz_balance", True),
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        'postings',
+        sa.Column('seq', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('account_id', sa.UUID(), nullable=True),
+        sa.Column('tx_id', sa.UUID(), nullable=True),
+        sa.Column('asset', sa.Enum('KARMA', 'STAKED', 'CHILIZ', name='asset'), nullable=False),
+        sa.Column('amount', sa.BigInteger(), nullable=False),
+        sa.Column('balance', sa.BigInteger(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['account_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['tx_id'], ['transactions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('seq'),
+    )
+    op.create_index('ix_postings_account_asset_seq', 'postings', ['account_id', 'asset', 'seq'])
+    op.create_index(op.f('ix_postings_tx_id'), 'postings', ['tx_id'])
+
+    # The ledger starts from current balances: one opening posting per non-zero wallet
+    # balance, balanced by an issuance leg (account_id NULL)
+    for asset, (amount, tracked_when_sharded) in OPENING.items():
+        balance = "amount" if tracked_when_sharded else "CASE WHEN shard_count > 0 THEN NULL ELSE amount END"
+        op.execute(
+            "INSERT INTO postings (account_id, asset, amount, balance, created_at) "
+            f"SELECT user_id, '{asset}', amount, {balance}, CURRENT_TIMESTAMP FROM "
+            f"(SELECT w.user_id AS user_id, w.shard_count AS shard_count, {amount} AS amount FROM wallets w) o "
+            "WHERE amount <> 0"
+        )
+    op.execute(
+        "INSERT INTO postings (account_id, asset, amount, created_at) "
+        "SELECT NULL, asset, -amount, created_at FROM postings WHERE account_id IS NOT NULL ORDER BY seq"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_postings_tx_id'), table_name='postings')
+    op.drop_index('ix_postings_account_asset_seq', table_name='postings')
+    op.drop_table('postings')
+    sa.Enum(name='asset').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,143 @@
+"""monthly-partition transactions (Postgres), add transactions_archive
+
+Revision ID: c7d8e9f0a1b2
+Revises: b6c7d8e9f0a1
+Create Date: 2026-10-19
+
+On Postgres `transactions` is rebuilt as a table range-partitioned by month on
+created_at (primary key (id, created_at)), with one partition per month from
+the oldest row through PARTITIONS_AHEAD months ahead plus a default partition.
+The archival job creates later partitions. SQLite keeps one plain table.
+postings.tx_id stops being a foreign key so postings survive archival.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = 'c7d8e9f0a1b2'
+down_revision: Union[str, Sequence[str], None] = 'b6c7d8e9f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 3
+
+COLUMNS = (
+    'id', 'created_at', 'type', 'actor_user_id', 'from_user_id', 'to_user_id',
+    'amount_karma', 'amount_chiliz', 'metadata', 'block_id',
+)
+PARTY_INDEXES = {
+    'actor': 'actor_user_id',
+    'from': 'from_user_id',
+    'to': 'to_user_id',
+}
+SQLITE_NAMING = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _months(first: datetime, last: datetime):
+    month = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while month <= last:
+        following = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+        yield month, following
+        month = following
+
+
+def _create_transaction_indexes(table: str, prefix: str) -> None:
+    for name, col in PARTY_INDEXES.items():
+        op.create_index(f'ix_{prefix}_{name}_created', table, [col, 'created_at', 'id'])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+
+    op.create_table(
+        'transactions_archive',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('type', postgresql.ENUM(name='transactiontype', create_type=False) if postgres else sa.String(32), nullable=False),
+        sa.Column('actor_user_id', sa.UUID(), nullable=True),
+        sa.Column('from_user_id', sa.UUID(), nullable=True),
+        sa.Column('to_user_id', sa.UUID(), nullable=True),
+        sa.Column('amount_karma', sa.BigInteger(), nullable=True),
+        sa.Column('amount_chiliz', sa.BigInteger(), nullable=True),
+        sa.Column('metadata', sa.JSON(), nullable=True),
+        sa.Column('block_id', sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _create_transaction_indexes('transactions_archive', 'transactions_archive')
+    op.create_index('ix_transactions_archive_created', 'transactions_archive', ['created_at'])
+
+    if not postgres:
+        with op.batch_alter_table('postings', naming_convention=SQLITE_NAMING) as batch_op:
+            batch_op.drop_constraint('fk_postings_tx_id_transactions', type_='foreignkey')
+        return
+
+    op.drop_constraint('postings_tx_id_fkey', 'postings', type_='foreignkey')
+
+    op.execute("UPDATE transactions SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL")
+    op.execute("ALTER TABLE transactions RENAME TO transactions_unpartitioned")
+    for name in ('ix_transactions_type', 'ix_transactions_block_id', *(f'ix_transactions_{n}_created' for n in PARTY_INDEXES)):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute(
+        "CREATE TABLE transactions (LIKE transactions_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute("ALTER TABLE transactions ADD PRIMARY KEY (id, created_at)")
+    for col in ('actor_user_id', 'from_user_id', 'to_user_id'):
+        op.create_foreign_key(None, 'transactions', 'users', [col], ['id'], ondelete='SET NULL')
+    op.create_index('ix_transactions_type', 'transactions', ['type'])
+    op.create_index('ix_transactions_block_id', 'transactions', ['block_id'])
+    _create_transaction_indexes('transactions', 'transactions')
+
+    now = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    oldest = bind.execute(sa.text("SELECT min(created_at) FROM transactions_unpartitioned")).scalar() or now
+    ahead = now.month - 1 + PARTITIONS_AHEAD
+    last = now.replace(year=now.year + ahead // 12, month=ahead % 12 + 1)
+    for lower, upper in _months(oldest, last):
+        op.execute(
+            f"CREATE TABLE transactions_p{lower:%Y_%m} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+    op.execute("CREATE TABLE transactions_default PARTITION OF transactions DEFAULT")
+
+    column_list = ", ".join(f'"{c}"' for c in COLUMNS)
+    op.execute(f"INSERT INTO transactions ({column_list}) SELECT {column_list} FROM transactions_unpartitioned")
+    op.execute("DROP TABLE transactions_unpartitioned")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    postgres = bind.dialect.name == 'postgresql'
+    column_list = ", ".join(f'"{c}"' for c in COLUMNS)
+
+    if postgres:
+        # Back to one plain table holding live and archived rows
+        op.execute("ALTER TABLE transactions RENAME TO transactions_partitioned")
+        for name in ('ix_transactions_type', 'ix_transactions_block_id', *(f'ix_transactions_{n}_created' for n in PARTY_INDEXES)):
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute("CREATE TABLE transactions (LIKE transactions_partitioned INCLUDING DEFAULTS)")
+        op.execute("ALTER TABLE transactions ADD PRIMARY KEY (id)")
+        op.execute(f"INSERT INTO transactions ({column_list}) SELECT {column_list} FROM transactions_partitioned")
+        op.execute("DROP TABLE transactions_partitioned CASCADE")
+        for col in ('actor_user_id', 'from_user_id', 'to_user_id'):
+            op.create_foreign_key(None, 'transactions', 'users', [col], ['id'], ondelete='SET NULL')
+        op.create_index('ix_transactions_type', 'transactions', ['type'])
+        op.create_index('ix_transactions_block_id', 'transactions', ['block_id'])
+        _create_transaction_indexes('transactions', 'transactions')
+
+    op.execute(f"INSERT INTO transactions ({column_list}) SELECT {column_list} FROM transactions_archive")
+    op.drop_table('transactions_archive')
+
+    if postgres:
+        op.create_foreign_key(
+            'postings_tx_id_fkey', 'postings', 'transactions', ['tx_id'], ['id'], ondelete='CASCADE'
+        )
+    else:
+        with op.batch_alter_table('postings', naming_convention=SQLITE_NAMING) as batch_op:
+            batch_op.create_foreign_key(
+                'fk_postings_tx_id_transactions', 'transactions', ['tx_id'], ['id'], ondelete='CASCADE'
+            )
@@ -0,0 +1,54 @@
+"""username search index (pg_trgm GIN on Postgres, FTS5 shadow table on SQLite)
+
+Revision ID: d8e9f0a1b2c3
+Revises: c7d8e9f0a1b2
+Create Date: 2026-10-19
+
+Postgres gets a trigram GIN index on lower(username), which serves the
+autocomplete's substring LIKE. SQLite gets users_fts, an FTS5 table with the
+trigram tokenizer, backfilled here and kept in sync by triggers on users.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'd8e9f0a1b2c3'
+down_revision: Union[str, Sequence[str], None] = 'c7d8e9f0a1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_TRIGGERS = ('users_fts_insert', 'users_fts_update', 'users_fts_delete')
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops)")
+        return
+
+    op.execute("CREATE VIRTUAL TABLE users_fts USING fts5(username, user_id UNINDEXED, tokenize='trigram')")
+    op.execute("INSERT INTO users_fts (username, user_id) SELECT username, id FROM users")
+    op.execute(
+        "CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN "
+        "INSERT INTO users_fts (username, user_id) VALUES (new.username, new.id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_update AFTER UPDATE OF username ON users BEGIN "
+        "DELETE FROM users_fts WHERE user_id = old.id; "
+        "INSERT INTO users_fts (username, user_id) VALUES (new.username, new.id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN "
+        "DELETE FROM users_fts WHERE user_id = old.id; END"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_username_trgm")
+        return
+
+    for name in SQLITE_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS users_fts")
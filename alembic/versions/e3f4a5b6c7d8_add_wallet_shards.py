@@ -0,0 +1,41 @@
+"""add wallet_shards and wallets.shard_count for hot-wallet sharding
+
+Revision ID: e3f4a5b6c7d8
+Revises: d2e3f4a5b6c7
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e3f4a5b6c7d8'
+down_revision: Union[str, Sequence[str], None] = 'd2e3f4a5b6c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('wallets') as batch_op:
+        batch_op.add_column(sa.Column('shard_count', sa.Integer(), nullable=False, server_default='0'))
+    op.create_table(
+        'wallet_shards',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('wallet_id', sa.UUID(), nullable=False),
+        sa.Column('shard_no', sa.Integer(), nullable=False),
+        sa.Column('karma_balance', sa.Numeric(24, 6), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['wallet_id'], ['wallets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('wallet_id', 'shard_no', name='uq_wallet_shards_wallet_shard'),
+    )
+    op.create_index(op.f('ix_wallet_shards_wallet_id'), 'wallet_shards', ['wallet_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_wallet_shards_wallet_id'), table_name='wallet_shards')
+    op.drop_table('wallet_shards')
+    with op.batch_alter_table('wallets') as batch_op:
+        batch_op.drop_column('shard_count')
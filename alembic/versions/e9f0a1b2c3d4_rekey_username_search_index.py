@@ -0,0 +1,79 @@
+"""key the SQLite username search table by telegram_user_id
+
+Revision ID: e9f0a1b2c3d4
+Revises: d8e9f0a1b2c3
+Create Date: 2026-10-19
+
+users_fts carried users.id in an UNINDEXED column, so every trigger delete
+scanned the whole FTS table, and the update trigger fired even when the
+username did not change (every idempotent re-register). The table is rebuilt
+with users.telegram_user_id as its rowid, so trigger deletes are rowid
+lookups, and the update trigger gets a WHEN guard. Postgres is unaffected.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'e9f0a1b2c3d4'
+down_revision: Union[str, Sequence[str], None] = 'd8e9f0a1b2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SQLITE_TRIGGERS = ('users_fts_insert', 'users_fts_update', 'users_fts_delete')
+
+
+def _drop_sqlite_index() -> None:
+    for name in SQLITE_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS users_fts")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    _drop_sqlite_index()
+    op.execute("CREATE VIRTUAL TABLE users_fts USING fts5(username, tokenize='trigram')")
+    op.execute(
+        "INSERT INTO users_fts (rowid, username) "
+        "SELECT telegram_user_id, username FROM users WHERE telegram_user_id IS NOT NULL"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_insert AFTER INSERT ON users "
+        "WHEN new.telegram_user_id IS NOT NULL BEGIN "
+        "INSERT INTO users_fts (rowid, username) VALUES (new.telegram_user_id, new.username); END"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_update AFTER UPDATE OF username, telegram_user_id ON users "
+        "WHEN old.username IS NOT new.username OR old.telegram_user_id IS NOT new.telegram_user_id BEGIN "
+        "DELETE FROM users_fts WHERE rowid = old.telegram_user_id; "
+        "INSERT INTO users_fts (rowid, username) SELECT new.telegram_user_id, new.username "
+        "WHERE new.telegram_user_id IS NOT NULL; END"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN "
+        "DELETE FROM users_fts WHERE rowid = old.telegram_user_id; END"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    _drop_sqlite_index()
+    op.execute("CREATE VIRTUAL TABLE users_fts USING fts5(username, user_id UNINDEXED, tokenize='trigram')")
+    op.execute("INSERT INTO users_fts (username, user_id) SELECT username, id FROM users")
+    op.execute(
+        "CREATE TRIGGER users_fts_insert AFTER INSERT ON users BEGIN "
+        "INSERT INTO users_fts (username, user_id) VALUES (new.username, new.id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_update AFTER UPDATE OF username ON users BEGIN "
+        "DELETE FROM users_fts WHERE user_id = old.id; "
+        "INSERT INTO users_fts (username, user_id) VALUES (new.username, new.id); END"
+    )
+    op.execute(
+        "CREATE TRIGGER users_fts_delete AFTER DELETE ON users BEGIN "
+        "DELETE FROM users_fts WHERE user_id = old.id; END"
+    )
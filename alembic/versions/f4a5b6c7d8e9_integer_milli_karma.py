@@ -0,0 +1,60 @@
+"""store karma/chiliz amounts as BigInteger milli-units
+
+Revision ID: f4a5b6c7d8e9
+Revises: e3f4a5b6c7d8
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f4a5b6c7d8e9'
+down_revision: Union[str, Sequence[str], None] = 'e3f4a5b6c7d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MILLI = 1000
+
+AMOUNT_COLUMNS = {
+    'wallets': ('karma_balance', 'chiliz_balance', 'staked_amount', 'rewards_earned'),
+    'wallet_shards': ('karma_balance',),
+    'transactions': ('amount_karma', 'amount_chiliz'),
+    'protocol_state': ('deferred_rewards',),
+    'protocol_blocks': ('reward_total',),
+}
+
+
+def upgrade() -> None:
+    for table, columns in AMOUNT_COLUMNS.items():
+        # Scale while still numeric, so SQLite's batch copy (CAST AS BIGINT) does not truncate
+        op.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{col} = ROUND({col} * {MILLI})" for col in columns)
+        )
+        with op.batch_alter_table(table) as batch_op:
+            for col in columns:
+                batch_op.alter_column(
+                    col,
+                    existing_type=sa.Numeric(24, 6),
+                    type_=sa.BigInteger(),
+                    postgresql_using=f"{col}::bigint",
+                )
+
+
+def downgrade() -> None:
+    for table, columns in AMOUNT_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for col in columns:
+                batch_op.alter_column(
+                    col,
+                    existing_type=sa.BigInteger(),
+                    type_=sa.Numeric(24, 6),
+                    postgresql_using=f"{col}::numeric(24, 6)",
+                )
+        op.execute(
+            f"UPDATE {table} SET "
+            + ", ".join(f"{col} = {col} / {MILLI}.0" for col in columns)
+        )
@@ -1,15 +1,26 @@
 """Admin endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
 from app.core.audit import log_admin_action
+from app.core.auth import jwt_cache_stats
+from app.core.rate_limit import rate_limit_stats
 from app.core.dependencies import DbSession, require_admin
+from app.core.money import to_karma
 from app.schemas.user import CreateEventWalletRequest, UnregisterRequest, UserListResponse
 from app.schemas.validator import CreateValidatorKeyRequest, RevokeValidatorKeyRequest
-from app.schemas.wallet import MintRequest
+from app.schemas.wallet import AdminBatchSendRequest, BatchSendResponse, MintRequest, WalletShardsRequest
 from app.services.user_service import list_users, unregister_user_admin, create_event_wallet
-from app.services.wallet_service import mint_karma
+from app.services.wallet_service import mint_karma, send_karma_batch
+from app.services.wallet_shard_service import set_wallet_shards, total_shard_karma
+from app.services.archive_service import transaction_source
 from app.services.backup_service import export_backup, restore_backup
 from app.services.emission_service import run_emission_once
+from app.services.import_service import import_users_stream, iter_spooled, spool_body
+from app.services.ledger_service import verify_account
 from app.services.validator_key_service import create_validator_key, list_validator_keys, revoke_validator_key
 
 router = APIRouter(dependencies=[Depends(require_admin)])
@@ -28,31 +39,46 @@ def mint(db: DbSession, req: MintRequest):
     return {"message": result["message"]}
 
 
+@router.post("/send/batch", response_model=BatchSendResponse)
+def admin_send_batch(db: DbSession, req: AdminBatchSendRequest):
+    """Batch payout from any wallet (e.g. event wallet airdrop)."""
+    result = send_karma_batch(db, req)
+    if "error" in result:
+        raise HTTPException(
+            status_code=result.get("status", 400),
+            detail=result["error"],
+        )
+    log_admin_action("send_batch", {"sender_id": req.sender_id, "sent": result["sent"], "total_amount": result["total_amount"]})
+    return BatchSendResponse(**result)
+
+
 @router.get("/stats")
 def admin_stats(db: DbSession):
     """Full network stats (admin only)."""
     from sqlalchemy import func
-    from app.models import User, Wallet, Transaction
+    from app.models import User, Wallet
     from app.models.transaction import TransactionType
 
     user_count = db.query(User).filter(User.is_system_wallet == False).count()
+    # All-time totals: includes archived transactions
+    tx = transaction_source(db)
     total_minted = (
-        db.query(func.coalesce(func.sum(Transaction.amount_karma), 0))
-        .filter(Transaction.type == TransactionType.MINT)
+        db.query(func.coalesce(func.sum(tx.c.amount_karma), 0))
+        .filter(tx.c.type == TransactionType.MINT)
         .scalar()
         or 0
     )
     total_transferred = (
-        db.query(func.coalesce(func.sum(Transaction.amount_karma), 0))
-        .filter(Transaction.type == TransactionType.SEND)
+        db.query(func.coalesce(func.sum(tx.c.amount_karma), 0))
+        .filter(tx.c.type == TransactionType.SEND)
         .scalar()
         or 0
     )
-    tx_count = db.query(Transaction).filter(Transaction.type == TransactionType.SEND).count()
+    tx_count = db.query(func.count()).select_from(tx).filter(tx.c.type == TransactionType.SEND).scalar()
 
     total_karma = (
         db.query(func.coalesce(func.sum(Wallet.karma_balance), 0)).scalar() or 0
-    )
+    ) + total_shard_karma(db)
     total_chiliz = (
         db.query(func.coalesce(func.sum(Wallet.chiliz_balance), 0)).scalar() or 0
     )
@@ -65,16 +91,22 @@ def admin_stats(db: DbSession):
 
     return {
         "total_users": user_count,
-        "total_minted": float(total_minted),
-        "total_transferred": float(total_transferred),
+        "total_minted": to_karma(total_minted),
+        "total_transferred": to_karma(total_transferred),
         "total_transactions": tx_count,
-        "total_karma_supply": float(total_karma),
-        "total_chiliz_supply": float(total_chiliz),
-        "total_savings": float(total_staked),
-        "total_rewards_earned": float(total_rewards),
+        "total_karma_supply": to_karma(total_karma),
+        "total_chiliz_supply": to_karma(total_chiliz),
+        "total_savings": to_karma(total_staked),
+        "total_rewards_earned": to_karma(total_rewards),
     }
 
 
+@router.get("/metrics")
+def admin_metrics():
+    """Per-worker runtime counters (hot-path caches, rate limiter state)."""
+    return {"jwt_cache": jwt_cache_stats(), "rate_limit": rate_limit_stats()}
+
+
 @router.get("/users", response_model=UserListResponse)
 def admin_list_users(db: DbSession, limit: int = Query(50, ge=1, le=100), offset: int = Query(0, ge=0)):
     """List users (paginated)."""
@@ -82,6 +114,24 @@ def admin_list_users(db: DbSession, limit: int = Query(50, ge=1, le=100), offset
     return UserListResponse(users=users, total=total, limit=limit, offset=offset)
 
 
+@router.post("/users/import")
+async def admin_import_users(request: Request, format: Literal["ndjson", "csv"] = Query("ndjson")):
+    """
+    Bulk-import users from a streamed NDJSON or CSV body (user_id, username, optional
+    karma/staked/chiliz starting balances, invited_by, referral_rewarded). Idempotent on
+    user_id. Responds with NDJSON progress lines, one per chunk, then the final report.
+    """
+    body = await spool_body(request.stream())
+
+    async def progress():
+        async for report in import_users_stream(iter_spooled(body), format):
+            if report.get("done"):
+                log_admin_action("import_users", {k: v for k, v in report.items() if k != "errors"})
+            yield json.dumps(report) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
 @router.post("/event-wallets")
 def admin_create_event_wallet(db: DbSession, req: CreateEventWalletRequest):
     """Create an event wallet (special user type for distributions)."""
@@ -95,6 +145,19 @@ def admin_create_event_wallet(db: DbSession, req: CreateEventWalletRequest):
     return result
 
 
+@router.post("/wallets/shards")
+def admin_set_wallet_shards(db: DbSession, req: WalletShardsRequest):
+    """Spread a hot system/event wallet's balance over N shard rows (0 folds them back)."""
+    result = set_wallet_shards(db, int(req.user_id), req.shards)
+    if "error" in result:
+        raise HTTPException(
+            status_code=result.get("status", 400),
+            detail=result["error"],
+        )
+    log_admin_action("set_wallet_shards", {"user_id": req.user_id, "shards": req.shards})
+    return result
+
+
 @router.post("/validator-keys")
 def admin_create_validator_key(db: DbSession, req: CreateValidatorKeyRequest):
     """Create validator API key. Returns plaintext once - save it securely."""
@@ -136,6 +199,18 @@ def admin_restore(db: DbSession, data: dict):
     return result
 
 
+@router.get("/ledger/verify")
+def admin_verify_ledger(db: DbSession, user_id: str = Query(..., pattern=r"^-?\d+$")):
+    """Reconcile a wallet against its postings (totals and latest running balance)."""
+    result = verify_account(db, int(user_id))
+    if "error" in result:
+        raise HTTPException(
+            status_code=result.get("status", 400),
+            detail=result["error"],
+        )
+    return result
+
+
 @router.post("/protocol/run-once")
 def admin_protocol_run_once(db: DbSession):
     """Run protocol emission once (manual trigger)."""
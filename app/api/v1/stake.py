@@ -1,9 +1,9 @@
 """Stake and unstake endpoints."""
 from fastapi import APIRouter, Depends, HTTPException, Path
 
-from app.core.dependencies import DbSession, get_current_user, require_user_match
+from app.core.dependencies import AsyncDbSession, get_current_user, require_user_match
 from app.schemas.wallet import StakeRequest, UnstakeRequest, StakeInfoResponse
-from app.services.wallet_service import stake_karma, unstake_karma, get_stake_info
+from app.services.wallet_service import stake_karma_async, unstake_karma_async, get_stake_info_async
 
 router = APIRouter()
 
@@ -11,10 +11,10 @@ _USER_ID_PATH = Path(..., pattern=r"^\d+$", description="Telegram user ID")
 
 
 @router.post("/stake")
-def stake(db: DbSession, req: StakeRequest, current_user: dict = Depends(get_current_user)):
+async def stake(db: AsyncDbSession, req: StakeRequest, current_user: dict = Depends(get_current_user)):
     """Stake Karma from liquid balance."""
     require_user_match(req.user_id, current_user)
-    result = stake_karma(db, req.user_id, req.amount)
+    result = await stake_karma_async(db, req.user_id, req.amount)
     if "error" in result:
         raise HTTPException(
             status_code=result.get("status", 400),
@@ -24,10 +24,10 @@ def stake(db: DbSession, req: StakeRequest, current_user: dict = Depends(get_cur
 
 
 @router.post("/unstake")
-def unstake(db: DbSession, req: UnstakeRequest, current_user: dict = Depends(get_current_user)):
+async def unstake(db: AsyncDbSession, req: UnstakeRequest, current_user: dict = Depends(get_current_user)):
     """Unstake Karma back to liquid balance."""
     require_user_match(req.user_id, current_user)
-    result = unstake_karma(db, req.user_id, req.amount)
+    result = await unstake_karma_async(db, req.user_id, req.amount)
     if "error" in result:
         raise HTTPException(
             status_code=result.get("status", 400),
@@ -37,10 +37,10 @@ def unstake(db: DbSession, req: UnstakeRequest, current_user: dict = Depends(get
 
 
 @router.get("/stake/info/{user_id}", response_model=StakeInfoResponse)
-def stake_info(db: DbSession, user_id: str = _USER_ID_PATH, current_user: dict = Depends(get_current_user)):
+async def stake_info(db: AsyncDbSession, user_id: str = _USER_ID_PATH, current_user: dict = Depends(get_current_user)):
     """Get stake info for user."""
     require_user_match(user_id, current_user)
-    data = get_stake_info(db, user_id)
+    data = await get_stake_info_async(db, user_id, own=bool(current_user.get("sub")))
     if not data:
         raise HTTPException(status_code=404, detail="User not found")
     return StakeInfoResponse(**data)
@@ -1,38 +1,50 @@
 """Public stats endpoint."""
 from fastapi import APIRouter
 from sqlalchemy import func
+from sqlalchemy.orm import Session
 
-from app.core.dependencies import DbSession
-from app.models import User, Wallet, Transaction
+from app.core.dependencies import AsyncDbSession
+from app.core.money import to_karma
+from app.core.single_flight import single_flight
+from app.models import User, Wallet
 from app.models.transaction import TransactionType
+from app.services.archive_service import transaction_source
 from app.services.emission_service import BUCKET_FOUNDATION
+from app.services.wallet_shard_service import available_karma, total_shard_karma
 
 router = APIRouter()
 
 
 @router.get("/stats")
-def public_stats(db: DbSession):
+@single_flight("/v1/stats")
+async def public_stats(db: AsyncDbSession):
     """Public network stats (no auth required)."""
+    return await db.run_sync(_collect_stats)
+
+
+def _collect_stats(db: Session) -> dict:
     from app.models.protocol import ProtocolBlock
 
     user_count = db.query(User).filter(User.is_system_wallet == False).count()
+    # All-time totals: includes archived transactions
+    tx = transaction_source(db)
     total_minted = (
-        db.query(func.coalesce(func.sum(Transaction.amount_karma), 0))
-        .filter(Transaction.type == TransactionType.MINT)
+        db.query(func.coalesce(func.sum(tx.c.amount_karma), 0))
+        .filter(tx.c.type == TransactionType.MINT)
         .scalar()
         or 0
     )
     total_transferred = (
-        db.query(func.coalesce(func.sum(Transaction.amount_karma), 0))
-        .filter(Transaction.type == TransactionType.SEND)
+        db.query(func.coalesce(func.sum(tx.c.amount_karma), 0))
+        .filter(tx.c.type == TransactionType.SEND)
         .scalar()
         or 0
     )
-    tx_count = db.query(Transaction).filter(Transaction.type == TransactionType.SEND).count()
+    tx_count = db.query(func.count()).select_from(tx).filter(tx.c.type == TransactionType.SEND).scalar()
 
     total_karma = (
         db.query(func.coalesce(func.sum(Wallet.karma_balance), 0)).scalar() or 0
-    )
+    ) + total_shard_karma(db)
     total_staked = (
         db.query(func.coalesce(func.sum(Wallet.staked_amount), 0)).scalar() or 0
     )
@@ -51,18 +63,18 @@ def public_stats(db: DbSession):
     if foundation_user:
         w = db.query(Wallet).filter(Wallet.user_id == foundation_user.id).first()
         if w:
-            foundation_balance = float(w.karma_balance)
+            foundation_balance = to_karma(available_karma(db, w))
 
     return {
         "network_status": "operational",
         "users": user_count,
         "transactions": tx_count,
-        "minted": float(total_minted),
-        "transferred": float(total_transferred),
-        "total_in_circulation": float(total_karma) + float(total_staked) + float(total_rewards),
-        "available": float(total_karma),
-        "savings": float(total_staked),
-        "rewards_earned": float(total_rewards),
+        "minted": to_karma(total_minted),
+        "transferred": to_karma(total_transferred),
+        "total_in_circulation": to_karma(total_karma + total_staked + total_rewards),
+        "available": to_karma(total_karma),
+        "savings": to_karma(total_staked),
+        "rewards_earned": to_karma(total_rewards),
         "last_block_id": last_block_id,
         "last_block_at": last_block_at,
         "foundation_balance": foundation_balance,
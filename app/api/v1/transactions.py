@@ -1,34 +1,82 @@
 """Transaction history endpoints."""
 from typing import Literal
 
-from fastapi import APIRouter, Depends, Path, Query
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
 
-from app.core.dependencies import DbSession, get_current_user, require_user_match
+from app.config import get_settings
+from app.core.dependencies import AsyncDbSession, get_current_user, require_user_match
 from app.schemas.transaction import TransactionListResponse
-from app.services.transaction_service import get_user_transactions
+from app.services.transaction_service import (
+    decode_cursor,
+    export_user_transactions,
+    get_user_transactions_async,
+)
+from app.services.user_service import get_user_by_telegram_id_async
 
 router = APIRouter()
 
 _USER_ID_PATH = Path(..., pattern=r"^\d+$", description="Telegram user ID")
 
 
+_EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@router.get("/transactions/export")
+async def export_transactions(
+    db: AsyncDbSession,
+    user_id: str = Query(..., pattern=r"^\d+$", description="Telegram user ID"),
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    sort: Literal["asc", "desc"] = Query("desc"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Stream a user's entire transaction history (live and archived) as CSV or NDJSON. No total."""
+    require_user_match(user_id, current_user)
+    if not await get_user_by_telegram_id_async(db, int(user_id)):
+        raise HTTPException(status_code=404, detail="User not found")
+    # Sync generator: Starlette iterates it in the threadpool, on the export's own session
+    chunks = export_user_transactions(
+        int(user_id), format, sort, get_settings().transaction_export_batch_size
+    )
+    return StreamingResponse(
+        chunks,
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions_{user_id}.{format}"'},
+    )
+
+
 @router.get("/transactions", response_model=TransactionListResponse)
-def list_transactions(
-    db: DbSession,
+async def list_transactions(
+    db: AsyncDbSession,
     user_id: str = Query(..., pattern=r"^\d+$", description="Telegram user ID"),
     limit: int = Query(50, ge=1, le=100),
     offset: int = Query(0, ge=0),
     sort: Literal["asc", "desc"] = Query("desc"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page (offset is ignored)"),
+    include_total: bool | None = Query(None, description="Count all matching rows (default: first page only)"),
     current_user: dict = Depends(get_current_user),
 ):
-    """Paginated transaction history for a user."""
+    """Paginated transaction history for a user. Follow next_cursor for constant-cost deep pages."""
     require_user_match(user_id, current_user)
-    transactions, total = get_user_transactions(
-        db, int(user_id), limit=limit, offset=offset, sort=sort
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if include_total is None:
+        include_total = after is None
+    transactions, total, next_cursor = await get_user_transactions_async(
+        db,
+        int(user_id),
+        limit=limit,
+        offset=offset,
+        sort=sort,
+        cursor=after,
+        include_total=include_total,
     )
     return TransactionListResponse(
         transactions=transactions,
         total=total,
         limit=limit,
-        offset=offset,
+        offset=0 if after else offset,
+        next_cursor=next_cursor,
     )
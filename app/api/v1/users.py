@@ -2,9 +2,15 @@
 from fastapi import APIRouter, Body, Depends, HTTPException, Path, Query, status
 
 from app.config import get_settings
-from app.core.dependencies import DbSession, get_current_user
+from app.core.dependencies import AsyncDbSession, DbSession, get_current_user
 from app.schemas.user import RegisterRequest, RegisterResponse, BalanceResponse, SelfUnregisterRequest
-from app.services.user_service import register_user, get_wallet_balance, unregister_user_admin, search_users, get_user_by_telegram_id
+from app.services.user_service import (
+    get_profile_async,
+    get_wallet_balance_async,
+    register_user,
+    search_users,
+    unregister_user_admin,
+)
 
 router = APIRouter()
 
@@ -12,7 +18,7 @@ _USER_ID_PATH = Path(..., pattern=r"^\d+$", description="Telegram user ID")
 
 
 @router.get("/me")
-def users_me(db: DbSession, current_user: dict = Depends(get_current_user)):
+async def users_me(db: AsyncDbSession, current_user: dict = Depends(get_current_user)):
     """
     Get current user profile and balance (requires JWT).
     Returns user_id, username, balance, staked, rewards, chiliz, created_at.
@@ -23,26 +29,19 @@ def users_me(db: DbSession, current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentication required")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_id required")
-    user = get_user_by_telegram_id(db, int(user_id))
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    data = get_wallet_balance(db, int(user_id))
+    data = await get_profile_async(db, int(user_id))
     if not data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return {
-        "user_id": str(user_id),
-        "username": user.username or "",
-        **data,
-    }
+    return data
 
 
 @router.post("/register", response_model=RegisterResponse)
 def register(db: DbSession, req: RegisterRequest):
     """Register a new user (idempotent)."""
-    _, _, created = register_user(db, req)
+    registration = register_user(db, req)
     return RegisterResponse(
         message=f"User {req.username} registered",
-        status="created" if created else "exists",
+        status="created" if registration.created else "exists",
     )
 
 
@@ -75,11 +74,12 @@ def user_search(db: DbSession, q: str = Query(..., min_length=2), current_user:
 
 
 @router.get("/balance/{user_id}", response_model=BalanceResponse)
-def balance(db: DbSession, user_id: str = _USER_ID_PATH, current_user: dict = Depends(get_current_user)):
+async def balance(db: AsyncDbSession, user_id: str = _USER_ID_PATH, current_user: dict = Depends(get_current_user)):
     """Get user balance. When JWT required, user_id must match token."""
     if current_user.get("sub") and str(current_user["sub"]) != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot access another user's balance")
-    data = get_wallet_balance(db, int(user_id))
+    own = bool(current_user.get("sub"))  # checked to match user_id above
+    data = await get_wallet_balance_async(db, int(user_id), own=own)
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -6,6 +6,8 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy import text
 
 from app.core.dependencies import DbSession, require_validator
+from app.core.single_flight import single_flight
+from app.services.ledger_service import get_postings
 from app.services.validator_service import (
     get_validator_snapshot,
     get_inflation_only,
@@ -38,6 +40,7 @@ def validator_health(db: DbSession):
 
 
 @router.get("/snapshot", dependencies=[Depends(require_validator)])
+@single_flight("/v1/validator/snapshot")
 def validator_snapshot(
     db: DbSession,
     include_top: Literal["10", "25", "50", "100"] = Query("10", alias="include_top"),
@@ -47,12 +50,14 @@ def validator_snapshot(
 
 
 @router.get("/inflation", dependencies=[Depends(require_validator)])
+@single_flight("/v1/validator/inflation")
 def validator_inflation(db: DbSession):
     """Inflation data only (Karma minted in 1h/24h/7d/30d windows)."""
     return get_inflation_only(db)
 
 
 @router.get("/leaderboard", dependencies=[Depends(require_validator)])
+@single_flight("/v1/validator/leaderboard")
 def validator_leaderboard(
     db: DbSession,
     limit: Literal["10", "25", "50", "100"] = Query("10"),
@@ -63,6 +68,18 @@ def validator_leaderboard(
 
 
 @router.get("/transactions", dependencies=[Depends(require_validator)])
+@single_flight("/v1/validator/transactions")
 def validator_transactions(db: DbSession):
     """Transaction metrics (count, volume) for 24h/7d/30d."""
     return get_transactions_only(db)
+
+
+@router.get("/postings", dependencies=[Depends(require_validator)])
+def validator_postings(
+    db: DbSession,
+    after_seq: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+):
+    """Ledger postings in seq order for reconciliation; resume from next_after_seq."""
+    postings, next_after_seq = get_postings(db, after_seq=after_seq, limit=limit)
+    return {"postings": postings, "next_after_seq": next_after_seq}
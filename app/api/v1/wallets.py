@@ -1,18 +1,25 @@
 """Wallet and transfer endpoints."""
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException
 
-from app.core.dependencies import DbSession, get_current_user, require_user_match
-from app.schemas.wallet import SendRequest, SendResponse, SwapRequest
-from app.services.wallet_service import send_karma, swap_karma_chiliz
+from app.core.dependencies import AsyncDbSession, DbSession, get_current_user, require_user_match
+from app.schemas.wallet import BatchSendRequest, BatchSendResponse, SendRequest, SendResponse, SwapRequest
+from app.services.transfer_pipeline import get_transfer_pipeline
+from app.services.wallet_service import send_karma_async, send_karma_batch, swap_karma_chiliz
 
 router = APIRouter()
 
 
 @router.post("/send", response_model=SendResponse)
-def send(db: DbSession, req: SendRequest, current_user: dict = Depends(get_current_user)):
+async def send(db: AsyncDbSession, req: SendRequest, current_user: dict = Depends(get_current_user)):
     """Send Karma from sender to recipient."""
     require_user_match(req.sender_id, current_user)
-    result = send_karma(db, req)
+    pipeline = get_transfer_pipeline()
+    if pipeline:
+        result = await asyncio.wrap_future(pipeline.submit(req))
+    else:
+        result = await send_karma_async(db, req)
     if "error" in result:
         raise HTTPException(
             status_code=result.get("status", 400),
@@ -21,6 +28,19 @@ def send(db: DbSession, req: SendRequest, current_user: dict = Depends(get_curre
     return SendResponse(message=result["message"])
 
 
+@router.post("/send/batch", response_model=BatchSendResponse)
+def send_batch(db: DbSession, req: BatchSendRequest, current_user: dict = Depends(get_current_user)):
+    """Send Karma to many recipients in one transaction. Failed entries are listed, not applied."""
+    require_user_match(req.sender_id, current_user)
+    result = send_karma_batch(db, req)
+    if "error" in result:
+        raise HTTPException(
+            status_code=result.get("status", 400),
+            detail=result["error"],
+        )
+    return BatchSendResponse(**result)
+
+
 @router.post("/swap")
 def swap(db: DbSession, req: SwapRequest, current_user: dict = Depends(get_current_user)):
     """Swap Karma ↔ Chiliz 1:1."""
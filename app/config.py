@@ -22,6 +22,8 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_expire_minutes: int = 60
     jwt_required: bool = True  # Set False for testing / backward compat
+    # Verified tokens kept (until their exp) so each is decoded once per worker; 0 disables
+    jwt_cache_size: int = 10_000
 
     # Telegram
     telegram_bot_token: Optional[str] = None
@@ -49,6 +51,66 @@ class Settings(BaseSettings):
     rate_limit_admin: int = 100
     rate_limit_validator: int = 300
     rate_limit_public: int = 120
+    # In-memory limiter: at most RATE_LIMIT_MAX_KEYS client keys per worker (least recently
+    # seen dropped first); idle keys are swept every RATE_LIMIT_SWEEP_INTERVAL_SECONDS (0 disables)
+    rate_limit_max_keys: int = 100_000
+    rate_limit_sweep_interval_seconds: int = 60
+    # With REDIS_URL, workers admit locally and push counts to Redis every
+    # RATE_LIMIT_SYNC_INTERVAL_MS, or once a key has RATE_LIMIT_SYNC_TOKENS unsent admissions
+    rate_limit_sync_interval_ms: int = 100
+    rate_limit_sync_tokens: int = 20
+
+    # Optimistic wallet updates: attempts per mutation before answering 409 "busy"
+    wallet_update_retries: int = 5
+    # Base delay before the first retry (doubles per retry, full jitter)
+    wallet_retry_backoff_ms: float = 5
+    # Lock debited (unsharded) wallet rows (SELECT ... FOR UPDATE) in mutations; credits are
+    # never locked. Ignored on SQLite
+    wallet_row_locks: bool = True
+
+    # Hot-wallet sharding: shard rows per bucket (devco/validators/foundation) and new event
+    # wallets (0 = off); shard balances are folded back into the wallet row on an interval
+    bucket_wallet_shards: int = 0
+    event_wallet_shards: int = 0
+    shard_consolidation_interval_seconds: int = 60
+
+    # Coalesce concurrent identical GETs on expensive aggregate routes (stats, validator)
+    single_flight_enabled: bool = True
+
+    # Group-commit transfer pipeline: sends are applied in micro-batches, one commit per batch
+    transfer_pipeline_enabled: bool = False
+    transfer_pipeline_max_batch: int = 200
+    transfer_pipeline_max_wait_ms: float = 5
+
+    # Cold transactions: months kept in the live table before the archival job moves
+    # them to transactions_archive (0 disables); Postgres monthly partitions created ahead
+    transaction_archive_after_months: int = 0
+    transaction_partitions_ahead: int = 3
+    transaction_archive_interval_seconds: int = 86400
+
+    # Rows per keyset batch when streaming a history export
+    transaction_export_batch_size: int = 500
+
+    # Process-wide LRU of user UUID -> telegram id (history, leaderboard); 0 disables
+    telegram_id_cache_size: int = 100_000
+
+    # Telegram id -> (user, wallet, flags) identity cache: in-process LRU whose entries
+    # live IDENTITY_CACHE_TTL_SECONDS, shared through Redis (REDIS_URL) when configured
+    identity_cache_size: int = 100_000
+    identity_cache_ttl_seconds: int = 60
+    identity_cache_redis_ttl_seconds: int = 86400
+
+    # Balance cache for balance/me/stake-info reads, written through by wallet mutations on
+    # commit; other entries live BALANCE_CACHE_TTL_SECONDS (0 disables). Redis tier via REDIS_URL
+    balance_cache_size: int = 100_000
+    balance_cache_ttl_seconds: int = 5
+
+    # Active validator key hashes are held in memory; workers re-check the key-set version
+    # every VALIDATOR_KEYS_REFRESH_SECONDS (changes also arrive via Redis when configured)
+    validator_keys_refresh_seconds: float = 5.0
+
+    # Admin bulk user import: records per bulk-insert chunk (one DB transaction each)
+    user_import_chunk_size: int = 5000
 
     # Protocol (from PRD)
     protocol_interval_seconds: int = 600
@@ -62,6 +124,17 @@ class Settings(BaseSettings):
         """True if using SQLite (local dev)."""
         return "sqlite" in self.database_url
 
+    @property
+    def async_database_url(self) -> str:
+        """database_url with its async driver (aiosqlite for SQLite, asyncpg for Postgres)."""
+        url = self.database_url
+        scheme, sep, rest = url.partition("://")
+        if scheme.startswith("sqlite"):
+            return f"sqlite+aiosqlite{sep}{rest}"
+        if scheme.startswith(("postgresql", "postgres")):
+            return f"postgresql+asyncpg{sep}{rest}"
+        return url
+
     @property
     def cors_origins_list(self) -> list[str]:
         """List of allowed CORS origins. Empty means allow all (*)."""
@@ -6,6 +6,12 @@ from urllib.parse import parse_qs, unquote
 
 from jose import JWTError, jwt
 
+from app.config import get_settings
+from app.core.cache import LRUCache
+
+# sha256(secret fingerprint + token) -> (payload, exp) of tokens that passed verification
+jwt_cache = LRUCache(get_settings().jwt_cache_size)
+
 
 def validate_telegram_init_data(init_data: str, bot_token: str, max_age_seconds: int = 86400) -> dict | None:
     """
@@ -74,3 +80,39 @@ def decode_jwt(token: str, secret: str, algorithm: str) -> dict | None:
         return jwt.decode(token, secret, algorithms=[algorithm])
     except JWTError:
         return None
+
+
+def _secret_fingerprint(secret: str, algorithm: str) -> bytes:
+    return hashlib.sha256(f"{algorithm}:{secret}".encode()).digest()
+
+
+def verify_jwt(token: str, secret: str, algorithm: str) -> dict | None:
+    """
+    decode_jwt through jwt_cache. Verified payloads are reused until the token's exp.
+    Keys include a fingerprint of secret and algorithm, so tokens verified under a
+    rotated secret miss and are verified again. Rejected tokens and tokens without
+    exp are not cached.
+    """
+    key = hashlib.sha256(_secret_fingerprint(secret, algorithm) + token.encode()).digest()
+    entry = jwt_cache.get(key)
+    if entry is not None:
+        payload, exp = entry
+        if time.time() < exp:
+            return dict(payload)
+        jwt_cache.delete(key)
+    payload = decode_jwt(token, secret, algorithm)
+    if payload is not None and isinstance(payload.get("exp"), (int, float)):
+        jwt_cache.put(key, (payload, payload["exp"]))
+        return dict(payload)
+    return payload
+
+
+def jwt_cache_stats() -> dict:
+    """Size and hit counters of the JWT verification cache."""
+    lookups = jwt_cache.hits + jwt_cache.misses
+    return {
+        "size": len(jwt_cache),
+        "hits": jwt_cache.hits,
+        "misses": jwt_cache.misses,
+        "hit_rate": round(jwt_cache.hits / lookups, 4) if lookups else None,
+    }
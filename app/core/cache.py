@@ -0,0 +1,315 @@
+"""Bounded in-process caches.
+
+LRUCache is for mappings that never change once assigned (e.g. user UUID ->
+telegram id), so entries are only evicted least-recently-used first, or for
+mappings that change rarely, with a ttl bounding how long a stale entry lives
+and explicit delete() on the writes that change them.
+
+TieredCache puts an LRUCache in front of an optional shared Redis tier, so
+workers share warm entries and invalidations. Redis errors fall back to the
+local tier only.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+# Compare-and-set attempts against concurrent Redis writers
+_CAS_ATTEMPTS = 3
+# Redis writes queued per TieredCache; beyond this writers apply their own (back-pressure)
+_WRITE_QUEUE_SIZE = 10_000
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # Redis tier unused without the client
+    class WatchError(Exception):
+        pass
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache holding at most maxsize entries (0 disables caching).
+    With ttl (seconds), entries also expire that long after they were put.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = max(0, maxsize)
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Hashable, now: float) -> Any:
+        """Entry for key, refreshed as most recently used, or _MISSING. Caller holds the lock."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return _MISSING
+        value, expires = entry
+        if expires is not None and expires <= now:
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key, monotonic())
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> tuple[dict, list]:
+        """Look up several keys under one lock. Returns (found, missing keys)."""
+        found, missing = {}, []
+        now = monotonic()
+        with self._lock:
+            for key in keys:
+                value = self._lookup(key, now)
+                if value is _MISSING:
+                    missing.append(key)
+                else:
+                    found[key] = value
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, items: dict) -> None:
+        if not self.maxsize:
+            return
+        expires = monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def put_if(self, key: Hashable, value: Any, replace: Callable[[Any], bool]) -> bool:
+        """Put value unless key holds a live entry for which replace(entry) is false. Returns whether it was put."""
+        if not self.maxsize:
+            return False
+        with self._lock:
+            current = self._lookup(key, monotonic())
+            if current is not _MISSING and not replace(current):
+                return False
+            self._data[key] = (value, monotonic() + self.ttl if self.ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+    def delete(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key, monotonic()) is not _MISSING
+
+
+def _on_event_loop() -> bool:
+    """True on a thread running an asyncio loop, including code under AsyncSession.run_sync."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class TieredCache:
+    """
+    LRUCache backed by Redis (when redis_url is set). Values are stored in Redis as
+    dumps(value) under prefix + str(key) for redis_ttl seconds and decoded with loads.
+
+    Nothing on an event loop waits on Redis. Writes update the local tier inline and
+    reach Redis in order through a background writer thread. Reads on an event loop
+    thread use the local tier only, so async callers warm it with `await prefetch(...)`
+    first. Keys with a queued write are served locally, so this worker reads its own writes.
+    """
+
+    def __init__(
+        self,
+        local: LRUCache,
+        redis_url: str | None = None,
+        prefix: str = "",
+        redis_ttl: int = 86400,
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ):
+        self.local = local
+        self.prefix = prefix
+        self.redis_ttl = redis_ttl
+        self._dumps = dumps
+        self._loads = loads
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning("Redis unavailable (%s), %scache is in-process only", e, prefix)
+        self._queue: queue.Queue = queue.Queue(_WRITE_QUEUE_SIZE)
+        self._writer: threading.Thread | None = None
+        self._queued: dict[Hashable, int] = {}  # key -> Redis writes not yet applied
+        self._queued_lock = threading.Lock()
+
+    def _shared(self, key: Hashable) -> bool:
+        """Whether a read of key may go to Redis from here."""
+        return self._redis is not None and key not in self._queued and not _on_event_loop()
+
+    def get(self, key: Hashable, default: Any = None, shared_first: bool = False) -> Any:
+        """Local tier, then Redis. shared_first reads Redis first (when configured) for the freshest entry."""
+        shared = self._shared(key)
+        if not (shared_first and shared):
+            value = self.local.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        if not shared:
+            return default
+        try:
+            raw = self._redis.get(f"{self.prefix}{key}")
+        except Exception as e:
+            logger.warning("Redis cache read failed (%s)", e)
+            return default
+        if raw is None:
+            return default
+        value = self._loads(raw)
+        self.local.put(key, value)
+        return value
+
+    async def prefetch(self, keys: Iterable[Hashable], shared_first: bool = False) -> None:
+        """
+        Copy keys from Redis into the local tier with one MGET in a worker thread, for async
+        callers about to read them on the loop. Without shared_first only local misses are
+        fetched; with it Redis wins, and a key missing there is dropped locally too.
+        """
+        if self._redis is None:
+            return
+        wanted = [k for k in keys if k not in self._queued and (shared_first or k not in self.local)]
+        if not wanted:
+            return
+        try:
+            raws = await asyncio.to_thread(self._redis.mget, [f"{self.prefix}{k}" for k in wanted])
+        except Exception as e:
+            logger.warning("Redis cache read failed (%s)", e)
+            return
+        for key, raw in zip(wanted, raws):
+            if key in self._queued:
+                continue  # written meanwhile; the local entry is newer
+            if raw is not None:
+                self.local.put(key, self._loads(raw))
+            elif shared_first:
+                self.local.delete(key)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.local.put(key, value)
+        if self._redis is not None:
+            name, raw = f"{self.prefix}{key}", self._dumps(value)
+            self._enqueue((key,), lambda: self._redis.set(name, raw, ex=self.redis_ttl))
+
+    def put_if(self, key: Hashable, value: Any, replace: Callable[[Any], bool]) -> bool:
+        """
+        Compare-and-set put: value is stored unless the entry there makes replace(entry)
+        false. Returns the local tier's outcome. Redis applies the same test to its own
+        entry in a WATCH/MULTI transaction (retried when another writer gets in between)
+        on the writer thread.
+        """
+        stored = self.local.put_if(key, value, replace)
+        if self._redis is not None:
+            name, raw = f"{self.prefix}{key}", self._dumps(value)
+            self._enqueue((key,), lambda: self._redis_put_if(name, raw, replace))
+        return stored
+
+    def _redis_put_if(self, name: str, raw: str, replace: Callable[[Any], bool]) -> None:
+        with self._redis.pipeline() as pipe:
+            for _ in range(_CAS_ATTEMPTS):
+                try:
+                    pipe.watch(name)
+                    current = pipe.get(name)
+                    if current is not None and not replace(self._loads(current)):
+                        pipe.unwatch()
+                        return
+                    pipe.multi()
+                    pipe.set(name, raw, ex=self.redis_ttl)
+                    pipe.execute()
+                    return
+                except WatchError:
+                    continue
+
+    def delete(self, *keys: Hashable) -> None:
+        self.local.delete(*keys)
+        if self._redis is not None and keys:
+            names = [f"{self.prefix}{key}" for key in keys]
+            self._enqueue(keys, lambda: self._redis.delete(*names))
+
+    def clear(self) -> None:
+        """Drop every entry, in Redis too (all keys under prefix)."""
+        self.local.clear()
+        if self._redis is not None:
+            self._enqueue((), self._redis_clear)
+
+    def _redis_clear(self) -> None:
+        keys = list(self._redis.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self._redis.delete(*keys)
+
+    def flush(self) -> None:
+        """Block until every queued Redis write has been applied."""
+        self._queue.join()
+
+    def _enqueue(self, keys: tuple, write: Callable[[], Any]) -> None:
+        with self._queued_lock:
+            for key in keys:
+                self._queued[key] = self._queued.get(key, 0) + 1
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name=f"{self.prefix}redis-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait((keys, write))
+        except queue.Full:
+            self._apply(keys, write)
+
+    def _apply(self, keys: tuple, write: Callable[[], Any]) -> None:
+        try:
+            write()
+        except Exception as e:
+            logger.warning("Redis %scache write failed (%s)", self.prefix, e)
+        finally:
+            with self._queued_lock:
+                for key in keys:
+                    left = self._queued.get(key, 0) - 1
+                    if left > 0:
+                        self._queued[key] = left
+                    else:
+                        self._queued.pop(key, None)
+
+    def _write_loop(self) -> None:
+        while True:
+            keys, write = self._queue.get()
+            try:
+                self._apply(keys, write)
+            finally:
+                self._queue.task_done()
@@ -2,11 +2,12 @@
 from typing import Annotated
 
 from fastapi import Depends, Header, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
-from app.core.auth import decode_jwt
-from app.db.session import get_db
+from app.core.auth import verify_jwt
+from app.db.session import get_async_db, get_db
 
 
 def get_current_user(
@@ -24,7 +25,7 @@ def get_current_user(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Authentication required",
             )
-        payload = decode_jwt(token, settings.jwt_secret, settings.jwt_algorithm)
+        payload = verify_jwt(token, settings.jwt_secret, settings.jwt_algorithm)
         if not payload or "sub" not in payload:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,10 +56,10 @@ def require_admin(
 
 def require_validator(
     authorization: Annotated[str | None, Header()] = None,
-    db: Session = Depends(get_db),
 ) -> None:
-    """Dependency: require valid validator API key (from DB or env)."""
-    from app.models.validator_key import ValidatorApiKey, hash_key
+    """Dependency: require valid validator API key (env, or the in-memory key set confirmed by its DB version)."""
+    from app.models.validator_key import hash_key
+    from app.services.validator_key_service import validator_keys
 
     token = (authorization or "").replace("Bearer ", "").strip()
     if not token:
@@ -66,18 +67,12 @@ def require_validator(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={"error": "unauthorized", "code": "INVALID_VALIDATOR_KEY"},
         )
-    key_hash = hash_key(token)
-    db_key = db.query(ValidatorApiKey).filter(
-        ValidatorApiKey.key_hash == key_hash,
-        ValidatorApiKey.revoked_at.is_(None),
-    ).first()
-    if db_key:
-        return
     settings = get_settings()
     if settings.validator_keys_set and token in settings.validator_keys_set:
         return
-    has_any_keys = db.query(ValidatorApiKey).filter(ValidatorApiKey.revoked_at.is_(None)).count() > 0
-    if not has_any_keys and not settings.validator_keys_set:
+    if validator_keys.is_active(hash_key(token)):
+        return
+    if not validator_keys.active_hashes() and not settings.validator_keys_set:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Validator API not configured",
@@ -97,3 +92,4 @@ def require_user_match(user_id: str, current_user: dict) -> None:
 
 # Type aliases for injection
 DbSession = Annotated[Session, Depends(get_db)]
+AsyncDbSession = Annotated[AsyncSession, Depends(get_async_db)]
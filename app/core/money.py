@@ -0,0 +1,20 @@
+"""Fixed-point Karma amounts.
+
+Balances and transaction amounts are stored as BigInteger milli-Karma (the
+platform's 0.001 precision). Services do plain integer math on milli values;
+request amounts are converted once with to_milli() and responses are formatted
+once with to_karma().
+"""
+MILLI = 1000
+DECIMALS = 3
+MIN_AMOUNT = 1  # 0.001 Karma
+
+
+def to_milli(amount: float | int | str) -> int:
+    """Karma (request body, config, backup file) -> milli-Karma, rounded to the nearest 0.001."""
+    return round(float(amount) * MILLI)
+
+
+def to_karma(milli) -> float:
+    """milli-Karma -> Karma for responses. Accepts DB aggregates (Postgres SUM returns numeric)."""
+    return int(milli or 0) / MILLI
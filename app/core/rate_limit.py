@@ -1,7 +1,9 @@
-"""Rate limiting: Redis when configured, else in-memory."""
+"""Rate limiting: per-worker GCRA, synced to Redis in batches when configured."""
 import logging
-from collections import defaultdict
-from time import time
+import sys
+import threading
+from collections import OrderedDict
+from time import monotonic
 from threading import Lock
 
 from app.config import get_settings
@@ -9,100 +11,268 @@ from app.config import get_settings
 logger = logging.getLogger(__name__)
 
 
+class _Stripe:
+    """One lock and the keys hashed to it, least recently checked first."""
+
+    __slots__ = ("lock", "tat", "pending", "evictions", "expired")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.tat: OrderedDict[str, float] = OrderedDict()
+        self.pending: dict[str, tuple[int, float]] = {}  # key -> (admitted, interval), hybrid only
+        self.evictions = 0
+        self.expired = 0
+
+
 class InMemoryRateLimiter:
-    """Sliding window rate limiter. Key -> list of timestamps."""
+    """
+    GCRA (generic cell rate algorithm) limiter: `limit` requests per window, refilled
+    evenly. Each key stores only its theoretical arrival time (TAT), so a check is O(1)
+    with fixed memory per key. Keys are spread over `stripes` independently locked
+    dicts so concurrent workers rarely contend.
 
-    def __init__(self, window_seconds: int = 60):
+    Memory is bounded: each stripe holds at most max_keys / stripes keys and drops its
+    least recently checked key when full, and sweep() removes idle keys (TAT in the past,
+    i.e. fully refilled, which behaves exactly like an absent key).
+    """
+
+    def __init__(self, window_seconds: int = 60, stripes: int = 64, max_keys: int = 100_000):
         self.window = window_seconds
-        self._counts: dict[str, list[float]] = defaultdict(list)
-        self._lock = Lock()
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
+        self._stripe_capacity = max(1, max_keys // len(self._stripes))
+
+    def _stripe(self, key: str) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
 
     def is_allowed(self, key: str, limit: int) -> bool:
         """Return True if request allowed, False if rate limited."""
-        now = time()
-        cutoff = now - self.window
-        with self._lock:
-            self._counts[key] = [t for t in self._counts[key] if t > cutoff]
-            if len(self._counts[key]) >= limit:
-                return False
-            self._counts[key].append(now)
-            return True
+        if limit <= 0:
+            return False
+        stripe = self._stripe(key)
+        with stripe.lock:
+            return self._admit(stripe, key, self.window / limit, monotonic())
+
+    def _admit(self, stripe: _Stripe, key: str, interval: float, now: float) -> bool:
+        """GCRA step for key; caller holds stripe.lock."""
+        tat = max(stripe.tat.get(key, now), now)
+        if tat + interval - now > self.window + 1e-9:
+            stripe.tat.move_to_end(key)
+            return False
+        if key in stripe.tat:
+            stripe.tat.move_to_end(key)
+        elif len(stripe.tat) >= self._stripe_capacity:
+            stripe.tat.popitem(last=False)
+            stripe.evictions += 1
+        stripe.tat[key] = tat + interval
+        return True
 
     def remaining(self, key: str, limit: int) -> int:
         """Remaining requests in window."""
-        now = time()
-        cutoff = now - self.window
-        with self._lock:
-            self._counts[key] = [t for t in self._counts[key] if t > cutoff]
-            return max(0, limit - len(self._counts[key]))
-
-
-# Redis sliding-window Lua script (atomic)
-_REDIS_SLIDING_SCRIPT = """
-local key = KEYS[1]
-local now = tonumber(ARGV[1])
-local window = tonumber(ARGV[2])
-local limit = tonumber(ARGV[3])
-redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
-local count = redis.call('ZCARD', key)
-if count >= limit then
-  return 0
+        if limit <= 0:
+            return 0
+        now = monotonic()
+        stripe = self._stripe(key)
+        with stripe.lock:
+            backlog = max(stripe.tat.get(key, now) - now, 0.0)
+        return max(0, min(limit, int((self.window - backlog) * limit / self.window + 1e-9)))
+
+    def sweep(self) -> int:
+        """Drop idle keys, one stripe lock at a time. Returns how many were removed."""
+        removed = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                now = monotonic()
+                idle = [k for k, tat in stripe.tat.items() if tat <= now]
+                for k in idle:
+                    del stripe.tat[k]
+                stripe.expired += len(idle)
+            removed += len(idle)
+        return removed
+
+    def stats(self) -> dict:
+        """Key count, capacity, eviction counters and approximate bytes held."""
+        keys = evictions = expired = 0
+        size = sys.getsizeof(self._stripes)
+        for stripe in self._stripes:
+            with stripe.lock:
+                keys += len(stripe.tat)
+                evictions += stripe.evictions
+                expired += stripe.expired
+                size += sys.getsizeof(stripe.tat) + sum(sys.getsizeof(k) + 24 for k in stripe.tat)
+        return {
+            "backend": "memory",
+            "keys": keys,
+            "capacity": self._stripe_capacity * len(self._stripes),
+            "evictions": evictions,
+            "expired": expired,
+            "approx_bytes": size,
+        }
+
+
+# Redis GCRA step for one key: add n admissions at `interval` seconds each to the shared
+# arrival time (capped at one window of backlog) and return the resulting backlog in seconds.
+# Uses the Redis clock so worker clock skew does not matter.
+_REDIS_GCRA_SCRIPT = """
+redis.replicate_commands()
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local n = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+  tat = now
 end
-redis.call('ZADD', key, now, now)
-redis.call('EXPIRE', key, math.ceil(window) + 1)
-return 1
+tat = math.min(tat + n * interval, now + window)
+redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000) + 1000)
+return tostring(tat - now)
 """
 
+# Seconds between reconnection attempts while Redis is unreachable
+_REDIS_RETRY_SECONDS = 1.0
 
-class RedisRateLimiter:
-    """Sliding window rate limiter backed by Redis."""
 
-    def __init__(self, redis_url: str, window_seconds: int = 60):
+class HybridRateLimiter(InMemoryRateLimiter):
+    """
+    Per-worker GCRA that admits without a network hop, kept roughly cluster-wide by a
+    background thread. Admissions accumulate per key and are pushed to Redis every
+    sync_interval seconds, or as soon as a key has sync_tokens unsent admissions, in one
+    pipelined round trip. Redis answers with each key's cluster backlog, which becomes the
+    worker's local budget for that key until the next sync; so a cluster overshoots a
+    limit by at most about sync_tokens per worker per sync. When Redis is unreachable
+    the unsent counts are dropped and each worker keeps enforcing its local limit.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        window_seconds: int = 60,
+        stripes: int = 64,
+        max_keys: int = 100_000,
+        sync_interval: float = 0.1,
+        sync_tokens: int = 20,
+    ):
         import redis
-        self.client = redis.from_url(redis_url, decode_responses=True)
-        self.window = window_seconds
-        self._script = self.client.register_script(_REDIS_SLIDING_SCRIPT)
+
+        super().__init__(window_seconds=window_seconds, stripes=stripes, max_keys=max_keys)
+        self.client = redis.from_url(redis_url, decode_responses=True, socket_timeout=1, socket_connect_timeout=1)
+        self._script = self.client.register_script(_REDIS_GCRA_SCRIPT)
+        self.sync_interval = sync_interval
+        self.sync_tokens = max(1, sync_tokens)
+        self.redis_connected = True
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
 
     def is_allowed(self, key: str, limit: int) -> bool:
-        """Return True if request allowed, False if rate limited."""
+        """Return True if request allowed, False if rate limited. Never touches Redis."""
+        if limit <= 0:
+            return False
+        interval = self.window / limit
+        stripe = self._stripe(key)
+        with stripe.lock:
+            if not self._admit(stripe, key, interval, monotonic()):
+                return False
+            unsent = stripe.pending.get(key, (0, interval))[0] + 1
+            stripe.pending[key] = (unsent, interval)
+        if unsent >= self.sync_tokens:
+            self._wake.set()
+        return True
+
+    def _push(self, batch: list[tuple[str, int, float]]) -> list[float]:
+        """Apply (key, admitted, interval) to Redis in one round trip; returns backlogs."""
+        pipe = self.client.pipeline(transaction=False)
+        for key, admitted, interval in batch:
+            self._script(keys=[f"rl:gcra:{key}"], args=[admitted, interval, self.window], client=pipe)
+        return [float(b) for b in pipe.execute()]
+
+    def sync(self) -> int:
+        """Push unsent admissions and adopt the cluster backlogs. Returns keys synced."""
+        batch = []
+        for stripe in self._stripes:
+            with stripe.lock:
+                if stripe.pending:
+                    batch.extend((k, n, interval) for k, (n, interval) in stripe.pending.items())
+                    stripe.pending = {}
+        if not batch:
+            return 0
         try:
-            rkey = f"rl:{key}"
-            result = self._script(keys=[rkey], args=[str(time()), str(self.window), str(limit)])
-            return result == 1
+            backlogs = self._push(batch)
         except Exception as e:
-            logger.warning("Redis rate limit check failed (%s), allowing request", e)
-            return True
+            if self.redis_connected:
+                logger.warning("Redis rate limit sync failed (%s), limiting per worker only", e)
+                self.redis_connected = False
+            return 0
+        if not self.redis_connected:
+            logger.info("Redis rate limit sync restored")
+            self.redis_connected = True
+        now = monotonic()
+        for (key, _, interval), backlog in zip(batch, backlogs):
+            stripe = self._stripe(key)
+            with stripe.lock:
+                if key not in stripe.tat:
+                    continue  # evicted or swept meanwhile
+                # Admissions made while the batch was in flight are not in Redis's answer yet
+                unsent = stripe.pending.get(key, (0, interval))[0]
+                stripe.tat[key] = max(stripe.tat[key], now + backlog + unsent * interval)
+        return len(batch)
 
-    def remaining(self, key: str, limit: int) -> int:
-        """Remaining requests in window (best effort)."""
-        try:
-            rkey = f"rl:{key}"
-            now = time()
-            self.client.zremrangebyscore(rkey, "-inf", now - self.window)
-            count = self.client.zcard(rkey)
-            return max(0, limit - count)
-        except Exception:
-            return limit
+    def start(self) -> None:
+        """Start the background sync thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rate-limit-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the sync thread after a final flush."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.sync()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.sync_interval if self.redis_connected else _REDIS_RETRY_SECONDS)
+            self._wake.clear()
+            try:
+                self.sync()
+            except Exception as e:
+                logger.exception("Rate limit sync failed: %s", e)
+
+    def stats(self) -> dict:
+        """In-memory gauges plus whether the last sync reached Redis."""
+        return {**super().stats(), "backend": "hybrid", "redis_connected": self.redis_connected}
 
 
 _limiter = None
 
 
 def _get_limiter():
-    """Lazy-init limiter: Redis if configured, else in-memory."""
+    """Lazy-init limiter: hybrid local + Redis if configured, else in-memory only."""
     global _limiter
     if _limiter is not None:
         return _limiter
     settings = get_settings()
     if settings.redis_url:
         try:
-            _limiter = RedisRateLimiter(settings.redis_url, window_seconds=60)
-            logger.info("Rate limiting using Redis")
+            _limiter = HybridRateLimiter(
+                settings.redis_url,
+                window_seconds=60,
+                max_keys=settings.rate_limit_max_keys,
+                sync_interval=settings.rate_limit_sync_interval_ms / 1000,
+                sync_tokens=settings.rate_limit_sync_tokens,
+            )
+            _limiter.start()
+            logger.info("Rate limiting per worker, synced through Redis")
         except Exception as e:
             logger.warning("Redis unavailable (%s), falling back to in-memory rate limit", e)
-            _limiter = InMemoryRateLimiter(window_seconds=60)
+            _limiter = InMemoryRateLimiter(window_seconds=60, max_keys=settings.rate_limit_max_keys)
     else:
-        _limiter = InMemoryRateLimiter(window_seconds=60)
+        _limiter = InMemoryRateLimiter(window_seconds=60, max_keys=settings.rate_limit_max_keys)
     return _limiter
 
 
@@ -114,3 +284,22 @@ def check_rate_limit(key: str, limit: int) -> bool:
 def get_remaining(key: str, limit: int) -> int:
     """Get remaining requests for key."""
     return _get_limiter().remaining(key, limit)
+
+
+def stop_rate_limiter() -> None:
+    """Flush and stop the Redis sync thread, if one is running."""
+    global _limiter
+    if isinstance(_limiter, HybridRateLimiter):
+        _limiter.stop()
+        _limiter = None
+
+
+def sweep_rate_limits() -> int:
+    """Drop idle in-memory limiter keys. Returns how many were removed."""
+    limiter = _get_limiter()
+    return limiter.sweep() if isinstance(limiter, InMemoryRateLimiter) else 0
+
+
+def rate_limit_stats() -> dict:
+    """Gauges for the active limiter (for /v1/admin/metrics)."""
+    return _get_limiter().stats()
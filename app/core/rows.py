@@ -0,0 +1,32 @@
+"""Lightweight read-only rows for ORM-free read paths.
+
+Read endpoints select only the columns they need with Core select() and wrap
+each result row in a Projection subclass: a __slots__ object (no __dict__, no
+identity map, no lazy loads) filled positionally, so a subclass's __slots__
+order must match its statement's column order.
+"""
+from typing import Self
+
+from sqlalchemy.orm import Session
+
+
+class Projection:
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values, strict=True):
+            setattr(self, name, value)
+
+    @classmethod
+    def one(cls, db: Session, stmt) -> Self | None:
+        """First row of stmt, or None."""
+        row = db.execute(stmt).first()
+        return cls(*row) if row is not None else None
+
+    @classmethod
+    def all(cls, db: Session, stmt) -> list[Self]:
+        return [cls(*row) for row in db.execute(stmt)]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
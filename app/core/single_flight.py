@@ -0,0 +1,175 @@
+"""Single-flight request coalescing for expensive idempotent GETs.
+
+Concurrent identical calls share one in-flight computation and its result.
+Nothing is cached after the computation finishes, so callers never see data
+older than the computation they joined.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+from typing import Any, Callable, Iterable
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Only plain values take part in the key; injected sessions/requests are skipped
+_KEY_TYPES = (str, int, float, bool, type(None))
+
+
+class _Call:
+    """One in-flight computation that followers wait on."""
+
+    __slots__ = ("event", "result", "error", "followers")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Thread-safe single-flight group (sync callers on the threadpool)."""
+
+    def __init__(self):
+        self._calls: dict[tuple, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: tuple, fn: Callable[[], Any], timeout: float | None = None) -> Any:
+        """Run fn once per key; concurrent callers with the same key share its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            if not call.event.wait(timeout):
+                # Leader is too slow; compute independently rather than fail the request
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+            if call.followers:
+                logger.debug("single_flight coalesced %d callers for %s", call.followers, key[0])
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Single-flight group for coroutine endpoints (one event loop)."""
+
+    def __init__(self):
+        self._calls: dict[tuple, asyncio.Future] = {}
+
+    async def do(self, key: tuple, fn: Callable[[], Any]) -> Any:
+        """
+        Await fn once per key; concurrent awaiters with the same key share its result.
+        fn runs on the leader's own resources (its injected session), so when the leader
+        is cancelled (client disconnect) a follower takes over and runs its own fn.
+        """
+        loop = asyncio.get_running_loop()
+        while (fut := self._calls.get(key)) is not None and fut.get_loop() is loop:
+            try:
+                return await asyncio.shield(fut)
+            except asyncio.CancelledError:
+                if not fut.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The leader was cancelled, not us: the first follower back leads the retry
+
+        fut = loop.create_future()
+        self._calls[key] = fut
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            # Mark retrieved so an unobserved error is not logged by asyncio
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        return len(self._calls)
+
+
+def request_key(name: str, params: dict[str, Any], key_params: Iterable[str] | None = None) -> tuple:
+    """Build a coalescing key from route name and normalized (sorted, plain-valued) params."""
+    if key_params is not None:
+        wanted = set(key_params)
+        items = ((k, v) for k, v in params.items() if k in wanted)
+    else:
+        items = ((k, v) for k, v in params.items() if isinstance(v, _KEY_TYPES))
+    return (name, tuple(sorted((k, str(v)) for k, v in items)))
+
+
+def single_flight(
+    name: str,
+    key_params: Iterable[str] | None = None,
+    enabled: bool = True,
+    timeout: float | None = 30.0,
+):
+    """
+    Decorator for idempotent GET endpoints: coalesce concurrent identical calls.
+    name identifies the route (use its path); key_params limits which endpoint
+    parameters form the key (default: all plain-valued params, i.e. path/query).
+    enabled=False or SINGLE_FLIGHT_ENABLED=0 turns coalescing off for the route.
+    """
+    key_params = tuple(key_params) if key_params is not None else None
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            group = AsyncSingleFlight()
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not enabled or not get_settings().single_flight_enabled:
+                    return await fn(*args, **kwargs)
+                key = request_key(name, kwargs, key_params)
+                return await group.do(key, lambda: fn(*args, **kwargs))
+
+            async_wrapper.single_flight = group
+            return async_wrapper
+
+        group = SingleFlight()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled or not get_settings().single_flight_enabled:
+                return fn(*args, **kwargs)
+            key = request_key(name, kwargs, key_params)
+            return group.do(key, lambda: fn(*args, **kwargs), timeout=timeout)
+
+        wrapper.single_flight = group
+        return wrapper
+
+    return decorator
@@ -1,9 +1,11 @@
 """Database session management."""
 from contextlib import contextmanager
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 
 from app.config import get_settings
 
@@ -20,6 +22,16 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for hot routes (aiosqlite / asyncpg). aiosqlite connections are bound to
+# the event loop that opened them, so SQLite does not pool them.
+async_pool_args = {"poolclass": NullPool} if settings.is_sqlite else {}
+async_engine = create_async_engine(
+    settings.async_database_url,
+    **async_pool_args,
+    echo=settings.environment == "development",
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db() -> Generator[Session, None, None]:
     """Dependency for FastAPI: yields a DB session."""
@@ -30,6 +42,12 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for async routes: yields an AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 @contextmanager
 def get_db_context() -> Generator[Session, None, None]:
     """Context manager for DB session (use outside FastAPI)."""
@@ -46,7 +64,7 @@ def get_db_context() -> Generator[Session, None, None]:
 
 def init_db() -> None:
     """Create all tables. Call on startup."""
-    from app.models import user, wallet, transaction, referral, validator_key, protocol  # noqa: F401
+    from app.models import user, wallet, transaction, posting, referral, validator_key, protocol  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
 
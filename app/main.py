@@ -8,22 +8,45 @@ from fastapi.staticfiles import StaticFiles
 
 from app.config import get_settings
 from app.core.logging_config import setup_logging
+from app.core.rate_limit import stop_rate_limiter
 from app.middleware.rate_limit_middleware import RateLimitMiddleware
 from app.middleware.request_logging_middleware import RequestLoggingMiddleware
 from app.db.session import init_db
 from app.api.v1 import auth, users, wallets, stake, referrals, admin, stats, validator, transactions
-from app.scheduler import start_emission_scheduler, stop_emission_scheduler
+from app.scheduler import (
+    start_emission_scheduler,
+    stop_emission_scheduler,
+    start_shard_consolidation,
+    stop_shard_consolidation,
+    start_transaction_archive,
+    stop_transaction_archive,
+    start_rate_limit_sweeper,
+    stop_rate_limit_sweeper,
+)
+from app.services.transfer_pipeline import start_transfer_pipeline, stop_transfer_pipeline
+from app.services.validator_key_service import start_validator_keys, stop_validator_keys
 
 settings = get_settings()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Startup: init DB, setup logging, start emission scheduler. Shutdown: stop scheduler."""
+    """Startup: init DB, setup logging, start background jobs. Shutdown: stop them."""
     setup_logging(get_settings().log_level)
     init_db()
     start_emission_scheduler()
+    start_shard_consolidation()
+    start_transaction_archive()
+    start_rate_limit_sweeper()
+    start_transfer_pipeline()
+    start_validator_keys()
     yield
+    stop_validator_keys()
+    stop_transfer_pipeline()
+    stop_rate_limit_sweeper()
+    stop_rate_limiter()
+    stop_transaction_archive()
+    stop_shard_consolidation()
     stop_emission_scheduler()
 
 
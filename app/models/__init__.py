@@ -1,17 +1,22 @@
 """SQLAlchemy models."""
 from app.models.user import User
-from app.models.wallet import Wallet
-from app.models.transaction import Transaction, TransactionType
+from app.models.wallet import Wallet, WalletShard
+from app.models.transaction import Transaction, TransactionArchive, TransactionType
 from app.models.referral import Referral
+from app.models.posting import Asset, Posting
 from app.models.validator_key import ValidatorApiKey
 from app.models.protocol import ProtocolState, ProtocolBlock
 
 __all__ = [
     "User",
     "Wallet",
+    "WalletShard",
     "Transaction",
+    "TransactionArchive",
     "TransactionType",
     "Referral",
+    "Asset",
+    "Posting",
     "ValidatorApiKey",
     "ProtocolState",
     "ProtocolBlock",
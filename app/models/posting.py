@@ -0,0 +1,51 @@
+"""Posting model: double-entry ledger lines written next to each Transaction."""
+import enum
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Enum, ForeignKey, Index, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class Asset(str, enum.Enum):
+    """Balance a posting moves (one per wallet balance column)."""
+
+    KARMA = "karma"
+    STAKED = "staked"
+    CHILIZ = "chiliz"
+
+
+class Posting(Base):
+    """
+    One signed movement of one asset on one account. Every transaction's postings
+    sum to zero: value entering or leaving the platform (mint, rewards, bonuses)
+    is balanced by an issuance leg with account_id NULL.
+    """
+
+    __tablename__ = "postings"
+    # Per-account reads (history, totals, latest balance) are one range scan in seq order
+    __table_args__ = (Index("ix_postings_account_asset_seq", "account_id", "asset", "seq"),)
+
+    # Global insert order; postings are written while the wallet row is held, so per account
+    # seq order is balance order
+    seq: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+    )
+    account_id: Mapped[uuid.UUID | None] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    # NULL for opening balances (migration backfill, backup restore). Not a foreign key:
+    # postings stay live when their transaction moves to transactions_archive
+    tx_id: Mapped[uuid.UUID | None] = mapped_column(nullable=True, index=True)
+    asset: Mapped[Asset] = mapped_column(Enum(Asset), nullable=False)
+    # Signed integer milli-units (see app.core.money)
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    # Account balance after this posting; NULL where it is not tracked (issuance legs,
+    # karma of sharded hot wallets, whose credits deliberately don't serialize)
+    balance: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
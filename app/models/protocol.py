@@ -2,7 +2,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import BigInteger, DateTime, Integer, Numeric
+from sqlalchemy import BigInteger, DateTime, Integer
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.types import JSON
 
@@ -20,7 +20,7 @@ class ProtocolState(Base):
     )
     last_processed_ts: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     last_emitted_block_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
-    deferred_rewards: Mapped[float] = mapped_column(Numeric(24, 6), default=0, nullable=False)
+    deferred_rewards: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)  # milli-Karma
     utilization_window: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     saturated_days: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
@@ -39,6 +39,6 @@ class ProtocolBlock(Base):
     )
     block_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     emitted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    reward_total: Mapped[float] = mapped_column(Numeric(24, 6), nullable=False)
+    reward_total: Mapped[int] = mapped_column(BigInteger, nullable=False)  # milli-Karma
     splits_applied: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     processed_tx_count: Mapped[int] = mapped_column(default=0, nullable=False)
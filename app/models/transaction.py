@@ -2,10 +2,9 @@
 import enum
 import uuid
 from datetime import datetime
-from decimal import Decimal
 from typing import Any
 
-from sqlalchemy import BigInteger, DateTime, Enum, ForeignKey, Numeric, Text
+from sqlalchemy import BigInteger, DateTime, Enum, ForeignKey, Index, Text
 from sqlalchemy.types import JSON
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -30,9 +29,19 @@ class TransactionType(str, enum.Enum):
 
 
 class Transaction(Base):
-    """Append-only transaction log."""
+    """
+    Append-only transaction log (live rows). On Postgres the table is range-partitioned
+    by month on created_at (primary key (id, created_at)); rows older than
+    TRANSACTION_ARCHIVE_AFTER_MONTHS move to TransactionArchive.
+    """
 
     __tablename__ = "transactions"
+    # History lookups: one index range scan per party column, keyset-ordered by (created_at, id)
+    __table_args__ = (
+        Index("ix_transactions_actor_created", "actor_user_id", "created_at", "id"),
+        Index("ix_transactions_from_created", "from_user_id", "created_at", "id"),
+        Index("ix_transactions_to_created", "to_user_id", "created_at", "id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         primary_key=True,
@@ -56,7 +65,34 @@ class Transaction(Base):
         ForeignKey("users.id", ondelete="SET NULL"),
         nullable=True,
     )
-    amount_karma: Mapped[Decimal | None] = mapped_column(Numeric(24, 6), nullable=True)
-    amount_chiliz: Mapped[Decimal | None] = mapped_column(Numeric(24, 6), nullable=True)
+    # Integer milli-units (see app.core.money)
+    amount_karma: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    amount_chiliz: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     meta: Mapped[dict[str, Any] | None] = mapped_column("metadata", JSON, nullable=True)
     block_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True, index=True)
+
+
+class TransactionArchive(Base):
+    """
+    Cold transactions moved out of `transactions` by the archival job (same columns,
+    no foreign keys: archived rows outlive deleted users).
+    """
+
+    __tablename__ = "transactions_archive"
+    __table_args__ = (
+        Index("ix_transactions_archive_actor_created", "actor_user_id", "created_at", "id"),
+        Index("ix_transactions_archive_from_created", "from_user_id", "created_at", "id"),
+        Index("ix_transactions_archive_to_created", "to_user_id", "created_at", "id"),
+        Index("ix_transactions_archive_created", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    type: Mapped[TransactionType] = mapped_column(Enum(TransactionType), nullable=False)
+    actor_user_id: Mapped[uuid.UUID | None] = mapped_column(nullable=True)
+    from_user_id: Mapped[uuid.UUID | None] = mapped_column(nullable=True)
+    to_user_id: Mapped[uuid.UUID | None] = mapped_column(nullable=True)
+    amount_karma: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    amount_chiliz: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    meta: Mapped[dict[str, Any] | None] = mapped_column("metadata", JSON, nullable=True)
+    block_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
@@ -3,7 +3,7 @@ import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import BigInteger, Boolean, DateTime, String
+from sqlalchemy import DDL, BigInteger, Boolean, DateTime, String, column, event, table
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.session import Base
@@ -49,3 +49,36 @@ class User(Base):
 
     def __repr__(self) -> str:
         return f"<User {self.telegram_user_id} ({self.username})>"
+
+
+# Username search index for recipient autocomplete (user_service.search_users).
+# Postgres: trigram GIN on lower(username). SQLite: FTS5 trigram shadow table whose
+# rowid is users.telegram_user_id, so trigger deletes are rowid lookups rather than
+# scans; kept in sync by triggers so every write path (register, rename, unregister,
+# restore) updates it, and re-writing an unchanged username leaves it alone.
+users_fts = table("users_fts", column("rowid"), column("username"))
+
+_SEARCH_INDEX_DDL = {
+    "postgresql": (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops)",
+    ),
+    "sqlite": (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(username, tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users "
+        "WHEN new.telegram_user_id IS NOT NULL BEGIN "
+        "INSERT INTO users_fts (rowid, username) VALUES (new.telegram_user_id, new.username); END",
+        "CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF username, telegram_user_id ON users "
+        "WHEN old.username IS NOT new.username OR old.telegram_user_id IS NOT new.telegram_user_id BEGIN "
+        "DELETE FROM users_fts WHERE rowid = old.telegram_user_id; "
+        "INSERT INTO users_fts (rowid, username) SELECT new.telegram_user_id, new.username "
+        "WHERE new.telegram_user_id IS NOT NULL; END",
+        "CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN "
+        "DELETE FROM users_fts WHERE rowid = old.telegram_user_id; END",
+    ),
+}
+
+for _dialect, _statements in _SEARCH_INDEX_DDL.items():
+    for _statement in _statements:
+        event.listen(User.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+event.listen(User.__table__, "before_drop", DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect="sqlite"))
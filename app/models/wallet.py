@@ -1,10 +1,9 @@
 """Wallet model."""
 import uuid
 from datetime import datetime
-from decimal import Decimal
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Numeric
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Integer, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -16,7 +15,7 @@ if TYPE_CHECKING:
 
 
 class Wallet(Base):
-    """User wallet for Karma and Chiliz tokens."""
+    """User wallet for Karma and Chiliz tokens. Amounts are integer milli-units (see app.core.money)."""
 
     __tablename__ = "wallets"
 
@@ -28,27 +27,15 @@ class Wallet(Base):
         ForeignKey("users.id", ondelete="CASCADE"),
         unique=True,
     )
-    karma_balance: Mapped[Decimal] = mapped_column(
-        Numeric(24, 6),
-        default=Decimal("0"),
-        nullable=False,
-    )
-    chiliz_balance: Mapped[Decimal] = mapped_column(
-        Numeric(24, 6),
-        default=Decimal("0"),
-        nullable=False,
-    )
-    staked_amount: Mapped[Decimal] = mapped_column(
-        Numeric(24, 6),
-        default=Decimal("0"),
-        nullable=False,
-    )
-    rewards_earned: Mapped[Decimal] = mapped_column(
-        Numeric(24, 6),
-        default=Decimal("0"),
-        nullable=False,
-    )
+    karma_balance: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    chiliz_balance: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    staked_amount: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    rewards_earned: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
     next_unlock_ts: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Optimistic concurrency: bumped on every balance update, checked by conditional UPDATEs
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Hot wallets only (system/event): >0 spreads karma over WalletShard sub-rows
+    shard_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
@@ -57,3 +44,24 @@ class Wallet(Base):
 
     def __repr__(self) -> str:
         return f"<Wallet user_id={self.user_id} karma={self.karma_balance}>"
+
+
+class WalletShard(Base):
+    """Karma sub-balance of a sharded hot wallet. Wallet karma = main row + sum(shards)."""
+
+    __tablename__ = "wallet_shards"
+    __table_args__ = (UniqueConstraint("wallet_id", "shard_no", name="uq_wallet_shards_wallet_shard"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    wallet_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("wallets.id", ondelete="CASCADE"),
+        index=True,
+    )
+    shard_no: Mapped[int] = mapped_column(Integer, nullable=False)
+    karma_balance: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
@@ -1,14 +1,41 @@
-"""Background scheduler for protocol emission."""
+"""Background scheduler for protocol emission and DB maintenance.
+
+The jobs are blocking DB work, so each run goes to a worker thread
+(asyncio.to_thread): the event loop that serves the async routes never waits on them.
+"""
 import asyncio
 import logging
 
 from app.config import get_settings
+from app.core.rate_limit import sweep_rate_limits
 from app.db.session import SessionLocal
+from app.services.archive_service import archive_transactions, ensure_partitions
 from app.services.emission_service import run_emission_once
+from app.services.wallet_shard_service import consolidate_shards
 
 logger = logging.getLogger(__name__)
 
 _task: asyncio.Task | None = None
+_consolidation_task: asyncio.Task | None = None
+_archive_task: asyncio.Task | None = None
+_rate_limit_sweep_task: asyncio.Task | None = None
+
+
+def _emit_once() -> None:
+    """One emission run on its own session (worker thread)."""
+    db = SessionLocal()
+    try:
+        result = run_emission_once(db)
+        logger.info(
+            "Protocol emission block %s completed (reward=%.2f, processed=%d)",
+            result.get("block_id"),
+            result.get("reward_total", 0),
+            result.get("processed_tx_count", 0),
+        )
+    except Exception as e:
+        logger.exception("Protocol emission failed: %s", e)
+    finally:
+        db.close()
 
 
 async def _run_emission_loop() -> None:
@@ -25,19 +52,7 @@ async def _run_emission_loop() -> None:
 
     while True:
         try:
-            db = SessionLocal()
-            try:
-                result = run_emission_once(db)
-                logger.info(
-                    "Protocol emission block %s completed (reward=%.2f, processed=%d)",
-                    result.get("block_id"),
-                    result.get("reward_total", 0),
-                    result.get("processed_tx_count", 0),
-                )
-            except Exception as e:
-                logger.exception("Protocol emission failed: %s", e)
-            finally:
-                db.close()
+            await asyncio.to_thread(_emit_once)
             await asyncio.sleep(interval)
         except asyncio.CancelledError:
             logger.info("Protocol emission scheduler stopped")
@@ -61,3 +76,137 @@ def stop_emission_scheduler() -> None:
     if _task is not None:
         _task.cancel()
         _task = None
+
+
+def _consolidate_once() -> None:
+    """One shard consolidation pass on its own session (worker thread)."""
+    db = SessionLocal()
+    try:
+        touched = consolidate_shards(db)
+        if touched:
+            logger.info("Consolidated shards of %d wallets", touched)
+    except Exception as e:
+        db.rollback()
+        logger.exception("Shard consolidation failed: %s", e)
+    finally:
+        db.close()
+
+
+async def _run_shard_consolidation_loop() -> None:
+    """Fold sharded wallet balances back into their wallet rows on an interval."""
+    interval = get_settings().shard_consolidation_interval_seconds
+    if interval <= 0:
+        logger.info("Shard consolidation disabled (shard_consolidation_interval_seconds<=0)")
+        return
+
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(_consolidate_once)
+        except asyncio.CancelledError:
+            logger.info("Shard consolidation stopped")
+            raise
+
+
+def start_shard_consolidation() -> asyncio.Task | None:
+    """Start the shard consolidation background task."""
+    global _consolidation_task
+    if _consolidation_task is not None:
+        return _consolidation_task
+    _consolidation_task = asyncio.create_task(_run_shard_consolidation_loop())
+    return _consolidation_task
+
+
+def stop_shard_consolidation() -> None:
+    """Stop the shard consolidation background task."""
+    global _consolidation_task
+    if _consolidation_task is not None:
+        _consolidation_task.cancel()
+        _consolidation_task = None
+
+
+def _archive_once() -> None:
+    """Partition upkeep and one archival pass on its own session (worker thread)."""
+    db = SessionLocal()
+    try:
+        created = ensure_partitions(db)
+        if created:
+            logger.info("Created %d transaction partitions", created)
+        archive_transactions(db)
+    except Exception as e:
+        db.rollback()
+        logger.exception("Transaction archival failed: %s", e)
+    finally:
+        db.close()
+
+
+async def _run_transaction_archive_loop() -> None:
+    """Create upcoming Postgres partitions and archive cold transactions on an interval."""
+    interval = get_settings().transaction_archive_interval_seconds
+    if interval <= 0:
+        logger.info("Transaction archival disabled (transaction_archive_interval_seconds<=0)")
+        return
+
+    while True:
+        try:
+            await asyncio.to_thread(_archive_once)
+            await asyncio.sleep(interval)
+        except asyncio.CancelledError:
+            logger.info("Transaction archival stopped")
+            raise
+
+
+def start_transaction_archive() -> asyncio.Task | None:
+    """Start the partition maintenance / archival background task."""
+    global _archive_task
+    if _archive_task is not None:
+        return _archive_task
+    _archive_task = asyncio.create_task(_run_transaction_archive_loop())
+    return _archive_task
+
+
+def stop_transaction_archive() -> None:
+    """Stop the partition maintenance / archival background task."""
+    global _archive_task
+    if _archive_task is not None:
+        _archive_task.cancel()
+        _archive_task = None
+
+
+async def _run_rate_limit_sweep_loop() -> None:
+    """Drop idle in-memory rate limit keys on an interval."""
+    settings = get_settings()
+    interval = settings.rate_limit_sweep_interval_seconds
+    if settings.rate_limit_disabled or interval <= 0:
+        logger.info("Rate limit sweeper disabled")
+        return
+
+    while True:
+        try:
+            await asyncio.sleep(interval)
+            try:
+                removed = sweep_rate_limits()
+                if removed:
+                    logger.debug("Swept %d idle rate limit keys", removed)
+            except Exception as e:
+                logger.exception("Rate limit sweep failed: %s", e)
+        except asyncio.CancelledError:
+            logger.info("Rate limit sweeper stopped")
+            raise
+
+
+def start_rate_limit_sweeper() -> asyncio.Task | None:
+    """Start the idle rate limit key sweeper."""
+    global _rate_limit_sweep_task
+    if _rate_limit_sweep_task is not None:
+        return _rate_limit_sweep_task
+    _rate_limit_sweep_task = asyncio.create_task(_run_rate_limit_sweep_loop())
+    return _rate_limit_sweep_task
+
+
+def stop_rate_limit_sweeper() -> None:
+    """Stop the idle rate limit key sweeper."""
+    global _rate_limit_sweep_task
+    if _rate_limit_sweep_task is not None:
+        _rate_limit_sweep_task.cancel()
+        _rate_limit_sweep_task = None
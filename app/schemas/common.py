@@ -5,3 +5,9 @@ from pydantic import Field
 
 # Telegram user IDs must be numeric strings
 TelegramUserId = Annotated[str, Field(pattern=r"^\d+$", description="Telegram user ID")]
+
+# Wallet owner IDs: Telegram user IDs plus negative IDs of event/system wallets
+WalletOwnerId = Annotated[str, Field(pattern=r"^-?\d+$", description="Telegram user ID or event wallet ID")]
+
+# Karma amounts on the wire are decimal Karma; services store them as integer milli-Karma
+KarmaAmount = Annotated[float, Field(ge=0.001, description="Amount of Karma (min 0.001)")]
@@ -19,9 +19,10 @@ class TransactionResponse(BaseModel):
 
 
 class TransactionListResponse(BaseModel):
-    """Paginated transaction list."""
+    """Paginated transaction list. total is None when not requested; next_cursor is None on the last page."""
 
     transactions: list[TransactionResponse]
-    total: int
+    total: int | None
     limit: int
     offset: int
+    next_cursor: str | None = None
@@ -1,5 +1,5 @@
 """User schemas."""
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.schemas.common import TelegramUserId
 
@@ -65,3 +65,17 @@ class BalanceResponse(BaseModel):
     rewards: float
     chiliz: float
     created_at: int | None = None
+
+
+class ImportUserRecord(BaseModel):
+    """One user in a bulk import (NDJSON object or CSV row). Balances are decimal units."""
+
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    user_id: TelegramUserId
+    username: str = Field(..., min_length=1, max_length=255)
+    karma: float = Field(0, ge=0)
+    staked: float = Field(0, ge=0)
+    chiliz: float = Field(0, ge=0)
+    invited_by: TelegramUserId | None = None
+    referral_rewarded: bool = False
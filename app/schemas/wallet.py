@@ -1,21 +1,21 @@
 """Wallet and transaction schemas."""
 from pydantic import BaseModel, Field
 
-from app.schemas.common import TelegramUserId
+from app.schemas.common import KarmaAmount, TelegramUserId, WalletOwnerId
 
 
 class StakeRequest(BaseModel):
     """Request to stake Karma."""
 
     user_id: TelegramUserId
-    amount: float = Field(..., gt=0, ge=0.001)
+    amount: KarmaAmount
 
 
 class UnstakeRequest(BaseModel):
     """Request to unstake Karma."""
 
     user_id: TelegramUserId
-    amount: float = Field(..., gt=0, ge=0.001)
+    amount: KarmaAmount
 
 
 class StakeInfoResponse(BaseModel):
@@ -32,7 +32,7 @@ class SendRequest(BaseModel):
 
     sender_id: TelegramUserId
     recipient_id: TelegramUserId
-    amount: float = Field(..., gt=0, ge=0.001, description="Amount of Karma (min 0.001)")
+    amount: KarmaAmount
     note: str | None = Field(None, max_length=30)
 
 
@@ -42,16 +42,64 @@ class SendResponse(BaseModel):
     message: str
 
 
+MAX_BATCH_TRANSFERS = 5000
+
+
+class BatchTransferItem(BaseModel):
+    """One recipient entry in a batch send."""
+
+    recipient_id: TelegramUserId
+    amount: KarmaAmount
+    note: str | None = Field(None, max_length=30)
+
+
+class BatchSendRequest(BaseModel):
+    """Request to send Karma from one sender to many recipients in one transaction."""
+
+    sender_id: TelegramUserId
+    transfers: list[BatchTransferItem] = Field(..., min_length=1, max_length=MAX_BATCH_TRANSFERS)
+
+
+class AdminBatchSendRequest(BatchSendRequest):
+    """Admin batch send; sender may be an event wallet (negative ID)."""
+
+    sender_id: WalletOwnerId
+
+
+class BatchSendFailure(BaseModel):
+    """Entry of a batch send that was not applied."""
+
+    index: int
+    recipient_id: str
+    error: str
+
+
+class BatchSendResponse(BaseModel):
+    """Response after batch send (failed entries are skipped, the rest are applied)."""
+
+    message: str
+    sent: int
+    total_amount: float
+    failed: list[BatchSendFailure]
+
+
 class SwapRequest(BaseModel):
     """Request to swap Karma ↔ Chiliz (1:1)."""
 
     user_id: TelegramUserId
     direction: str = Field(..., pattern=r"^(karma_to_chiliz|chiliz_to_karma)$")
-    amount: float = Field(..., gt=0, ge=0.001)
+    amount: KarmaAmount
+
+
+class WalletShardsRequest(BaseModel):
+    """Admin request to shard a hot system/event wallet."""
+
+    user_id: WalletOwnerId
+    shards: int = Field(..., ge=0, le=64)
 
 
 class MintRequest(BaseModel):
     """Admin request to mint Karma."""
 
     user_id: TelegramUserId
-    amount: float = Field(..., gt=0, ge=0.001)
+    amount: KarmaAmount
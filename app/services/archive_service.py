@@ -0,0 +1,166 @@
+"""Transaction partitioning and cold-data archival.
+
+Live transactions stay in `transactions` (monthly range partitions on Postgres,
+one plain table on SQLite). Once a month is older than
+TRANSACTION_ARCHIVE_AFTER_MONTHS, the archival job moves it to
+`transactions_archive`: on Postgres a whole partition at a time (detach, copy,
+drop), elsewhere one month per DB transaction (INSERT ... SELECT, DELETE).
+
+Readers that may need old rows ask transaction_source() for a selectable; it
+only includes the archive when the requested range reaches archived data.
+
+The archive is a plain heap table, uncompressed. Postgres compresses only values
+that TOAST moves out of line, which starts at about 2 kB per row. Transaction
+rows are a few fixed-width columns plus a small metadata JSON, so lz4/pglz
+column compression would almost never apply. Real savings would need a columnar
+store extension, which this deployment doesn't use. Archiving still keeps the
+live partitions and their indexes small, and that is the goal.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, text, union_all
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import Transaction, TransactionArchive
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "transactions_p"
+
+
+def month_start(dt: datetime) -> datetime:
+    """First instant of dt's month."""
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    """dt (a month start) shifted by whole months."""
+    index = dt.year * 12 + dt.month - 1 + months
+    return dt.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    """Postgres partition holding month, e.g. transactions_p2026_10."""
+    return f"{PARTITION_PREFIX}{month:%Y_%m}"
+
+
+def is_partitioned(db: Session) -> bool:
+    """True when `transactions` is a Postgres partitioned table."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = 'transactions'"
+        )
+    ).first() is not None
+
+
+def _monthly_partitions(db: Session) -> list[tuple[str, datetime]]:
+    """(name, month) of each monthly partition, oldest first (the default partition is skipped)."""
+    names = db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'transactions'"
+        )
+    ).scalars()
+    partitions = []
+    for name in names:
+        if name.startswith(PARTITION_PREFIX):
+            partitions.append((name, datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m")))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def ensure_partitions(db: Session, now: datetime | None = None) -> int:
+    """
+    Postgres: create monthly partitions from the current month through
+    TRANSACTION_PARTITIONS_AHEAD months ahead. Commits. Returns partitions created.
+    """
+    if not is_partitioned(db):
+        return 0
+    start = month_start(now or datetime.utcnow())
+    existing = {name for name, _ in _monthly_partitions(db)}
+    created = 0
+    for i in range(get_settings().transaction_partitions_ahead + 1):
+        lower = add_months(start, i)
+        name = partition_name(lower)
+        if name in existing:
+            continue
+        db.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF transactions "
+                f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{add_months(lower, 1):%Y-%m-%d}')"
+            )
+        )
+        created += 1
+    db.commit()
+    return created
+
+
+def archive_transactions(db: Session, now: datetime | None = None) -> dict:
+    """
+    Move transactions from months older than TRANSACTION_ARCHIVE_AFTER_MONTHS into
+    transactions_archive. Commits once per month moved. Returns {"archived", "cutoff"}.
+    """
+    months = get_settings().transaction_archive_after_months
+    if months <= 0:
+        return {"archived": 0, "cutoff": None}
+    cutoff = add_months(month_start(now or datetime.utcnow()), -months)
+    columns = [c.name for c in Transaction.__table__.columns]
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    archived = 0
+
+    if is_partitioned(db):
+        for name, month in _monthly_partitions(db):
+            if add_months(month, 1) > cutoff:
+                break
+            db.execute(text(f"ALTER TABLE transactions DETACH PARTITION {name}"))
+            archived += db.execute(
+                text(f"INSERT INTO transactions_archive ({column_list}) SELECT {column_list} FROM {name}")
+            ).rowcount
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+
+    # Unpartitioned table, or rows left in the Postgres default partition
+    live = Transaction.__table__
+    while True:
+        oldest = db.execute(select(func.min(live.c.created_at))).scalar()
+        if oldest is None or oldest >= cutoff:
+            break
+        upper = min(add_months(month_start(oldest), 1), cutoff)
+        archived += db.execute(
+            insert(TransactionArchive.__table__).from_select(
+                columns, select(*(live.c[c] for c in columns)).where(live.c.created_at < upper)
+            )
+        ).rowcount
+        db.execute(delete(live).where(live.c.created_at < upper))
+        db.commit()
+
+    if archived:
+        logger.info("Archived %d transactions older than %s", archived, cutoff.date())
+    return {"archived": archived, "cutoff": cutoff}
+
+
+def archive_horizon(db: Session) -> datetime | None:
+    """Newest archived created_at (None when nothing is archived). Live rows are newer."""
+    return db.execute(select(func.max(TransactionArchive.created_at))).scalar()
+
+
+def transaction_source(db: Session, since: datetime | None = None):
+    """
+    Selectable with the transactions columns for rows created at or after since
+    (None = all time): the live table, or live UNION ALL archive when the range
+    reaches archived data. Query it through .c like Transaction.__table__.
+    """
+    live = Transaction.__table__
+    horizon = archive_horizon(db)
+    if horizon is None or (since is not None and since > horizon):
+        return live
+    archive = TransactionArchive.__table__
+    return union_all(
+        select(live),
+        select(*(archive.c[c.name] for c in live.columns)),
+    ).subquery("transactions_all")
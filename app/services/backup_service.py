@@ -1,18 +1,27 @@
-"""Backup and restore service for admin."""
-from decimal import Decimal
+"""Backup and restore service for admin. Backup files hold decimal Karma amounts."""
 from uuid import UUID
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from app.models import User, Wallet, Transaction, Referral, ProtocolState, ProtocolBlock
+from app.core.money import to_karma, to_milli
+from app.models import (
+    User, Wallet, WalletShard, Transaction, TransactionArchive, Posting, Referral, ProtocolState, ProtocolBlock,
+)
+from app.services.ledger_service import opening_legs, record_postings
+from app.services.balance_cache_service import balance_cache
+from app.services.user_service import identity_cache, telegram_id_cache
+from app.services.wallet_shard_service import shard_balances
 from app.db.session import Base, engine
 
 
 def export_backup(db: Session) -> dict:
     """Export full DB state as JSON-serializable dict."""
     users = []
-    for u in db.query(User).all():
+    all_users = db.query(User).all()
+    # The export reads every user anyway; keep the UUID -> telegram id cache warm with it
+    telegram_id_cache.put_many({u.id: u.telegram_user_id for u in all_users})
+    for u in all_users:
         users.append({
             "id": str(u.id),
             "telegram_user_id": u.telegram_user_id,
@@ -21,23 +30,27 @@ def export_backup(db: Session) -> dict:
             "is_event_wallet": u.is_event_wallet,
         })
     wallets = []
-    for w in db.query(Wallet).all():
+    all_wallets = db.query(Wallet).all()
+    # Sharded wallets are exported with shards folded in (restored unsharded)
+    sharded = shard_balances(db, [w.id for w in all_wallets if w.shard_count])
+    for w in all_wallets:
         wallets.append({
             "user_id": str(w.user_id),
-            "karma_balance": float(w.karma_balance),
-            "chiliz_balance": float(w.chiliz_balance),
-            "staked_amount": float(w.staked_amount),
-            "rewards_earned": float(w.rewards_earned),
+            "karma_balance": to_karma(w.karma_balance + sharded.get(w.id, 0)),
+            "chiliz_balance": to_karma(w.chiliz_balance),
+            "staked_amount": to_karma(w.staked_amount),
+            "rewards_earned": to_karma(w.rewards_earned),
         })
     transactions = []
-    for t in db.query(Transaction).all():
+    # Archived rows are exported too; a restore puts everything back in the live table
+    for t in [*db.query(TransactionArchive).all(), *db.query(Transaction).all()]:
         transactions.append({
             "type": t.type.value,
             "actor_user_id": str(t.actor_user_id) if t.actor_user_id else None,
             "from_user_id": str(t.from_user_id) if t.from_user_id else None,
             "to_user_id": str(t.to_user_id) if t.to_user_id else None,
-            "amount_karma": float(t.amount_karma) if t.amount_karma else None,
-            "amount_chiliz": float(t.amount_chiliz) if t.amount_chiliz else None,
+            "amount_karma": to_karma(t.amount_karma) if t.amount_karma else None,
+            "amount_chiliz": to_karma(t.amount_chiliz) if t.amount_chiliz else None,
             "meta": t.meta,
         })
     referrals = []
@@ -53,14 +66,14 @@ def export_backup(db: Session) -> dict:
         protocol_state = {
             "last_processed_ts": ps.last_processed_ts.isoformat() if ps.last_processed_ts else None,
             "last_emitted_block_id": ps.last_emitted_block_id,
-            "deferred_rewards": float(ps.deferred_rewards or 0),
+            "deferred_rewards": to_karma(ps.deferred_rewards),
         }
     protocol_blocks = []
     for pb in db.query(ProtocolBlock).all():
         protocol_blocks.append({
             "block_id": pb.block_id,
             "emitted_at": pb.emitted_at.isoformat() if pb.emitted_at else None,
-            "reward_total": float(pb.reward_total),
+            "reward_total": to_karma(pb.reward_total),
             "processed_tx_count": pb.processed_tx_count,
         })
     return {
@@ -76,10 +89,13 @@ def export_backup(db: Session) -> dict:
 def restore_backup(db: Session, data: dict) -> dict:
     """
     Restore from backup. Replaces all data.
-    Clears existing tables then inserts from backup.
+    Clears existing tables then inserts from backup; postings restart from opening balances.
     """
     db.query(Referral).delete()
+    db.query(Posting).delete()
     db.query(Transaction).delete()
+    db.query(TransactionArchive).delete()
+    db.query(WalletShard).delete()
     db.query(Wallet).delete()
     db.query(User).delete()
     db.query(ProtocolBlock).delete()
@@ -90,6 +106,10 @@ def restore_backup(db: Session, data: dict) -> dict:
         ps.deferred_rewards = 0
     db.commit()
     db.expire_all()
+    # Restored users may reuse UUIDs with different telegram ids
+    telegram_id_cache.clear()
+    identity_cache.clear()
+    balance_cache.clear()
 
     user_id_map = {}
     for u_data in data.get("users", []):
@@ -107,10 +127,10 @@ def restore_backup(db: Session, data: dict) -> dict:
     for w_data in data.get("wallets", []):
         w = Wallet(
             user_id=UUID(w_data["user_id"]),
-            karma_balance=Decimal(str(w_data["karma_balance"])),
-            chiliz_balance=Decimal(str(w_data["chiliz_balance"])),
-            staked_amount=Decimal(str(w_data["staked_amount"])),
-            rewards_earned=Decimal(str(w_data["rewards_earned"])),
+            karma_balance=to_milli(w_data["karma_balance"]),
+            chiliz_balance=to_milli(w_data["chiliz_balance"]),
+            staked_amount=to_milli(w_data["staked_amount"]),
+            rewards_earned=to_milli(w_data["rewards_earned"]),
         )
         db.add(w)
     db.flush()
@@ -121,8 +141,8 @@ def restore_backup(db: Session, data: dict) -> dict:
             actor_user_id=UUID(t_data["actor_user_id"]) if t_data.get("actor_user_id") else None,
             from_user_id=UUID(t_data["from_user_id"]) if t_data.get("from_user_id") else None,
             to_user_id=UUID(t_data["to_user_id"]) if t_data.get("to_user_id") else None,
-            amount_karma=Decimal(str(t_data["amount_karma"])) if t_data.get("amount_karma") is not None else None,
-            amount_chiliz=Decimal(str(t_data["amount_chiliz"])) if t_data.get("amount_chiliz") is not None else None,
+            amount_karma=to_milli(t_data["amount_karma"]) if t_data.get("amount_karma") is not None else None,
+            amount_chiliz=to_milli(t_data["amount_chiliz"]) if t_data.get("amount_chiliz") is not None else None,
             meta=t_data.get("meta"),
         )
         db.add(t)
@@ -144,7 +164,9 @@ def restore_backup(db: Session, data: dict) -> dict:
             from datetime import datetime
             ps.last_processed_ts = datetime.fromisoformat(ps_data["last_processed_ts"]) if ps_data.get("last_processed_ts") else None
             ps.last_emitted_block_id = ps_data.get("last_emitted_block_id")
-            ps.deferred_rewards = Decimal(str(ps_data.get("deferred_rewards", 0)))
+            ps.deferred_rewards = to_milli(ps_data.get("deferred_rewards", 0))
 
+    # Backups carry balances, not postings: the restored ledger starts from opening balances
+    record_postings(db, opening_legs(db))
     db.commit()
     return {"message": "Restore complete", "users": len(data.get("users", []))}
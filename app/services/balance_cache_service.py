@@ -0,0 +1,98 @@
+"""Write-through balance cache for the read-heavy balance endpoints.
+
+Keyed by wallet id, holding milli-unit balances {"karma", "staked", "chiliz",
+"rewards"} (karma includes shards). Wallet mutations note each wallet they
+change on the session (note_balance); when that session commits, wallets with
+a known post-update snapshot (update_wallet with RETURNING) are written through
+and the rest are invalidated. Rollbacks drop the notes.
+
+Entries written by this worker are fresh immediately (read-your-writes for the
+acting user); other entries live BALANCE_CACHE_TTL_SECONDS. With Redis, writes
+also go to the shared tier (from TieredCache's writer thread, never the commit
+itself) and owners' reads check it first.
+
+Entries carry the wallet version they were read at and are only replaced by a
+newer one, so a read that started before a commit can't overwrite that commit's
+snapshot. Invalidations leave a tombstone that read fills can't replace (the
+next write-through can); until it expires those reads go to the DB.
+"""
+from uuid import UUID
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.core.cache import LRUCache, TieredCache
+from app.models import Wallet
+
+_settings = get_settings()
+balance_cache = TieredCache(
+    LRUCache(
+        _settings.balance_cache_size if _settings.balance_cache_ttl_seconds > 0 else 0,
+        ttl=_settings.balance_cache_ttl_seconds,
+    ),
+    redis_url=_settings.redis_url if _settings.balance_cache_ttl_seconds > 0 else None,
+    prefix="balance:",
+    redis_ttl=max(1, _settings.balance_cache_ttl_seconds),
+)
+
+_PENDING_KEY = "balance_cache_writes"
+
+
+# Left by invalidations; reads treat it as a miss
+_TOMBSTONE = {"stale": True}
+
+
+def snapshot(wallet: Wallet, karma: int | None = None) -> dict:
+    """Cache entry for wallet; karma overrides the main-row balance (sharded wallets)."""
+    return {
+        "karma": wallet.karma_balance if karma is None else karma,
+        "staked": wallet.staked_amount,
+        "chiliz": wallet.chiliz_balance,
+        "rewards": wallet.rewards_earned,
+        "version": wallet.version,
+    }
+
+
+def _older_than(value: dict):
+    """replace() test for put_if: the entry there is a snapshot of an older version."""
+    return lambda current: "version" in current and current["version"] < value["version"]
+
+
+def fill_balance(wallet_id: UUID, value: dict) -> None:
+    """Cache balances just read from the DB (with their "version"), unless a newer entry or a tombstone is there."""
+    balance_cache.put_if(wallet_id, value, _older_than(value))
+
+
+def note_balance(db: Session, wallet_id: UUID, wallet: Wallet | None = None) -> None:
+    """
+    Record that wallet_id's balances changed in db's transaction. Pass wallet when the
+    instance holds the exact post-update balances (written through on commit); otherwise
+    the entry is invalidated on commit.
+    """
+    value = snapshot(wallet) if wallet is not None and not wallet.shard_count else None
+    db.info.setdefault(_PENDING_KEY, {})[wallet_id] = value
+
+
+def get_cached_balance(wallet_id: UUID, own: bool = False) -> dict | None:
+    """Cached entry for wallet_id (own: the owner is reading, prefer the shared tier)."""
+    value = balance_cache.get(wallet_id, shared_first=own)
+    return None if value is None or "version" not in value else value
+
+
+@event.listens_for(Session, "after_commit")
+def _write_through(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for wallet_id, value in pending.items():
+        if value is None:
+            balance_cache.put(wallet_id, _TOMBSTONE)
+        else:
+            older = _older_than(value)
+            balance_cache.put_if(wallet_id, value, lambda current: "version" not in current or older(current))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,5 +1,8 @@
-"""Protocol emission engine. Block-based reward distribution from usage score."""
-from decimal import Decimal
+"""Protocol emission engine. Block-based reward distribution from usage score.
+
+Rewards, splits and shares are integer milli-Karma; shares are floored so a
+block never distributes more than its bucket.
+"""
 from datetime import datetime
 from math import sqrt
 
@@ -7,9 +10,13 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
+from app.core.money import MILLI, to_karma, to_milli
 from app.models import User, Wallet, Transaction
 from app.models.protocol import ProtocolState, ProtocolBlock
 from app.models.transaction import TransactionType
+from app.services.ledger_service import issue, record_postings
+from app.services.wallet_service import update_wallet
+from app.services.wallet_shard_service import credit_karma, ensure_shards
 
 
 # System bucket telegram_user_ids (reserved negative)
@@ -27,15 +34,12 @@ BUCKETS = [
     (BUCKET_ELIGIBLE, "bucket_eligible"),
 ]
 
-SPLIT_STAKERS = Decimal("0.10")
-SPLIT_DEVCO = Decimal("0.15")
-SPLIT_VALIDATORS = Decimal("0.05")
-SPLIT_FOUNDATION = Decimal("0.10")
-SPLIT_ELIGIBLE = Decimal("0.60")
-
-
-def _round_karma(v: Decimal) -> Decimal:
-    return round(v, 3)
+# Block reward split, percent of R
+SPLIT_STAKERS = 10
+SPLIT_DEVCO = 15
+SPLIT_VALIDATORS = 5
+SPLIT_FOUNDATION = 10
+SPLIT_ELIGIBLE = 60
 
 
 def _ensure_buckets_exist(db: Session) -> dict[int, User]:
@@ -68,10 +72,10 @@ def _get_protocol_state(db: Session) -> ProtocolState:
     return state
 
 
-def _usage_score_and_eligible(db: Session, since: datetime) -> tuple[Decimal, list[tuple[User, Decimal]]]:
+def _usage_score_and_eligible(db: Session, since: datetime) -> tuple[float, list[tuple[User, float]]]:
     """
     Compute total usage score S and eligible receivers (to_user_id from SEND).
-    Per receiver: sum(amount_karma) * sqrt(tx_count)
+    Per receiver: sum(amount_karma) * sqrt(tx_count), in milli-Karma
     Returns (S, [(user, score), ...])
     """
     rows = (
@@ -86,16 +90,15 @@ def _usage_score_and_eligible(db: Session, since: datetime) -> tuple[Decimal, li
         .group_by(Transaction.to_user_id)
         .all()
     )
-    total_s = Decimal("0")
-    eligible: list[tuple[User, Decimal]] = []
+    total_s = 0.0
+    eligible: list[tuple[User, float]] = []
     for to_user_id, total_amt, cnt in rows:
         if not to_user_id or cnt == 0:
             continue
         user = db.query(User).filter(User.id == to_user_id).first()
         if not user or user.is_system_wallet:
             continue
-        total = Decimal(str(float(total_amt)))
-        score = total * Decimal(str(sqrt(int(cnt))))
+        score = int(total_amt) * sqrt(int(cnt))
         total_s += score
         eligible.append((user, score))
     return total_s, eligible
@@ -111,8 +114,8 @@ def run_emission_once(db: Session) -> dict:
     """
     settings = get_settings()
     K = settings.protocol_k
-    min_reward = Decimal(str(settings.protocol_min_reward))
-    max_reward = Decimal(str(settings.protocol_max_reward))
+    min_reward = to_milli(settings.protocol_min_reward)
+    max_reward = to_milli(settings.protocol_max_reward)
 
     _ensure_buckets_exist(db)
     state = _get_protocol_state(db)
@@ -127,8 +130,8 @@ def run_emission_once(db: Session) -> dict:
         or 0
     )
 
-    r_raw = total_s / K if K else Decimal("0")
-    deferred = Decimal(str(float(state.deferred_rewards or 0)))
+    r_raw = round(total_s / K) if K else 0
+    deferred = state.deferred_rewards or 0
     if r_raw > max_reward:
         deferred += r_raw - max_reward
         r_raw = max_reward
@@ -145,14 +148,15 @@ def run_emission_once(db: Session) -> dict:
         }
 
     block_id = (state.last_emitted_block_id or 0) + 1
-    amt_stakers = r * SPLIT_STAKERS
-    amt_devco = r * SPLIT_DEVCO
-    amt_validators = r * SPLIT_VALIDATORS
-    amt_foundation = r * SPLIT_FOUNDATION
-    amt_eligible = r * SPLIT_ELIGIBLE
+    amt_stakers = r * SPLIT_STAKERS // 100
+    amt_devco = r * SPLIT_DEVCO // 100
+    amt_validators = r * SPLIT_VALIDATORS // 100
+    amt_foundation = r * SPLIT_FOUNDATION // 100
+    amt_eligible = r * SPLIT_ELIGIBLE // 100
 
     buckets = _ensure_buckets_exist(db)
     now = datetime.utcnow()
+    legs = []
 
     # Credit buckets (devco, validators, foundation hold; stakers & eligible distribute immediately)
     for tg_id, amt in [
@@ -163,15 +167,19 @@ def run_emission_once(db: Session) -> dict:
         u = buckets[tg_id]
         w = db.query(Wallet).filter(Wallet.user_id == u.id).first()
         if w:
-            w.karma_balance += _round_karma(amt)
+            # Hot buckets are written every block; optionally spread over shard rows
+            if settings.bucket_wallet_shards and w.shard_count != settings.bucket_wallet_shards:
+                ensure_shards(db, w, settings.bucket_wallet_shards)
+            credit_karma(db, w, amt)
         tx = Transaction(
             type=TransactionType.PROTOCOL_EMISSION,
             to_user_id=u.id,
-            amount_karma=_round_karma(amt),
+            amount_karma=amt,
             block_id=block_id,
             meta={"bucket": u.username},
         )
         db.add(tx)
+        legs += issue(tx, u.id, amt)
 
     # Distribute stakers bucket pro-rata to stakers
     total_staked = (
@@ -180,9 +188,9 @@ def run_emission_once(db: Session) -> dict:
         .filter(User.is_system_wallet == False)
         .filter(Wallet.staked_amount > 0)
         .scalar()
-        or Decimal("0")
+        or 0
     )
-    stakers_distributed = Decimal("0")
+    stakers_distributed = 0
     if total_staked and total_staked > 0 and amt_stakers > 0:
         stakers = (
             db.query(User, Wallet)
@@ -192,45 +200,44 @@ def run_emission_once(db: Session) -> dict:
             .all()
         )
         for user, w in stakers:
-            share = (w.staked_amount / total_staked) * amt_stakers
-            share = _round_karma(share)
+            share = w.staked_amount * amt_stakers // int(total_staked)
             if share <= 0:
                 continue
-            w.karma_balance += share
-            w.rewards_earned += share
+            # Conditional credit: a stake/swap/send committed since the read is not overwritten
+            update_wallet(db, w, karma=share, rewards=share, check_version=False)
             stakers_distributed += share
-            db.add(
-                Transaction(
-                    type=TransactionType.STAKE_REWARD,
-                    to_user_id=user.id,
-                    amount_karma=share,
-                    block_id=block_id,
-                    meta={"emission_block": block_id},
-                )
+            tx = Transaction(
+                type=TransactionType.STAKE_REWARD,
+                to_user_id=user.id,
+                amount_karma=share,
+                block_id=block_id,
+                meta={"emission_block": block_id},
             )
+            db.add(tx)
+            legs += issue(tx, user.id, share)
 
     # Distribute eligible bucket pro-rata by usage score
-    eligible_distributed = Decimal("0")
+    eligible_distributed = 0
     if total_s and total_s > 0 and amt_eligible > 0 and eligible:
         for user, score in eligible:
-            share = (score / total_s) * amt_eligible
-            share = _round_karma(share)
+            share = int(amt_eligible * score / total_s)
             if share <= 0:
                 continue
             w = db.query(Wallet).filter(Wallet.user_id == user.id).first()
             if w:
-                w.karma_balance += share
-                w.rewards_earned += share
+                update_wallet(db, w, karma=share, rewards=share, check_version=False)
             eligible_distributed += share
-            db.add(
-                Transaction(
-                    type=TransactionType.PROTOCOL_EMISSION,
-                    to_user_id=user.id,
-                    amount_karma=share,
-                    block_id=block_id,
-                    meta={"eligible_reward": True},
-                )
+            tx = Transaction(
+                type=TransactionType.PROTOCOL_EMISSION,
+                to_user_id=user.id,
+                amount_karma=share,
+                block_id=block_id,
+                meta={"eligible_reward": True},
             )
+            db.add(tx)
+            legs += issue(tx, user.id, share)
+
+    record_postings(db, legs)
 
     # Update state
     state.last_processed_ts = now
@@ -241,16 +248,16 @@ def run_emission_once(db: Session) -> dict:
     pb = ProtocolBlock(
         block_id=block_id,
         emitted_at=now,
-        reward_total=float(r),
+        reward_total=r,
         splits_applied={
-            "stakers": float(amt_stakers),
-            "devco": float(amt_devco),
-            "validators": float(amt_validators),
-            "foundation": float(amt_foundation),
-            "eligible": float(amt_eligible),
-            "stakers_distributed": float(stakers_distributed),
-            "eligible_distributed": float(eligible_distributed),
-            "deferred": float(deferred),
+            "stakers": to_karma(amt_stakers),
+            "devco": to_karma(amt_devco),
+            "validators": to_karma(amt_validators),
+            "foundation": to_karma(amt_foundation),
+            "eligible": to_karma(amt_eligible),
+            "stakers_distributed": to_karma(stakers_distributed),
+            "eligible_distributed": to_karma(eligible_distributed),
+            "deferred": to_karma(deferred),
         },
         processed_tx_count=tx_count,
     )
@@ -259,18 +266,18 @@ def run_emission_once(db: Session) -> dict:
 
     return {
         "block_id": block_id,
-        "reward_total": float(r),
-        "usage_score": float(total_s),
+        "reward_total": to_karma(r),
+        "usage_score": total_s / MILLI,
         "splits": {
-            "stakers": float(amt_stakers),
-            "devco": float(amt_devco),
-            "validators": float(amt_validators),
-            "foundation": float(amt_foundation),
-            "eligible": float(amt_eligible),
+            "stakers": to_karma(amt_stakers),
+            "devco": to_karma(amt_devco),
+            "validators": to_karma(amt_validators),
+            "foundation": to_karma(amt_foundation),
+            "eligible": to_karma(amt_eligible),
         },
-        "stakers_distributed": float(stakers_distributed),
-        "eligible_distributed": float(eligible_distributed),
-        "deferred": float(deferred),
+        "stakers_distributed": to_karma(stakers_distributed),
+        "eligible_distributed": to_karma(eligible_distributed),
+        "deferred": to_karma(deferred),
         "processed_tx_count": tx_count,
         "message": f"Emission block {block_id} completed",
     }
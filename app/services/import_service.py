@@ -0,0 +1,304 @@
+"""Bulk user import (migration from the previous platform version).
+
+The admin endpoint streams NDJSON or CSV records; they are validated and
+inserted in chunks of USER_IMPORT_CHUNK_SIZE, one DB transaction per chunk:
+users, wallets (with starting balances), opening postings and referral links,
+each with one bulk statement. On Postgres users and wallets are loaded with
+COPY into a temp staging table first. Inserts skip rows that already exist
+(ON CONFLICT DO NOTHING), so re-running an import is a no-op for users already
+imported. Referrals whose inviter appears later in the file are retried at the end.
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime
+from typing import AsyncIterator, Callable
+from uuid import uuid4
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.core.money import to_milli
+from app.db.session import SessionLocal
+from app.models import Referral, User, Wallet
+from app.models.posting import Asset
+from app.schemas.user import ImportUserRecord
+from app.services.ledger_service import issue, record_postings
+
+# Errors listed in the final report (all are counted)
+MAX_REPORTED_ERRORS = 100
+# Request bodies are buffered in memory up to this size, then in a temp file
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+READ_SIZE = 64 * 1024
+
+_USER_COLUMNS = ("id", "telegram_user_id", "username", "created_at", "updated_at", "is_system_wallet", "is_event_wallet")
+_WALLET_COLUMNS = ("id", "user_id", "karma_balance", "staked_amount", "chiliz_balance", "rewards_earned", "updated_at")
+
+
+class _Pending:
+    """A referral whose inviter has not been imported yet."""
+
+    __slots__ = ("invitee", "inviter", "rewarded")
+
+    def __init__(self, invitee: int, inviter: int, rewarded: bool):
+        self.invitee = invitee
+        self.inviter = inviter
+        self.rewarded = rewarded
+
+
+def parse_record(line: str, fmt: str, header: list[str] | None) -> ImportUserRecord:
+    """Validate one NDJSON line or CSV row (against header). Raises ValueError."""
+    if fmt == "csv":
+        values = next(csv.reader([line]))
+        data = {k: v for k, v in zip(header, values) if v != ""}
+    else:
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+    try:
+        return ImportUserRecord.model_validate(data)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())) from e
+
+
+def _insert(db: Session, table):
+    return (pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert)(table)
+
+
+def _copy_staged(db: Session, table: str, columns: tuple, rows: list[dict], conflict: str, returning: str) -> list:
+    """
+    Postgres: COPY rows into a temp copy of table, then move them over with
+    INSERT ... SELECT ... ON CONFLICT (conflict) DO NOTHING RETURNING returning.
+    """
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    staging = f"import_{table}"
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if row[c] is None else row[c] for c in columns])
+    buf.seek(0)
+    column_list = ", ".join(columns)
+    cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buf)
+    cursor.execute(
+        f"INSERT INTO {table} SELECT * FROM {staging} ON CONFLICT ({conflict}) DO NOTHING RETURNING {returning}"
+    )
+    inserted = cursor.fetchall()
+    cursor.execute(f"TRUNCATE {staging}")
+    return inserted
+
+
+def _bulk_insert(db: Session, model, columns: tuple, rows: list[dict], conflict: str, returning: str) -> list:
+    """Insert rows skipping conflicts on conflict; returns the returning column of rows inserted."""
+    if not rows:
+        return []
+    if db.get_bind().dialect.driver == "psycopg2":
+        return [r[0] for r in _copy_staged(db, model.__tablename__, columns, rows, conflict, returning)]
+    table = model.__table__
+    stmt = _insert(db, table).on_conflict_do_nothing(index_elements=[conflict]).returning(table.c[returning])
+    return [r[0] for r in db.execute(stmt, rows)]
+
+
+def _link_referrals(db: Session, links: list[_Pending]) -> tuple[int, list[_Pending]]:
+    """Insert referral rows for links whose users exist. Returns (created, links still missing a user)."""
+    if not links:
+        return 0, []
+    wanted = {link.invitee for link in links} | {link.inviter for link in links}
+    ids = dict(db.execute(select(User.telegram_user_id, User.id).where(User.telegram_user_id.in_(wanted))).all())
+    rows, missing = [], []
+    for link in links:
+        if link.invitee in ids and link.inviter in ids:
+            rows.append({
+                "id": uuid4(),
+                "invitee_user_id": ids[link.invitee],
+                "inviter_user_id": ids[link.inviter],
+                "rewarded": link.rewarded,
+                "created_at": datetime.utcnow(),
+            })
+        else:
+            missing.append(link)
+    if not rows:
+        return 0, missing
+    table = Referral.__table__
+    stmt = _insert(db, table).on_conflict_do_nothing(index_elements=["invitee_user_id"]).returning(table.c.id)
+    return len(db.execute(stmt, rows).all()), missing
+
+
+def import_user_chunk(db: Session, records: list[ImportUserRecord]) -> dict:
+    """
+    Import one chunk in the current transaction (no commit). Returns {"created",
+    "skipped", "referrals", "pending"} where pending are referrals to retry later.
+    """
+    by_id: dict[int, ImportUserRecord] = {}
+    for record in records:
+        by_id.setdefault(int(record.user_id), record)  # first occurrence wins
+
+    now = datetime.utcnow()
+    user_rows = [
+        {
+            "id": uuid4(),
+            "telegram_user_id": tg_id,
+            "username": record.username,
+            "created_at": now,
+            "updated_at": now,
+            "is_system_wallet": False,
+            "is_event_wallet": False,
+        }
+        for tg_id, record in by_id.items()
+    ]
+    created_ids = set(_bulk_insert(db, User, _USER_COLUMNS, user_rows, "telegram_user_id", "telegram_user_id"))
+    user_ids = {row["telegram_user_id"]: row["id"] for row in user_rows if row["telegram_user_id"] in created_ids}
+
+    wallet_rows, legs = [], []
+    for tg_id, user_id in user_ids.items():
+        record = by_id[tg_id]
+        balances = {
+            Asset.KARMA: to_milli(record.karma),
+            Asset.STAKED: to_milli(record.staked),
+            Asset.CHILIZ: to_milli(record.chiliz),
+        }
+        wallet_rows.append({
+            "id": uuid4(),
+            "user_id": user_id,
+            "karma_balance": balances[Asset.KARMA],
+            "staked_amount": balances[Asset.STAKED],
+            "chiliz_balance": balances[Asset.CHILIZ],
+            "rewards_earned": 0,
+            "updated_at": now,
+        })
+        legs += [leg for asset, amount in balances.items() if amount for leg in issue(None, user_id, amount, asset)]
+    _bulk_insert(db, Wallet, _WALLET_COLUMNS, wallet_rows, "user_id", "id")
+    record_postings(db, legs)
+
+    links = [
+        _Pending(tg_id, int(record.invited_by), record.referral_rewarded)
+        for tg_id, record in by_id.items()
+        if record.invited_by and int(record.invited_by) != tg_id
+    ]
+    referrals, pending = _link_referrals(db, links)
+    return {
+        "created": len(user_ids),
+        "skipped": len(records) - len(user_ids),
+        "referrals": referrals,
+        "pending": pending,
+    }
+
+
+async def spool_body(stream: AsyncIterator[bytes]):
+    """
+    Read a whole request body into a SpooledTemporaryFile (rewound). The body has to be
+    consumed before a StreamingResponse starts: once it does, Starlette listens for
+    client disconnects on the same receive channel and would take the body messages.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    try:
+        async for chunk in stream:
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    spooled.seek(0)
+    return spooled
+
+
+async def iter_spooled(spooled) -> AsyncIterator[bytes]:
+    """Yield a spooled body in READ_SIZE pieces, closing it at the end."""
+    try:
+        while chunk := spooled.read(READ_SIZE):
+            yield chunk
+    finally:
+        spooled.close()
+
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buf = b""
+    async for chunk in body:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if buf:
+        yield buf.decode("utf-8-sig").rstrip("\r")
+
+
+def _run_in_session(session_factory: sessionmaker, work: Callable[[Session], dict]) -> dict:
+    db = session_factory()
+    try:
+        result = work(db)
+        db.commit()
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def import_users_stream(
+    body: AsyncIterator[bytes],
+    fmt: str = "ndjson",
+    chunk_size: int | None = None,
+    session_factory: sessionmaker = SessionLocal,
+) -> AsyncIterator[dict]:
+    """
+    Import users from an NDJSON/CSV byte stream. Yields a progress dict after each
+    chunk, then a final report with "done": True. Invalid records are counted and
+    reported by line number; they do not stop the import.
+    """
+    chunk_size = chunk_size or get_settings().user_import_chunk_size
+    totals = {"processed": 0, "created": 0, "skipped": 0, "failed": 0, "referrals": 0}
+    errors: list[dict] = []
+    pending: list[_Pending] = []
+    header = None
+    batch: list[ImportUserRecord] = []
+
+    async def flush():
+        result = await run_in_threadpool(
+            _run_in_session, session_factory, lambda db: import_user_chunk(db, batch)
+        )
+        totals["processed"] += len(batch)
+        totals["created"] += result["created"]
+        totals["skipped"] += result["skipped"]
+        totals["referrals"] += result["referrals"]
+        pending.extend(result["pending"])
+        batch.clear()
+
+    line_no = 0
+    async for line in _lines(body):
+        line_no += 1
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [h.strip() for h in next(csv.reader([line]))]
+            continue
+        try:
+            batch.append(parse_record(line, fmt, header))
+        except ValueError as e:
+            totals["failed"] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line_no, "error": str(e)})
+            continue
+        if len(batch) >= chunk_size:
+            await flush()
+            yield {**totals}
+    if batch:
+        await flush()
+        yield {**totals}
+
+    # Inviters that appeared after their invitees
+    unresolved = 0
+    for start in range(0, len(pending), chunk_size):
+        result = await run_in_threadpool(
+            _run_in_session,
+            session_factory,
+            lambda db: dict(zip(("created", "missing"), _link_referrals(db, pending[start:start + chunk_size]))),
+        )
+        totals["referrals"] += result["created"]
+        unresolved += len(result["missing"])
+    yield {**totals, "referrals_unresolved": unresolved, "errors": errors, "done": True}
@@ -0,0 +1,197 @@
+"""Double-entry postings ledger.
+
+Every service that writes a Transaction also writes its postings: one signed
+line per account and asset, summing to zero per transaction. Money entering or
+leaving the platform (mint, rewards, bonuses) is balanced by an issuance leg
+(account_id NULL), so sum(issuance) == -total supply.
+
+Postings are recorded after the wallet updates, in the same DB transaction.
+The updated wallet rows stay locked until commit, so the running balance read
+back here is exact and seq order matches balance order per account.
+"""
+from typing import NamedTuple
+from uuid import UUID
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.money import to_karma
+from app.models import Posting, Transaction, Wallet
+from app.models.posting import Asset
+from app.services.user_service import load_by_identity, resolve_telegram_ids
+from app.services.wallet_shard_service import shard_balances
+
+_BALANCE_COLUMNS = {
+    Asset.KARMA: Wallet.karma_balance,
+    Asset.STAKED: Wallet.staked_amount,
+    Asset.CHILIZ: Wallet.chiliz_balance,
+}
+
+
+class Leg(NamedTuple):
+    """One posting to record. tx may be an unflushed Transaction (its id is read at record time)."""
+
+    tx: Transaction | UUID | None
+    account_id: UUID | None
+    asset: Asset
+    amount: int
+
+
+def transfer(tx, from_id: UUID, to_id: UUID, amount: int, asset: Asset = Asset.KARMA) -> list[Leg]:
+    """Move amount between two accounts."""
+    return [Leg(tx, from_id, asset, -amount), Leg(tx, to_id, asset, amount)]
+
+
+def issue(tx, account_id: UUID, amount: int, asset: Asset = Asset.KARMA) -> list[Leg]:
+    """Credit amount to an account from issuance (negative amount returns it)."""
+    return [Leg(tx, account_id, asset, amount), Leg(tx, None, asset, -amount)]
+
+
+def convert(tx, account_id: UUID, from_asset: Asset, to_asset: Asset, amount: int) -> list[Leg]:
+    """Move amount between two balances of one account (stake, unstake, 1:1 swap)."""
+    return [Leg(tx, account_id, from_asset, -amount), Leg(tx, account_id, to_asset, amount)]
+
+
+def record_postings(db: Session, legs: list[Leg], wallets=()) -> None:
+    """
+    Insert postings for legs, in order, with running balances taken from the
+    (already updated) wallets. Call after the operation's wallet updates; no commit.
+    wallets are instances holding post-update balances (see update_wallet); other
+    accounts are read back in one SELECT.
+    """
+    if not legs:
+        return
+    db.flush()
+    known = {w.user_id: w for w in wallets}
+    accounts = {leg.account_id for leg in legs if leg.account_id is not None} - known.keys()
+    rows = list(known.values())
+    if accounts:
+        rows += db.execute(
+            select(Wallet.user_id, Wallet.shard_count, *_BALANCE_COLUMNS.values())
+            .where(Wallet.user_id.in_(accounts))
+        ).all()
+
+    # Balance after the last leg, walked backwards to each earlier leg of the same account
+    running: dict[tuple, int | None] = {}
+    for row in rows:
+        for asset, col in _BALANCE_COLUMNS.items():
+            sharded = asset is Asset.KARMA and row.shard_count
+            running[(row.user_id, asset)] = None if sharded else getattr(row, col.key)
+    balances = []
+    for leg in reversed(legs):
+        key = (leg.account_id, leg.asset)
+        balance = running.get(key)
+        balances.append(balance)
+        if balance is not None:
+            running[key] = balance - leg.amount
+    balances.reverse()
+
+    db.execute(
+        insert(Posting),
+        [
+            {
+                "account_id": leg.account_id,
+                "tx_id": leg.tx.id if isinstance(leg.tx, Transaction) else leg.tx,
+                "asset": leg.asset,
+                "amount": leg.amount,
+                "balance": balance,
+            }
+            for leg, balance in zip(legs, balances)
+        ],
+    )
+
+
+def opening_legs(db: Session) -> list[Leg]:
+    """Issuance legs reproducing every current wallet balance (ledger start, restore)."""
+    wallets = db.execute(select(Wallet.id, Wallet.user_id, Wallet.shard_count, *_BALANCE_COLUMNS.values())).all()
+    sharded = shard_balances(db, [w.id for w in wallets if w.shard_count])
+    legs = []
+    for w in wallets:
+        for asset, col in _BALANCE_COLUMNS.items():
+            amount = getattr(w, col.key) + (sharded.get(w.id, 0) if asset is Asset.KARMA else 0)
+            if amount:
+                legs.extend(issue(None, w.user_id, amount, asset))
+    return legs
+
+
+def account_totals(db: Session, account_id: UUID) -> dict[Asset, int]:
+    """Sum of postings per asset for one account (milli-units)."""
+    rows = (
+        db.query(Posting.asset, func.coalesce(func.sum(Posting.amount), 0))
+        .filter(Posting.account_id == account_id)
+        .group_by(Posting.asset)
+        .all()
+    )
+    return {asset: int(total) for asset, total in rows}
+
+
+def verify_account(db: Session, telegram_user_id: int) -> dict:
+    """
+    Check a user's wallet against their postings: per asset, the wallet balance must
+    equal the postings total and (where tracked) the latest running balance.
+    """
+    def load(identity):
+        return db.execute(
+            select(Wallet.id, Wallet.user_id, Wallet.shard_count, *_BALANCE_COLUMNS.values())
+            .where(Wallet.user_id == identity.user_id)
+        ).first()
+
+    wallet = load_by_identity(db, telegram_user_id, load)
+    if not wallet:
+        return {"error": "User not found", "status": 404}
+    account_id = wallet.user_id
+    totals = account_totals(db, account_id)
+    sharded = shard_balances(db, [wallet.id]) if wallet.shard_count else {}
+    assets = {}
+    for asset, col in _BALANCE_COLUMNS.items():
+        held = getattr(wallet, col.key) + (sharded.get(wallet.id, 0) if asset is Asset.KARMA else 0)
+        last_balance = db.execute(
+            select(Posting.balance)
+            .where(Posting.account_id == account_id, Posting.asset == asset)
+            .order_by(Posting.seq.desc())
+            .limit(1)
+        ).scalar()
+        posted = totals.get(asset, 0)
+        assets[asset.value] = {
+            "wallet": to_karma(held),
+            "postings": to_karma(posted),
+            "last_balance": to_karma(last_balance) if last_balance is not None else None,
+            "ok": posted == held and last_balance in (None, held),
+        }
+    return {
+        "user_id": str(telegram_user_id),
+        "ok": all(a["ok"] for a in assets.values()),
+        "assets": assets,
+    }
+
+
+def get_postings(
+    db: Session,
+    after_seq: int = 0,
+    limit: int = 500,
+    account_id: UUID | None = None,
+) -> tuple[list[dict], int | None]:
+    """
+    Postings in seq order after after_seq (all accounts, or one). Returns
+    (postings, next_after_seq) where next_after_seq is None at the end of the stream.
+    """
+    q = db.query(Posting).filter(Posting.seq > after_seq)
+    if account_id is not None:
+        q = q.filter(Posting.account_id == account_id)
+    rows = q.order_by(Posting.seq).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    telegram_ids = resolve_telegram_ids(db, {p.account_id for p in rows if p.account_id})
+    postings = [
+        {
+            "seq": p.seq,
+            "tx_id": str(p.tx_id) if p.tx_id else None,
+            "account_id": str(telegram_ids.get(p.account_id, p.account_id)) if p.account_id else None,
+            "asset": p.asset.value,
+            "amount": to_karma(p.amount),
+            "balance": to_karma(p.balance) if p.balance is not None else None,
+            "created_at": p.created_at,
+        }
+        for p in rows
+    ]
+    return postings, rows[-1].seq if more else None
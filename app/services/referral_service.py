@@ -1,11 +1,16 @@
 """Referral service."""
-from decimal import Decimal
-
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
 
+from app.core.money import MILLI
+from app.core.rows import Projection
 from app.models import User, Referral, Transaction
 from app.models.transaction import TransactionType
-from app.services.wallet_service import round_karma
+from app.services.ledger_service import issue, record_postings
+from app.services.wallet_service import load_wallet_context, run_with_retries, update_wallet
+
+# Paid to the inviter when a referral is recorded
+INVITE_BONUS = 1 * MILLI
 
 
 def record_referral(db: Session, inviter_id: str, new_user_id: str) -> dict:
@@ -15,51 +20,55 @@ def record_referral(db: Session, inviter_id: str, new_user_id: str) -> dict:
     """
     if inviter_id == new_user_id:
         return {"error": "Cannot refer yourself", "status": 400}
+    return run_with_retries(db, lambda: _record_referral_once(db, inviter_id, new_user_id))
+
 
-    inviter = db.query(User).filter(User.telegram_user_id == int(inviter_id)).first()
-    invitee = db.query(User).filter(User.telegram_user_id == int(new_user_id)).first()
+def _record_referral_once(db: Session, inviter_id: str, new_user_id: str) -> dict:
+    parties = load_wallet_context(db, int(inviter_id), int(new_user_id))
+    inviter = parties.get(int(inviter_id))
+    invitee = parties.get(int(new_user_id))
 
     if not inviter or not invitee:
         return {"error": "User(s) not found", "status": 404}
 
-    if not inviter.wallet or not invitee.wallet:
-        return {"error": "Wallet(s) not found", "status": 404}
-
-    existing = db.query(Referral).filter(Referral.invitee_user_id == invitee.id).first()
-    if existing:
+    if invitee.referral:
         return {"message": "User already referred."}
 
-    ref = Referral(invitee_user_id=invitee.id, inviter_user_id=inviter.id)
+    ref = Referral(invitee_user_id=invitee.user.id, inviter_user_id=inviter.user.id)
     db.add(ref)
 
-    bonus = Decimal("1")
-    inviter.wallet.karma_balance += bonus
-    inviter.wallet.karma_balance = round_karma(inviter.wallet.karma_balance)
+    update_wallet(db, inviter.wallet, karma=INVITE_BONUS, check_version=False)
 
     tx = Transaction(
         type=TransactionType.REFERRAL_INVITE,
-        actor_user_id=inviter.id,
-        to_user_id=inviter.id,
-        amount_karma=bonus,
+        actor_user_id=inviter.user.id,
+        to_user_id=inviter.user.id,
+        amount_karma=INVITE_BONUS,
         meta={"invitee_telegram_id": new_user_id},
     )
     db.add(tx)
-    db.commit()
+    record_postings(db, issue(tx, inviter.user.id, INVITE_BONUS), wallets=(inviter.wallet,))
     return {"message": f"Referral from {inviter_id} to {new_user_id} recorded."}
 
 
-def get_referral_status(db: Session, user_id: str) -> dict:
-    """Get referral status for user (invited_by, rewarded)."""
-    user = db.query(User).filter(User.telegram_user_id == int(user_id)).first()
-    if not user:
-        return {"invited_by": None, "rewarded": False}
+class ReferralStatusRow(Projection):
+    __slots__ = ("rewarded", "inviter_telegram_id")
 
-    ref = db.query(Referral).filter(Referral.invitee_user_id == user.id).first()
-    if not ref:
-        return {"invited_by": None, "rewarded": False}
 
-    inviter = db.query(User).filter(User.id == ref.inviter_user_id).first()
+def get_referral_status(db: Session, user_id: str) -> dict:
+    """Get referral status for user (invited_by, rewarded). One query."""
+    invitee, inviter = aliased(User), aliased(User)
+    row = ReferralStatusRow.one(
+        db,
+        select(Referral.rewarded, inviter.telegram_user_id)
+        .select_from(invitee)
+        .join(Referral, Referral.invitee_user_id == invitee.id)
+        .outerjoin(inviter, inviter.id == Referral.inviter_user_id)
+        .where(invitee.telegram_user_id == int(user_id)),
+    )
+    if not row:
+        return {"invited_by": None, "rewarded": False}
     return {
-        "invited_by": str(inviter.telegram_user_id) if inviter else None,
-        "rewarded": ref.rewarded,
+        "invited_by": str(row.inviter_telegram_id) if row.inviter_telegram_id is not None else None,
+        "rewarded": row.rewarded,
     }
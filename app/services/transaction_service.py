@@ -1,63 +1,260 @@
 """Transaction history service."""
-from sqlalchemy import or_, desc, asc
-from sqlalchemy.orm import Session
+import base64
+import binascii
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator
+from uuid import UUID
 
-from app.models import User, Transaction
+from sqlalchemy import asc, desc, distinct, func, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.money import to_karma
+from app.db.session import SessionLocal
+from app.models import Transaction, TransactionArchive
 from app.models.transaction import TransactionType
+from app.services.archive_service import archive_horizon
+from app.services.user_service import get_identity, identity_cache, resolve_telegram_ids
 
 
-def get_user_transactions(
+Cursor = tuple[datetime, UUID]
+
+
+def encode_cursor(created_at: datetime, tx_id: UUID) -> str:
+    """Opaque keyset cursor for the row (created_at, id)."""
+    raw = f"{created_at.isoformat()}|{tx_id.hex}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Parse a cursor from encode_cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, tx_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(tx_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+_PARTY_COLUMNS = ("actor_user_id", "from_user_id", "to_user_id")
+
+
+def _user_transaction_ids(
     db: Session,
-    telegram_user_id: int,
-    limit: int = 50,
-    offset: int = 0,
-    sort: str = "desc",
-) -> tuple[list[dict], int]:
+    user_id: UUID,
+    window: int,
+    sort: str,
+    cursor: Cursor | None,
+    model=Transaction,
+):
     """
-    Get paginated transactions for a user.
-    Returns (transactions, total_count).
-    User is included if they are actor, from, or to.
+    UNION ALL of one (party_col, created_at, id) index range scan per party column,
+    each limited to the page window. Rows where the user is in several columns appear
+    more than once; callers dedupe with IN. model is Transaction or TransactionArchive.
     """
-    user = db.query(User).filter(User.telegram_user_id == telegram_user_id).first()
-    if not user:
-        return [], 0
+    order_fn = desc if sort == "desc" else asc
+    branches = []
+    for name in _PARTY_COLUMNS:
+        stmt = select(model.id, model.created_at).where(getattr(model, name) == user_id)
+        if cursor is not None:
+            key = tuple_(model.created_at, model.id)
+            stmt = stmt.where(key < cursor if sort == "desc" else key > cursor)
+        stmt = stmt.order_by(order_fn(model.created_at), order_fn(model.id)).limit(window)
+        # Wrapped so the per-branch ORDER BY/LIMIT is valid in a compound select on SQLite
+        branches.append(select(stmt.subquery()))
+    return union_all(*branches)
 
-    q = db.query(Transaction).filter(
-        or_(
-            Transaction.actor_user_id == user.id,
-            Transaction.from_user_id == user.id,
-            Transaction.to_user_id == user.id,
-        )
-    )
-    total = q.count()
 
+def _count_user_transactions(db: Session, user_id: UUID, model=Transaction) -> int:
+    """Exact count of distinct rows where the user is actor, from or to (index-only per branch)."""
+    ids = union_all(
+        *(select(model.id).where(getattr(model, name) == user_id) for name in _PARTY_COLUMNS)
+    ).subquery()
+    return db.execute(select(func.count(distinct(ids.c.id)))).scalar() or 0
+
+
+def _page_rows(db: Session, model, user_id: UUID, window: int, sort: str, cursor: Cursor | None) -> list:
+    """Up to window rows of model for the user, in page order."""
+    if window <= 0:
+        return []
     order_fn = desc if sort == "desc" else asc
-    rows = (
-        q.order_by(order_fn(Transaction.created_at))
-        .limit(limit)
-        .offset(offset)
+    ids = _user_transaction_ids(db, user_id, window, sort, cursor, model).subquery()
+    return (
+        db.query(model)
+        .filter(model.id.in_(select(ids.c.id)))
+        .order_by(order_fn(model.created_at), order_fn(model.id))
+        .limit(window)
         .all()
     )
 
-    # Resolve telegram_user_id for actor, from, to
-    telegram_map: dict[str, str] = {}
-    for tx in rows:
-        for uid in (tx.actor_user_id, tx.from_user_id, tx.to_user_id):
-            if uid and str(uid) not in telegram_map:
-                u = db.query(User).filter(User.id == uid).first()
-                telegram_map[str(uid)] = str(u.telegram_user_id) if u else str(uid)
-
-    transactions = []
-    for tx in rows:
-        transactions.append({
+
+def _history_rows(
+    db: Session,
+    user_id: UUID,
+    limit: int,
+    offset: int,
+    sort: str,
+    cursor: Cursor | None,
+) -> tuple[list, bool]:
+    """One page of the user's Transaction/TransactionArchive rows. Returns (rows, more)."""
+    # One extra row tells whether there is a next page. Archived rows are all older than
+    # live ones, so the archive is read only when the page runs past the live rows
+    # (newest-first) or first, for oldest-first pages
+    window = limit + 1 + (0 if cursor is not None else offset)
+    sources = (Transaction, TransactionArchive) if sort == "desc" else (TransactionArchive, Transaction)
+    rows = []
+    for model in sources:
+        rows += _page_rows(db, model, user_id, window - len(rows), sort, cursor)
+    if cursor is None and offset:
+        rows = rows[offset:]
+    return rows[:limit], len(rows) > limit
+
+
+def _serialize_rows(db: Session, rows: list) -> list[dict]:
+    """History dicts for rows, with parties as telegram ids (unknown UUIDs are shown as-is)."""
+    party_ids = {uid for tx in rows for uid in (tx.actor_user_id, tx.from_user_id, tx.to_user_id) if uid}
+    telegram_ids = resolve_telegram_ids(db, party_ids)
+    telegram_map = {str(uid): str(telegram_ids.get(uid, uid)) for uid in party_ids}
+    return [
+        {
             "id": str(tx.id),
             "created_at": tx.created_at,
             "type": tx.type.value,
             "actor_user_id": telegram_map.get(str(tx.actor_user_id)) if tx.actor_user_id else None,
             "from_user_id": telegram_map.get(str(tx.from_user_id)) if tx.from_user_id else None,
             "to_user_id": telegram_map.get(str(tx.to_user_id)) if tx.to_user_id else None,
-            "amount_karma": float(tx.amount_karma) if tx.amount_karma is not None else None,
-            "amount_chiliz": float(tx.amount_chiliz) if tx.amount_chiliz is not None else None,
+            "amount_karma": to_karma(tx.amount_karma) if tx.amount_karma is not None else None,
+            "amount_chiliz": to_karma(tx.amount_chiliz) if tx.amount_chiliz is not None else None,
             "meta": tx.meta,
-        })
-    return transactions, total
+        }
+        for tx in rows
+    ]
+
+
+def get_user_transactions(
+    db: Session,
+    telegram_user_id: int,
+    limit: int = 50,
+    offset: int = 0,
+    sort: str = "desc",
+    cursor: Cursor | None = None,
+    include_total: bool = True,
+) -> tuple[list[dict], int | None, str | None]:
+    """
+    Get paginated transactions for a user, ordered by (created_at, id).
+    Returns (transactions, total_count or None, next_cursor or None).
+    With a cursor (from a previous next_cursor) the page starts after that row and
+    offset is ignored, so deep pages cost the same as the first one.
+    User is included if they are actor, from, or to.
+    """
+    identity = get_identity(db, telegram_user_id)
+    if not identity:
+        return [], 0 if include_total else None, None
+
+    total = None
+    if include_total:
+        total = _count_user_transactions(db, identity.user_id)
+        if archive_horizon(db) is not None:
+            total += _count_user_transactions(db, identity.user_id, TransactionArchive)
+
+    rows, more = _history_rows(db, identity.user_id, limit, offset, sort, cursor)
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if more else None
+    return _serialize_rows(db, rows), total, next_cursor
+
+
+async def get_user_transactions_async(
+    db: AsyncSession,
+    telegram_user_id: int,
+    limit: int = 50,
+    offset: int = 0,
+    sort: str = "desc",
+    cursor: Cursor | None = None,
+    include_total: bool = True,
+) -> tuple[list[dict], int | None, str | None]:
+    """get_user_transactions on an AsyncSession."""
+    await identity_cache.prefetch([telegram_user_id])
+    return await db.run_sync(
+        get_user_transactions, telegram_user_id, limit, offset, sort, cursor, include_total
+    )
+
+
+EXPORT_COLUMNS = (
+    "id", "created_at", "type", "actor_user_id", "from_user_id", "to_user_id",
+    "amount_karma", "amount_chiliz", "meta",
+)
+
+
+def iter_user_transactions(
+    db: Session,
+    telegram_user_id: int,
+    sort: str = "desc",
+    batch_size: int = 500,
+) -> Iterator[list[dict]]:
+    """
+    Yield the user's whole history (live and archived) in batches of history dicts.
+    Each batch is one keyset page, so memory stays bounded by batch_size and no
+    total is counted.
+    """
+    identity = get_identity(db, telegram_user_id)
+    if identity is None:
+        return
+    user_id = identity.user_id
+    cursor = None
+    while True:
+        rows, more = _history_rows(db, user_id, batch_size, 0, sort, cursor)
+        if rows:
+            yield _serialize_rows(db, rows)
+        if not more:
+            return
+        cursor = (rows[-1].created_at, rows[-1].id)
+        # Drop the exported rows from the identity map before the next batch
+        db.expunge_all()
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def export_user_transactions(
+    telegram_user_id: int,
+    fmt: str = "csv",
+    sort: str = "desc",
+    batch_size: int = 500,
+    session_factory: sessionmaker = SessionLocal,
+) -> Iterator[str]:
+    """
+    Stream the user's history as CSV (with header) or NDJSON, one chunk per batch.
+    Opens its own session so it can outlive the request's dependencies.
+    """
+    db = session_factory()
+    try:
+        if fmt == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buf.getvalue()
+        for batch in iter_user_transactions(db, telegram_user_id, sort, batch_size):
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                writer.writerows([_csv_value(tx[c]) for c in EXPORT_COLUMNS] for tx in batch)
+                yield buf.getvalue()
+            else:
+                yield "".join(json.dumps(tx, default=_json_default) + "\n" for tx in batch)
+    finally:
+        db.close()
@@ -0,0 +1,173 @@
+"""Group-commit transfer pipeline (opt-in, TRANSFER_PIPELINE_ENABLED=1).
+
+Send requests are queued in-process; a committer thread applies them in
+micro-batches (every TRANSFER_PIPELINE_MAX_WAIT_MS or TRANSFER_PIPELINE_MAX_BATCH
+ops) inside one DB transaction and resolves each caller's future once that
+transaction has committed. Ops run in arrival order through the same
+send logic as send_karma, so each balance check sees the effects of the ops
+before it in the batch.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import get_settings
+from app.db.session import SessionLocal
+from app.schemas.wallet import SendRequest
+from app.services.wallet_service import WalletConflictError, _send_once, retry_delay, send_karma
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class TransferPipeline:
+    """In-process queue + single committer thread applying sends in micro-batches."""
+
+    def __init__(
+        self,
+        session_factory: sessionmaker = SessionLocal,
+        max_batch: int = 200,
+        max_wait_ms: float = 5,
+    ):
+        self._session_factory = session_factory
+        self._max_batch = max(1, max_batch)
+        self._max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.ops = 0
+
+    def start(self) -> None:
+        """Start the committer thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="transfer-pipeline", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float | None = 10) -> None:
+        """Drain queued sends, then stop the committer thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, req: SendRequest) -> Future:
+        """
+        Queue a validated send; the future resolves to send_karma's result dict after commit.
+        Cancelling the future only succeeds (and drops the send) before its batch starts.
+        """
+        fut: Future = Future()
+        self._queue.put((req, fut))
+        return fut
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self._max_wait
+            stop = False
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            # Callers that gave up before their op started are dropped; the rest can no longer be cancelled
+            batch = [(req, fut) for req, fut in batch if fut.set_running_or_notify_cancel()]
+            try:
+                if batch:
+                    self._commit_batch(batch)
+            except Exception as e:
+                # Never let one batch kill the committer thread
+                logger.exception("Transfer batch of %d failed", len(batch))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            if stop:
+                return
+
+    def _commit_batch(self, batch: list[tuple[SendRequest, Future]]) -> None:
+        """
+        Apply a batch in one transaction; a wallet conflict re-runs the whole batch. A batch
+        that still fails (conflicts included) is applied op by op, so only the failing ops fail.
+        """
+        db = self._session_factory()
+        try:
+            results = self._apply(db, [req for req, _ in batch])
+        except Exception as e:
+            db.rollback()
+            logger.warning("Transfer batch of %d failed (%s); applying individually", len(batch), e)
+            for req, fut in batch:
+                try:
+                    fut.set_result(send_karma(db, req))
+                except Exception as op_error:
+                    db.rollback()
+                    fut.set_exception(op_error)
+            return
+        finally:
+            db.close()
+        self.batches += 1
+        self.ops += len(batch)
+        for (_, fut), result in zip(batch, results):
+            fut.set_result(result)
+
+    def _apply(self, db: Session, reqs: list[SendRequest]) -> list[dict]:
+        # Error results do no writes, so only conflicts need the batch rolled back
+        retries = max(1, get_settings().wallet_update_retries)
+        for n in range(retries):
+            try:
+                results = [_send_once(db, req) for req in reqs]
+            except WalletConflictError:
+                db.rollback()
+                if n + 1 < retries:
+                    time.sleep(retry_delay(n))
+                continue
+            db.commit()
+            return results
+        raise WalletConflictError(f"batch still conflicting after {retries} attempts")
+
+
+_pipeline: TransferPipeline | None = None
+
+
+def start_transfer_pipeline() -> TransferPipeline | None:
+    """Start the shared pipeline if TRANSFER_PIPELINE_ENABLED."""
+    global _pipeline
+    settings = get_settings()
+    if not settings.transfer_pipeline_enabled:
+        return None
+    if _pipeline is None:
+        _pipeline = TransferPipeline(
+            max_batch=settings.transfer_pipeline_max_batch,
+            max_wait_ms=settings.transfer_pipeline_max_wait_ms,
+        )
+        _pipeline.start()
+        logger.info(
+            "Transfer pipeline started (max_batch=%d, max_wait_ms=%s)",
+            settings.transfer_pipeline_max_batch,
+            settings.transfer_pipeline_max_wait_ms,
+        )
+    return _pipeline
+
+
+def stop_transfer_pipeline() -> None:
+    """Drain and stop the shared pipeline."""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+        _pipeline = None
+
+
+def get_transfer_pipeline() -> TransferPipeline | None:
+    """The running pipeline, or None when disabled."""
+    return _pipeline
@@ -1,8 +1,24 @@
 """User and wallet service."""
+import json
+from datetime import datetime
+from typing import Callable, NamedTuple, TypeVar
+from uuid import UUID, uuid4
+
+from sqlalchemy import case, func, literal, select, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.models import User, Wallet
+from app.config import get_settings
+from app.core.cache import LRUCache, TieredCache
+from app.core.rows import Projection
+from app.core.money import to_karma
+from app.models import Posting, Transaction, TransactionArchive, User, Wallet, WalletShard
+from app.models.user import users_fts
 from app.schemas.user import RegisterRequest
+from app.services.balance_cache_service import balance_cache, fill_balance, get_cached_balance, note_balance
+from app.services.wallet_shard_service import ensure_shards
 
 
 def get_user_by_telegram_id(db: Session, telegram_user_id: int) -> User | None:
@@ -10,41 +26,205 @@ def get_user_by_telegram_id(db: Session, telegram_user_id: int) -> User | None:
     return db.query(User).filter(User.telegram_user_id == telegram_user_id).first()
 
 
-def register_user(db: Session, req: RegisterRequest) -> tuple[User, Wallet, bool]:
+# User UUID -> telegram id never changes once assigned. Unregister evicts the user and nulls
+# their history references, so other workers' entries for a deleted UUID are never asked for
+telegram_id_cache = LRUCache(get_settings().telegram_id_cache_size)
+
+
+def resolve_telegram_ids(db: Session, user_ids) -> dict[UUID, int]:
     """
-    Register a user (idempotent).
-    Returns (user, wallet, created) where created=True if new user.
+    Map user UUIDs to telegram ids: cached ids first, the rest in one IN query.
+    Unknown UUIDs (deleted users) are left out of the result.
     """
-    telegram_id = int(req.user_id)
-    existing = get_user_by_telegram_id(db, telegram_id)
+    wanted = {uid for uid in user_ids if uid is not None}
+    found, missing = telegram_id_cache.get_many(wanted)
+    if missing:
+        loaded = dict(db.query(User.id, User.telegram_user_id).filter(User.id.in_(missing)).all())
+        telegram_id_cache.put_many(loaded)
+        found.update(loaded)
+    return found
 
-    if existing:
-        if not existing.username or existing.username != req.username:
-            existing.username = req.username
-            db.commit()
-            db.refresh(existing)
-        wallet = existing.wallet
-        if not wallet:
-            wallet = Wallet(user_id=existing.id)
-            db.add(wallet)
-            db.commit()
-            db.refresh(wallet)
-        return existing, wallet, False
 
-    user = User(
+class Identity(NamedTuple):
+    """What a telegram id resolves to; fixed for the life of the account."""
+
+    user_id: UUID
+    wallet_id: UUID | None
+    is_system_wallet: bool
+    is_event_wallet: bool
+    created_at: int | None  # unix seconds
+
+
+def _dump_identity(identity: Identity) -> str:
+    return json.dumps([str(identity.user_id), str(identity.wallet_id) if identity.wallet_id else None,
+                       identity.is_system_wallet, identity.is_event_wallet, identity.created_at])
+
+
+def _load_identity(raw: str) -> Identity:
+    user_id, wallet_id, *rest = json.loads(raw)
+    return Identity(UUID(user_id), UUID(wallet_id) if wallet_id else None, *rest)
+
+
+# Telegram id -> Identity. Only found users are cached (registration needs no invalidation);
+# register (new wallet) and unregister invalidate. Other workers' local entries may outlive
+# an unregister by up to the TTL: callers reading by wallet id retry with a fresh lookup.
+_settings = get_settings()
+identity_cache = TieredCache(
+    LRUCache(_settings.identity_cache_size, ttl=_settings.identity_cache_ttl_seconds),
+    redis_url=_settings.redis_url,
+    prefix="identity:",
+    redis_ttl=_settings.identity_cache_redis_ttl_seconds,
+    dumps=_dump_identity,
+    loads=_load_identity,
+)
+
+
+def get_identity(db: Session, telegram_user_id: int, refresh: bool = False) -> Identity | None:
+    """Resolve a telegram id to its Identity: cached, else one users/wallets SELECT (None if not found)."""
+    if not refresh:
+        identity = identity_cache.get(telegram_user_id)
+        if identity is not None:
+            return identity
+    row = db.execute(
+        select(User.id, Wallet.id, User.is_system_wallet, User.is_event_wallet, User.created_at)
+        .outerjoin(Wallet, Wallet.user_id == User.id)
+        .where(User.telegram_user_id == telegram_user_id)
+    ).first()
+    if row is None:
+        identity_cache.delete(telegram_user_id)
+        return None
+    created_at = int(row.created_at.timestamp()) if row.created_at else None
+    identity = Identity(*row[:4], created_at)
+    identity_cache.put(telegram_user_id, identity)
+    return identity
+
+
+def invalidate_identity(*telegram_user_ids: int) -> None:
+    """Forget cached identities (after a user is deleted or gets a wallet)."""
+    identity_cache.delete(*telegram_user_ids)
+
+
+T = TypeVar("T")
+
+
+def load_by_identity(db: Session, telegram_user_id: int, load: Callable[[Identity], T | None]) -> T | None:
+    """
+    load(identity) for the user, typically a keyed read by wallet id. When it finds
+    nothing with a cached identity (stale after an unregister elsewhere), the identity
+    is looked up again and load retried once.
+    """
+    identity = get_identity(db, telegram_user_id)
+    if identity is None:
+        return None
+    result = load(identity)
+    if result is not None:
+        return result
+    fresh = get_identity(db, telegram_user_id, refresh=True)
+    if fresh is None or fresh == identity:
+        return None
+    return load(fresh)
+
+
+class Registration(NamedTuple):
+    """Outcome of register_user."""
+
+    user_id: UUID
+    created: bool
+
+
+def register_user(db: Session, req: RegisterRequest) -> Registration:
+    """
+    Register a user (idempotent) and commit. The user is upserted (INSERT ... ON CONFLICT
+    (telegram_user_id) DO UPDATE username ... RETURNING) and the wallet inserted ON CONFLICT
+    DO NOTHING: one statement on Postgres (the wallet insert is a CTE on the upsert), two on
+    SQLite. Concurrent registrations of one telegram id both succeed. created is True when
+    this call inserted the user.
+    """
+    telegram_id = int(req.user_id)
+    now = datetime.utcnow()
+    new_user_id = uuid4()
+    users, wallets = User.__table__, Wallet.__table__
+    postgres = db.get_bind().dialect.name == "postgresql"
+    insert = pg_insert if postgres else sqlite_insert
+
+    upsert = insert(users).values(
+        id=new_user_id,
         telegram_user_id=telegram_id,
         username=req.username,
+        created_at=now,
+        updated_at=now,
+        is_system_wallet=False,
+        is_event_wallet=False,
     )
-    db.add(user)
-    db.flush()
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[users.c.telegram_user_id],
+        set_={
+            "username": upsert.excluded.username,
+            "updated_at": case(
+                (users.c.username == upsert.excluded.username, users.c.updated_at),
+                else_=upsert.excluded.updated_at,
+            ),
+        },
+    ).returning(users.c.id)
+    wallet_values = {"id": uuid4(), "karma_balance": 0, "chiliz_balance": 0, "staked_amount": 0,
+                     "rewards_earned": 0, "version": 0, "shard_count": 0, "updated_at": now}
 
-    wallet = Wallet(user_id=user.id)
-    db.add(wallet)
+    if postgres:
+        registered = upsert.cte("registered")
+        new_wallet = (
+            insert(wallets)
+            .from_select(
+                ["user_id", *wallet_values],
+                select(registered.c.id, *(literal(v, wallets.c[k].type) for k, v in wallet_values.items())),
+            )
+            .on_conflict_do_nothing(index_elements=[wallets.c.user_id])
+            .returning(wallets.c.id)
+            .cte("new_wallet")
+        )
+        user_id, wallet_id = db.execute(
+            select(registered.c.id, new_wallet.c.id).select_from(registered.outerjoin(new_wallet, true()))
+        ).one()
+    else:
+        user_id = db.execute(upsert).scalar_one()
+        wallet_id = db.execute(
+            insert(wallets)
+            .values(user_id=user_id, **wallet_values)
+            .on_conflict_do_nothing(index_elements=[wallets.c.user_id])
+            .returning(wallets.c.id)
+        ).scalar()
     db.commit()
-    db.refresh(user)
-    db.refresh(wallet)
+    created = user_id == new_user_id
+    if wallet_id is not None and not created:
+        invalidate_identity(telegram_id)
+    return Registration(user_id, created)
 
-    return user, wallet, True
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _username_search(db: Session, needle: str, limit: int, exclude_user_id: int | None):
+    """
+    Select (telegram_user_id, username) of users whose username contains needle (lowercase),
+    prefix matches first, then shorter names. Served by the username search index:
+    pg_trgm GIN on Postgres; on SQLite the FTS5 trigram table for 3+ characters.
+    """
+    name = func.lower(User.username)
+    pattern = _escape_like(needle)
+    stmt = select(User.telegram_user_id, User.username).where(
+        User.is_system_wallet == False, User.is_event_wallet == False
+    )
+    if db.get_bind().dialect.name == "sqlite" and len(needle) >= 3:
+        phrase = '"' + needle.replace('"', '""') + '"'
+        stmt = stmt.join(users_fts, users_fts.c.rowid == User.telegram_user_id).where(
+            users_fts.c.username.match(phrase)
+        )
+    else:
+        stmt = stmt.where(name.like(f"%{pattern}%", escape="\\"))
+    if exclude_user_id is not None:
+        stmt = stmt.where(User.telegram_user_id != exclude_user_id)
+    prefix_first = case((name.like(f"{pattern}%", escape="\\"), 0), else_=1)
+    return stmt.order_by(prefix_first, func.length(User.username), User.username).limit(limit)
 
 
 def search_users(db: Session, q: str, limit: int = 10, exclude_user_id: int | None = None) -> list[dict]:
@@ -52,14 +232,7 @@ def search_users(db: Session, q: str, limit: int = 10, exclude_user_id: int | No
     if not q or len(q.strip()) < 2:
         return []
     q_clean = q.strip().lower()
-    query = (
-        db.query(User)
-        .filter(User.is_system_wallet == False, User.is_event_wallet == False)
-        .filter(User.username.ilike(f"%{q_clean}%"))
-    )
-    if exclude_user_id is not None:
-        query = query.filter(User.telegram_user_id != exclude_user_id)
-    users = query.limit(limit).all()
+    users = db.execute(_username_search(db, q_clean, limit, exclude_user_id)).all()
     results = [{"user_id": str(u.telegram_user_id), "username": u.username or ""} for u in users]
     # Also match user_id if q is numeric
     if q_clean.isdigit() and len(results) < limit:
@@ -76,21 +249,41 @@ def search_users(db: Session, q: str, limit: int = 10, exclude_user_id: int | No
     return results[:limit]
 
 
+class UserListRow(Projection):
+    __slots__ = ("telegram_user_id", "username", "created_at", "karma", "chiliz", "staked", "total")
+
+
 def list_users(db: Session, limit: int = 50, offset: int = 0) -> tuple[list[dict], int]:
-    """List users with wallets (paginated). Excludes system wallets. Returns (users, total)."""
-    q = db.query(User, Wallet).join(Wallet, User.id == Wallet.user_id).filter(User.is_system_wallet == False)
-    total = q.count()
-    rows = q.order_by(User.created_at.desc()).limit(limit).offset(offset).all()
-    users = []
-    for u, w in rows:
-        users.append({
-            "user_id": str(u.telegram_user_id),
-            "username": u.username,
-            "created_at": int(u.created_at.timestamp()) if u.created_at else None,
-            "karma_balance": round(float(w.karma_balance), 3),
-            "chiliz_balance": round(float(w.chiliz_balance), 3),
-            "staked": round(float(w.staked_amount), 3),
-        })
+    """
+    List users with wallets (paginated). Excludes system wallets. Returns (users, total).
+    One query: the total rides along as a window count.
+    """
+    base = select(User.id).join(Wallet, User.id == Wallet.user_id).where(User.is_system_wallet == False)
+    rows = UserListRow.all(
+        db,
+        base.with_only_columns(
+            User.telegram_user_id, User.username, User.created_at, _wallet_karma(),
+            Wallet.chiliz_balance, Wallet.staked_amount, func.count().over(),
+        )
+        .order_by(User.created_at.desc())
+        .limit(limit)
+        .offset(offset),
+    )
+    if rows:
+        total = rows[0].total
+    else:
+        total = db.execute(select(func.count()).select_from(base.subquery())).scalar() if offset else 0
+    users = [
+        {
+            "user_id": str(r.telegram_user_id),
+            "username": r.username,
+            "created_at": int(r.created_at.timestamp()) if r.created_at else None,
+            "karma_balance": to_karma(r.karma),
+            "chiliz_balance": to_karma(r.chiliz),
+            "staked": to_karma(r.staked),
+        }
+        for r in rows
+    ]
     return users, total
 
 
@@ -110,6 +303,10 @@ def create_event_wallet(db: Session, name: str) -> dict:
     db.flush()
     wallet = Wallet(user_id=user.id)
     db.add(wallet)
+    db.flush()
+    shards = get_settings().event_wallet_shards
+    if shards:
+        ensure_shards(db, wallet, shards)
     db.commit()
     db.refresh(user)
     return {
@@ -120,29 +317,150 @@ def create_event_wallet(db: Session, name: str) -> dict:
 
 
 def unregister_user_admin(db: Session, telegram_user_id: int) -> dict:
-    """Admin: delete user and cascade (wallet, referrals). Transactions keep with nulled user refs."""
+    """
+    Admin: delete user and cascade (wallet, referrals, postings). Transactions, live and
+    archived, are kept with the user's party references nulled.
+    """
     user = get_user_by_telegram_id(db, telegram_user_id)
     if not user:
         return {"error": "User not found", "status": 404}
     if user.is_system_wallet or user.is_event_wallet:
         return {"error": "Cannot unregister system or event wallet", "status": 400}
+    # Postings cascade with the account, transaction parties are set null (explicit for SQLite,
+    # which doesn't enforce FKs, and for the archive, which has none)
+    db.query(Posting).filter(Posting.account_id == user.id).delete(synchronize_session=False)
+    for table in (Transaction.__table__, TransactionArchive.__table__):
+        for col in ("actor_user_id", "from_user_id", "to_user_id"):
+            db.execute(update(table).where(table.c[col] == user.id).values({col: None}))
+    if user.wallet:
+        note_balance(db, user.wallet.id)
     db.delete(user)
     db.commit()
+    invalidate_identity(telegram_user_id)
+    telegram_id_cache.delete(user.id)
     return {"message": f"User {telegram_user_id} unregistered"}
 
 
-def get_wallet_balance(db: Session, telegram_user_id: int) -> dict | None:
-    """Get balance info for user, or None if not found."""
-    user = get_user_by_telegram_id(db, telegram_user_id)
-    if not user or not user.wallet:
+def _wallet_karma():
+    """Wallet karma including shards, as a column expression (shards summed only for sharded wallets)."""
+    shard_karma = (
+        select(func.coalesce(func.sum(WalletShard.karma_balance), 0))
+        .where(WalletShard.wallet_id == Wallet.id)
+        .scalar_subquery()
+    )
+    return Wallet.karma_balance + case((Wallet.shard_count > 0, shard_karma), else_=0)
+
+
+class AccountRow(Projection):
+    """A user and their wallet balances in milli-units (karma includes shards)."""
+
+    __slots__ = (
+        "user_id", "telegram_user_id", "username", "created_at", "is_system_wallet", "is_event_wallet",
+        "wallet_id", "karma", "staked", "chiliz", "rewards", "version", "shard_count",
+    )
+
+    @property
+    def created_ts(self) -> int | None:
+        return int(self.created_at.timestamp()) if self.created_at else None
+
+    def balances(self) -> dict:
+        return {
+            "karma": self.karma, "staked": self.staked, "chiliz": self.chiliz, "rewards": self.rewards,
+            "version": self.version,
+        }
+
+
+def load_account(db: Session, telegram_user_id: int) -> AccountRow | None:
+    """
+    User and wallet in one Core SELECT (None without a wallet). Refreshes the identity
+    and balance caches.
+    """
+    account = AccountRow.one(
+        db,
+        select(
+            User.id, User.telegram_user_id, User.username, User.created_at,
+            User.is_system_wallet, User.is_event_wallet,
+            Wallet.id, _wallet_karma(), Wallet.staked_amount, Wallet.chiliz_balance, Wallet.rewards_earned,
+            Wallet.version, Wallet.shard_count,
+        )
+        .join(Wallet, Wallet.user_id == User.id)
+        .where(User.telegram_user_id == telegram_user_id),
+    )
+    if account is None:
+        return None
+    identity_cache.put(telegram_user_id, Identity(
+        account.user_id, account.wallet_id, account.is_system_wallet, account.is_event_wallet, account.created_ts,
+    ))
+    # Shard credits don't bump the version, so sharded balances are never filled from reads
+    if not account.shard_count:
+        fill_balance(account.wallet_id, account.balances())
+    return account
+
+
+def get_balances(db: Session, telegram_user_id: int, own: bool = False) -> tuple[dict, int | None] | None:
+    """
+    (milli-unit balances, created_at) for the user's wallet, or None if not found.
+    From the identity and balance caches, else one load_account query. own: the user is
+    reading their own balance (see get_cached_balance).
+    """
+    identity = identity_cache.get(telegram_user_id)
+    if identity is not None and identity.wallet_id is not None:
+        balances = get_cached_balance(identity.wallet_id, own)
+        if balances is not None:
+            return balances, identity.created_at
+    account = load_account(db, telegram_user_id)
+    if account is None:
         return None
+    return account.balances(), account.created_ts
+
 
-    w = user.wallet
+def _balance_response(telegram_user_id: int, balances: dict, created_at: int | None) -> dict:
     return {
         "user_id": str(telegram_user_id),
-        "balance": round(float(w.karma_balance), 3),
-        "staked": round(float(w.staked_amount), 3),
-        "rewards": round(float(w.rewards_earned), 6),
-        "chiliz": round(float(w.chiliz_balance), 3),
-        "created_at": int(user.created_at.timestamp()) if user.created_at else None,
+        "balance": to_karma(balances["karma"]),
+        "staked": to_karma(balances["staked"]),
+        "rewards": to_karma(balances["rewards"]),
+        "chiliz": to_karma(balances["chiliz"]),
+        "created_at": created_at,
+    }
+
+
+def get_wallet_balance(db: Session, telegram_user_id: int, own: bool = False) -> dict | None:
+    """Get balance info for user, or None if not found (see get_balances)."""
+    found = get_balances(db, telegram_user_id, own)
+    return _balance_response(telegram_user_id, *found) if found else None
+
+
+def get_profile(db: Session, telegram_user_id: int) -> dict | None:
+    """Current user's profile and balance (one query), or None if not found."""
+    account = load_account(db, telegram_user_id)
+    if account is None:
+        return None
+    return {
+        **_balance_response(telegram_user_id, account.balances(), account.created_ts),
+        "username": account.username or "",
     }
+
+
+async def get_user_by_telegram_id_async(db: AsyncSession, telegram_user_id: int) -> User | None:
+    """get_user_by_telegram_id on an AsyncSession."""
+    return await db.run_sync(get_user_by_telegram_id, telegram_user_id)
+
+
+async def get_profile_async(db: AsyncSession, telegram_user_id: int) -> dict | None:
+    """get_profile on an AsyncSession."""
+    return await db.run_sync(get_profile, telegram_user_id)
+
+
+async def prefetch_balances(telegram_user_id: int, own: bool = False) -> None:
+    """Warm the local identity and balance tiers from Redis off the event loop (get_balances reads them)."""
+    await identity_cache.prefetch([telegram_user_id])
+    identity = identity_cache.local.get(telegram_user_id)
+    if identity is not None and identity.wallet_id is not None:
+        await balance_cache.prefetch([identity.wallet_id], shared_first=own)
+
+
+async def get_wallet_balance_async(db: AsyncSession, telegram_user_id: int, own: bool = False) -> dict | None:
+    """get_wallet_balance on an AsyncSession."""
+    await prefetch_balances(telegram_user_id, own)
+    return await db.run_sync(get_wallet_balance, telegram_user_id, own)
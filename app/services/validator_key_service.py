@@ -1,12 +1,194 @@
 """Validator API key management."""
+import logging
 import secrets
+import threading
 from datetime import datetime
 from uuid import UUID
 
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from app.config import get_settings
+from app.db.session import SessionLocal
 from app.models.validator_key import ValidatorApiKey, hash_key
 
+logger = logging.getLogger(__name__)
+
+# Redis channel announcing that a worker created or revoked a key
+KEYS_CHANGED_CHANNEL = "karma:validator-keys:changed"
+
+
+def _key_set_version(db: Session) -> int:
+    """
+    Version of the key set: rows + revoked rows. Keys are never deleted, so every
+    create and every revoke bumps it by one.
+    """
+    total, revoked = db.execute(
+        select(func.count(ValidatorApiKey.id), func.count(ValidatorApiKey.revoked_at))
+    ).one()
+    return total + revoked
+
+
+class ValidatorKeyRegistry:
+    """
+    In-process set of active validator key hashes, so require_validator never loads key
+    rows. An accepted key is confirmed against the key-set version (one aggregate over
+    the small key table), so a revocation on any worker applies to the next request
+    everywhere. The worker that creates or revokes a key reloads the set right after
+    commit and announces the change on Redis (REDIS_URL); every worker also polls the
+    version each VALIDATOR_KEYS_REFRESH_SECONDS, so new keys are accepted by other
+    workers within that interval (at once with Redis).
+    """
+
+    def __init__(self, redis_url: str | None = None, refresh_seconds: float = 5.0):
+        self.redis_url = redis_url
+        self.refresh_seconds = refresh_seconds
+        self._hashes: frozenset[str] | None = None
+        self.version = -1
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning("Redis unavailable (%s), validator keys refresh by polling only", e)
+
+    def load(self, db: Session | None = None) -> None:
+        """Replace the set with the active keys in the DB (own session when db is None)."""
+        own = db is None
+        db = db or SessionLocal()
+        try:
+            with self._lock:
+                version = _key_set_version(db)
+                hashes = db.scalars(
+                    select(ValidatorApiKey.key_hash).where(ValidatorApiKey.revoked_at.is_(None))
+                ).all()
+                self._hashes = frozenset(hashes)
+                self.version = version
+        finally:
+            if own:
+                db.close()
+
+    def refresh(self) -> bool:
+        """Reload if the key-set version moved. Returns True when it reloaded."""
+        db = SessionLocal()
+        try:
+            if self._hashes is not None and _key_set_version(db) == self.version:
+                return False
+            self.load(db)
+            return True
+        finally:
+            db.close()
+
+    def active_hashes(self) -> frozenset[str]:
+        """Current active key hashes (loaded on first use)."""
+        hashes = self._hashes
+        if hashes is None:
+            self.load()
+            hashes = self._hashes
+        return hashes
+
+    def is_active(self, key_hash: str) -> bool:
+        """True if key_hash is an active key; a hit is re-checked if the DB version moved."""
+        if key_hash not in self.active_hashes():
+            return False
+        db = SessionLocal()
+        try:
+            if _key_set_version(db) != self.version:
+                self.load(db)
+        finally:
+            db.close()
+        return key_hash in self._hashes
+
+    def changed(self, db: Session) -> None:
+        """Reload after a committed create/revoke and tell the other workers."""
+        self.load(db)
+        if self._redis is not None:
+            try:
+                self._redis.publish(KEYS_CHANGED_CHANNEL, str(self.version))
+            except Exception as e:
+                logger.warning("Validator key change not published (%s), peers will poll", e)
+
+    def reset(self) -> None:
+        """Forget the loaded set; the next check reloads it."""
+        with self._lock:
+            self._hashes = None
+            self.version = -1
+
+    def start(self) -> None:
+        """Start the background thread that listens for changes and polls the version."""
+        if self._thread is not None or self.refresh_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="validator-keys", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _subscribe(self):
+        if self._redis is None:
+            return None
+        try:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(KEYS_CHANGED_CHANNEL)
+            return pubsub
+        except Exception as e:
+            logger.warning("Validator key subscription failed (%s), polling only", e)
+            return None
+
+    def _run(self) -> None:
+        pubsub = self._subscribe()
+        try:
+            while not self._stop.is_set():
+                if pubsub is not None:
+                    try:
+                        message = pubsub.get_message(timeout=self.refresh_seconds)
+                    except Exception as e:
+                        logger.warning("Validator key subscription lost (%s), polling only", e)
+                        pubsub = None
+                        continue
+                    if message is not None and message.get("data") == str(self.version):
+                        continue  # already at the announced version (our own publish)
+                elif self._stop.wait(self.refresh_seconds):
+                    break
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.exception("Validator key refresh failed: %s", e)
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
+
+_settings = get_settings()
+validator_keys = ValidatorKeyRegistry(
+    redis_url=_settings.redis_url,
+    refresh_seconds=_settings.validator_keys_refresh_seconds,
+)
+
+
+def start_validator_keys() -> ValidatorKeyRegistry:
+    """Load the active key set and start refreshing it."""
+    try:
+        validator_keys.load()
+    except Exception as e:
+        logger.warning("Validator keys not loaded at startup (%s), loading on first use", e)
+    validator_keys.start()
+    return validator_keys
+
+
+def stop_validator_keys() -> None:
+    """Stop refreshing the key set."""
+    validator_keys.stop()
+
 
 def create_validator_key(db: Session, name: str | None = None) -> dict:
     """
@@ -21,6 +203,7 @@ def create_validator_key(db: Session, name: str | None = None) -> dict:
     key = ValidatorApiKey(key_hash=key_hash, name=name or "")
     db.add(key)
     db.commit()
+    validator_keys.changed(db)
     return {
         "message": "Validator key created. Save the key securely - it cannot be retrieved again.",
         "key": plain,
@@ -58,4 +241,6 @@ def revoke_validator_key(db: Session, key_id: str) -> dict:
         return {"error": "Key already revoked", "status": 400}
     key.revoked_at = datetime.utcnow()
     db.commit()
+    # The acting worker drops the key before responding; the rest follow via Redis or polling
+    validator_keys.changed(db)
     return {"message": "Validator key revoked"}
@@ -1,12 +1,15 @@
 """Validator API data service - aggregates for external validators."""
 from datetime import datetime, timedelta, timezone
-from decimal import Decimal
 
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.models import User, Wallet, Transaction
+from app.core.money import to_karma
+from app.models import User, Wallet
 from app.models.transaction import TransactionType
+from app.services.archive_service import transaction_source
+from app.services.user_service import resolve_telegram_ids
+from app.services.wallet_shard_service import shard_balances, total_shard_karma
 
 
 def _utc_now() -> datetime:
@@ -52,26 +55,27 @@ def get_validator_snapshot(
         )
         .count()
     )
+    tx = transaction_source(db, w24h)
     active_24h = (
-        db.query(Transaction.actor_user_id)
-        .filter(Transaction.created_at >= w24h)
-        .filter(Transaction.type.in_([TransactionType.SEND, TransactionType.RECEIVE]))
+        db.query(tx.c.actor_user_id)
+        .filter(tx.c.created_at >= w24h)
+        .filter(tx.c.type.in_([TransactionType.SEND, TransactionType.RECEIVE]))
         .distinct()
         .count()
     )
 
     # Balances
     total_karma = (
-        db.query(func.coalesce(func.sum(Wallet.karma_balance), 0)).scalar() or Decimal("0")
-    )
+        db.query(func.coalesce(func.sum(Wallet.karma_balance), 0)).scalar() or 0
+    ) + total_shard_karma(db)
     total_chiliz = (
-        db.query(func.coalesce(func.sum(Wallet.chiliz_balance), 0)).scalar() or Decimal("0")
+        db.query(func.coalesce(func.sum(Wallet.chiliz_balance), 0)).scalar() or 0
     )
     total_staked = (
-        db.query(func.coalesce(func.sum(Wallet.staked_amount), 0)).scalar() or Decimal("0")
+        db.query(func.coalesce(func.sum(Wallet.staked_amount), 0)).scalar() or 0
     )
     total_rewards = (
-        db.query(func.coalesce(func.sum(Wallet.rewards_earned), 0)).scalar() or Decimal("0")
+        db.query(func.coalesce(func.sum(Wallet.rewards_earned), 0)).scalar() or 0
     )
 
     # Transaction metrics (SEND + RECEIVE volume)
@@ -112,10 +116,10 @@ def get_validator_snapshot(
             "active_wallets_24h": active_24h,
         },
         "balances": {
-            "total_karma_balance": round(float(total_karma), 2),
-            "total_chiliz_balance": round(float(total_chiliz), 2),
-            "total_staked": round(float(total_staked), 2),
-            "total_rewards_earned": round(float(total_rewards), 2),
+            "total_karma_balance": round(to_karma(total_karma), 2),
+            "total_chiliz_balance": round(to_karma(total_chiliz), 2),
+            "total_staked": round(to_karma(total_staked), 2),
+            "total_rewards_earned": round(to_karma(total_rewards), 2),
         },
         "transactions": {
             "24h": tx_24h,
@@ -205,18 +209,19 @@ def _tx_metrics(
     types: list[TransactionType],
 ) -> dict:
     """Transaction count and volumes for SEND/RECEIVE in window."""
+    tx = transaction_source(db, start)
     q = db.query(
-        func.count(Transaction.id).label("count"),
-        func.coalesce(func.sum(Transaction.amount_karma), 0).label("karma"),
-        func.coalesce(func.sum(Transaction.amount_chiliz), 0).label("chiliz"),
-    ).filter(Transaction.created_at >= start, Transaction.created_at <= end)
+        func.count(tx.c.id).label("count"),
+        func.coalesce(func.sum(tx.c.amount_karma), 0).label("karma"),
+        func.coalesce(func.sum(tx.c.amount_chiliz), 0).label("chiliz"),
+    ).filter(tx.c.created_at >= start, tx.c.created_at <= end)
     if types:
-        q = q.filter(Transaction.type.in_(types))
+        q = q.filter(tx.c.type.in_(types))
     row = q.first()
     return {
         "count": row.count or 0,
-        "volume_karma": round(float(row.karma or 0), 2),
-        "volume_chiliz": round(float(row.chiliz or 0), 2),
+        "volume_karma": round(to_karma(row.karma), 2),
+        "volume_chiliz": round(to_karma(row.chiliz), 2),
     }
 
 
@@ -228,11 +233,12 @@ def _inflation_breakdown(
 ) -> dict:
     """Karma minted by type in window."""
     # Sum by type
+    tx = transaction_source(db, start)
     by_type = (
-        db.query(Transaction.type, func.coalesce(func.sum(Transaction.amount_karma), 0))
-        .filter(Transaction.created_at >= start, Transaction.created_at <= end)
-        .filter(Transaction.type.in_(types))
-        .group_by(Transaction.type)
+        db.query(tx.c.type, func.coalesce(func.sum(tx.c.amount_karma), 0))
+        .filter(tx.c.created_at >= start, tx.c.created_at <= end)
+        .filter(tx.c.type.in_(types))
+        .group_by(tx.c.type)
         .all()
     )
     breakdown = {
@@ -243,7 +249,7 @@ def _inflation_breakdown(
     }
     total = 0.0
     for tx_type, amt in by_type:
-        v = float(amt)
+        v = to_karma(amt)
         total += v
         if tx_type == TransactionType.MINT:
             breakdown["mint_admin"] += v
@@ -262,29 +268,38 @@ def _inflation_breakdown(
 
 def _top_wallets(db: Session, limit: int = 10, sort_by: str = "total") -> list[dict]:
     """Top wallets sorted by total (balance + staked) or balance only."""
-    q = (
-        db.query(User, Wallet)
-        .join(Wallet, User.id == Wallet.user_id)
+    rows = (
+        db.query(Wallet.id, Wallet.user_id, Wallet.karma_balance, Wallet.staked_amount, Wallet.shard_count)
+        .join(User, User.id == Wallet.user_id)
         .filter(User.is_system_wallet == False)
+        .all()
     )
-    rows = q.all()
-    combined = [
-        {
-            "user_id": str(u.telegram_user_id),
-            "username": u.username,
-            "karma_balance": round(float(w.karma_balance), 2),
-            "staked": round(float(w.staked_amount), 2),
-            "total": round(float(w.karma_balance) + float(w.staked_amount), 2),
-        }
-        for u, w in rows
+    sharded = shard_balances(db, [r.id for r in rows if r.shard_count])
+    ranked = [
+        (r.user_id, r.karma_balance + sharded.get(r.id, 0), r.staked_amount)
+        for r in rows
     ]
     if sort_by == "balance":
-        combined.sort(key=lambda x: x["karma_balance"], reverse=True)
+        ranked.sort(key=lambda x: x[1], reverse=True)
     else:
-        combined.sort(key=lambda x: x["total"], reverse=True)
-    for i, item in enumerate(combined[:limit], 1):
-        item["rank"] = i
-    return combined[:limit]
+        ranked.sort(key=lambda x: x[1] + x[2], reverse=True)
+    ranked = ranked[:limit]
+
+    # Only the ranked page needs identities: telegram ids via the shared cache, usernames in one query
+    user_ids = [user_id for user_id, _, _ in ranked]
+    telegram_ids = resolve_telegram_ids(db, user_ids)
+    usernames = dict(db.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    return [
+        {
+            "user_id": str(telegram_ids.get(user_id, user_id)),
+            "username": usernames.get(user_id),
+            "karma_balance": round(to_karma(karma), 2),
+            "staked": round(to_karma(staked), 2),
+            "total": round(to_karma(karma + staked), 2),
+            "rank": i,
+        }
+        for i, (user_id, karma, staked) in enumerate(ranked, 1)
+    ]
 
 
 def _iso(dt: datetime) -> str:
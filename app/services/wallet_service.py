@@ -1,21 +1,191 @@
-"""Wallet and transfer service."""
-from decimal import Decimal
+"""Wallet and transfer service. Amounts are integer milli-Karma (see app.core.money)."""
+import asyncio
+import random
+import time
+import weakref
 from datetime import datetime
+from typing import Callable, Iterable, NamedTuple
+from uuid import uuid4
 
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.config import get_settings
+from app.core.money import MILLI, MIN_AMOUNT, to_karma, to_milli
 from app.models import User, Wallet, Transaction, Referral
+from app.models.posting import Asset
 from app.models.transaction import TransactionType
-from app.schemas.wallet import SendRequest
+from app.schemas.wallet import BatchSendRequest, SendRequest
+from app.services.balance_cache_service import note_balance
 
 
-MIN_AMOUNT = Decimal("0.001")
-DISPLAY_DECIMALS = 3
+# Paid to the inviter on their first send to an invitee
+REFERRAL_BONUS = 3 * MILLI
 
+BUSY_ERROR = {"error": "Wallet is busy, please retry", "status": 409}
 
-def round_karma(value: Decimal) -> Decimal:
-    """Round to display precision."""
-    return round(value, DISPLAY_DECIMALS)
+
+class WalletConflictError(Exception):
+    """Wallet changed between read and conditional update; the attempt must be retried."""
+
+
+class WalletParty(NamedTuple):
+    """A user with their wallet and the referral where they are the invitee (if any)."""
+
+    user: User
+    wallet: Wallet
+    referral: Referral | None
+
+
+def load_wallet_context(
+    db: Session, *telegram_ids: int, debit: Iterable[int] = (), lock: bool | None = None
+) -> dict[int, WalletParty]:
+    """
+    Load users, wallets and invitee referrals for the given Telegram IDs in one SELECT.
+    Rows are refreshed (populate_existing) so balance checks never see stale identity-map
+    values. Users without a wallet are omitted.
+
+    With lock (default WALLET_ROW_LOCKS) the wallets of the `debit` parties that are not
+    sharded are then locked FOR UPDATE (and re-read) in id order by a second SELECT.
+    Credited wallets are never locked (credits are commutative deltas), nor are sharded
+    ones: their writers spread over shard rows and a lock on the wallet row would queue
+    them again. Dialects without row locks (SQLite) skip the second SELECT.
+    """
+    if lock is None:
+        lock = get_settings().wallet_row_locks
+    stmt = (
+        select(User, Wallet, Referral)
+        .join(Wallet, Wallet.user_id == User.id)
+        .outerjoin(Referral, Referral.invitee_user_id == User.id)
+        .where(User.telegram_user_id.in_(telegram_ids))
+        .order_by(Wallet.id)
+        .execution_options(populate_existing=True)
+    )
+    parties = {user.telegram_user_id: WalletParty(user, wallet, ref) for user, wallet, ref in db.execute(stmt)}
+    debited = [parties[t] for t in set(debit) if t in parties]
+    if lock and debited and _row_locks_supported(db):
+        _lock_wallets(db, [p.wallet.id for p in debited if not p.wallet.shard_count])
+    return parties
+
+
+def _row_locks_supported(db: Session) -> bool:
+    """False for dialects that ignore SELECT ... FOR UPDATE (SQLite)."""
+    return db.get_bind().dialect.name != "sqlite"
+
+
+def _lock_wallets(db: Session, wallet_ids: list) -> None:
+    """SELECT ... FOR UPDATE the wallets in id order, refreshing the loaded instances."""
+    if wallet_ids:
+        db.execute(
+            select(Wallet)
+            .where(Wallet.id.in_(wallet_ids))
+            .order_by(Wallet.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).all()
+
+
+# Refreshed on the instance after each update_wallet (ledger running balances, balance cache,
+# next version check)
+_RETURNED_COLUMNS = (
+    Wallet.karma_balance, Wallet.staked_amount, Wallet.chiliz_balance, Wallet.rewards_earned, Wallet.version,
+)
+
+
+def update_wallet(
+    db: Session,
+    wallet: Wallet,
+    karma: int = 0,
+    staked: int = 0,
+    chiliz: int = 0,
+    check_version: bool = True,
+    rewards: int = 0,
+) -> None:
+    """
+    Apply milli-unit balance deltas (rewards: rewards_earned) with one conditional UPDATE.
+    WHERE version = :read_version (unless check_version=False, for pure credits) and,
+    for each debit, balance >= :amount. Raises WalletConflictError if no row matched.
+    The wallet instance then holds the updated balances (RETURNING, or expired and
+    reloaded on access where the dialect has no UPDATE ... RETURNING).
+    """
+    stmt = update(Wallet).where(Wallet.id == wallet.id)
+    if check_version:
+        stmt = stmt.where(Wallet.version == wallet.version)
+    values = {"version": Wallet.version + 1, "updated_at": datetime.utcnow()}
+    for col, delta in (
+        (Wallet.karma_balance, karma),
+        (Wallet.staked_amount, staked),
+        (Wallet.chiliz_balance, chiliz),
+        (Wallet.rewards_earned, rewards),
+    ):
+        if not delta:
+            continue
+        values[col.key] = col + delta
+        if delta < 0:
+            stmt = stmt.where(col >= -delta)
+    stmt = stmt.values(**values).execution_options(synchronize_session=False)
+    if not db.get_bind().dialect.update_returning:
+        result = db.execute(stmt)
+        if result.rowcount != 1:
+            raise WalletConflictError(str(wallet.id))
+        db.expire(wallet, [col.key for col in _RETURNED_COLUMNS])
+        note_balance(db, wallet.id)
+        return
+    row = db.execute(stmt.returning(*_RETURNED_COLUMNS)).first()
+    if row is None:
+        raise WalletConflictError(str(wallet.id))
+    for col, value in zip(_RETURNED_COLUMNS, row):
+        set_committed_value(wallet, col.key, value)
+    note_balance(db, wallet.id, wallet)
+
+
+def _attempt(db: Session, attempt: Callable[[], dict]) -> dict | None:
+    """Run one attempt: commit on success, roll back on an error result; None (rolled back) on conflict."""
+    try:
+        result = attempt()
+    except WalletConflictError:
+        db.rollback()
+        return None
+    if "error" in result:
+        db.rollback()
+    else:
+        db.commit()
+    return result
+
+
+def retry_delay(retry: int) -> float:
+    """Seconds to wait before retry n (0-based): full-jitter exponential backoff."""
+    return random.uniform(0, get_settings().wallet_retry_backoff_ms / 1000 * 2 ** retry)
+
+
+def run_with_retries(db: Session, attempt: Callable[[], dict]) -> dict:
+    """
+    Run a read-validate-write attempt, committing on success.
+    Conflicts roll back and retry (re-reading fresh rows) after a jittered backoff, up to
+    WALLET_UPDATE_RETRIES times.
+    """
+    retries = max(1, get_settings().wallet_update_retries)
+    for n in range(retries):
+        result = _attempt(db, attempt)
+        if result is not None:
+            return result
+        if n + 1 < retries:
+            time.sleep(retry_delay(n))
+    return dict(BUSY_ERROR)
+
+
+async def run_with_retries_async(db: AsyncSession, once: Callable[..., dict], *args) -> dict:
+    """run_with_retries for an AsyncSession: once(session, *args) per attempt, backoff on the event loop."""
+    retries = max(1, get_settings().wallet_update_retries)
+    for n in range(retries):
+        result = await db.run_sync(lambda session: _attempt(session, lambda: once(session, *args)))
+        if result is not None:
+            return result
+        if n + 1 < retries:
+            await asyncio.sleep(retry_delay(n))
+    return dict(BUSY_ERROR)
 
 
 def send_karma(db: Session, req: SendRequest) -> dict:
@@ -23,31 +193,44 @@ def send_karma(db: Session, req: SendRequest) -> dict:
     Transfer Karma from sender to recipient.
     Returns dict with success/error info.
     """
-    sender = db.query(User).filter(User.telegram_user_id == int(req.sender_id)).first()
-    recipient = db.query(User).filter(User.telegram_user_id == int(req.recipient_id)).first()
+    return run_with_retries(db, lambda: _send_once(db, req))
 
-    if not sender or not recipient:
-        return {"error": "User(s) not found", "status": 404}
 
-    if not sender.wallet or not recipient.wallet:
-        return {"error": "Wallet(s) not found", "status": 404}
+def _send_once(db: Session, req: SendRequest) -> dict:
+    """One optimistic send attempt (no commit)."""
+    parties = load_wallet_context(db, int(req.sender_id), int(req.recipient_id), debit=(int(req.sender_id),))
+    sender_party = parties.get(int(req.sender_id))
+    recipient_party = parties.get(int(req.recipient_id))
+    if not sender_party or not recipient_party:
+        return {"error": "User(s) not found", "status": 404}
+    sender, sender_wallet = sender_party.user, sender_party.wallet
+    recipient, recipient_wallet = recipient_party.user, recipient_party.wallet
 
-    amount = Decimal(str(req.amount))
+    amount = to_milli(req.amount)
     if amount < MIN_AMOUNT:
         return {"error": "Minimum amount is 0.001 Karma", "status": 400}
 
-    if sender.wallet.karma_balance < amount:
-        return {"error": "Insufficient Karma balance", "status": 400}
+    from app.services.ledger_service import issue, record_postings, transfer
+    from app.services.wallet_shard_service import available_karma, credit_karma, debit_karma
 
-    now = datetime.utcnow()
-
-    # Debit sender
-    sender.wallet.karma_balance -= amount
-    sender.wallet.karma_balance = round_karma(sender.wallet.karma_balance)
+    if available_karma(db, sender_wallet) < amount:
+        return {"error": "Insufficient Karma balance", "status": 400}
 
-    # Credit recipient
-    recipient.wallet.karma_balance += amount
-    recipient.wallet.karma_balance = round_karma(recipient.wallet.karma_balance)
+    # Referral bonus: if recipient was invited by sender, and not yet rewarded
+    ref = recipient_party.referral
+    bonus = 0
+    if ref and ref.inviter_user_id == sender.id and not ref.rewarded:
+        bonus = REFERRAL_BONUS
+
+    if sender.id != recipient.id:
+        # Debit sender (version + balance checked), credit recipient (commutative, no version check)
+        if sender_wallet.shard_count:
+            debit_karma(db, sender_wallet, amount)
+            if bonus:
+                credit_karma(db, sender_wallet, bonus)
+        else:
+            update_wallet(db, sender_wallet, karma=bonus - amount)
+        credit_karma(db, recipient_wallet, amount)
 
     meta = {"note": req.note} if req.note else None
 
@@ -61,13 +244,9 @@ def send_karma(db: Session, req: SendRequest) -> dict:
         meta=meta,
     )
     db.add(tx)
+    legs = transfer(tx, sender.id, recipient.id, amount)
 
-    # Referral bonus: if recipient was invited by sender, and not yet rewarded
-    ref = db.query(Referral).filter(Referral.invitee_user_id == recipient.id).first()
-    if ref and ref.inviter_user_id == sender.id and not ref.rewarded:
-        bonus = Decimal("3")
-        sender.wallet.karma_balance += bonus
-        sender.wallet.karma_balance = round_karma(sender.wallet.karma_balance)
+    if bonus:
         ref.rewarded = True
         tx_bonus = Transaction(
             type=TransactionType.REFERRAL_BONUS,
@@ -77,23 +256,174 @@ def send_karma(db: Session, req: SendRequest) -> dict:
             meta={"invitee": str(recipient.telegram_user_id)},
         )
         db.add(tx_bonus)
+        legs += issue(tx_bonus, sender.id, bonus)
 
-    db.commit()
+    record_postings(db, legs, wallets=(sender_wallet, recipient_wallet))
     return {"message": f"{req.amount} Karma sent from {req.sender_id} to {req.recipient_id}"}
 
 
+def send_karma_batch(db: Session, req: BatchSendRequest) -> dict:
+    """
+    One-to-many transfer in a single DB transaction.
+    Recipients are resolved in one query, the sender is debited once, recipients are
+    credited and SEND rows inserted in bulk. Invalid entries are reported, not applied.
+    """
+    return run_with_retries(db, lambda: _send_batch_once(db, req))
+
+
+def _send_batch_once(db: Session, req: BatchSendRequest) -> dict:
+    """One optimistic batch-send attempt (no commit)."""
+    sender_party = load_wallet_context(db, int(req.sender_id), debit=(int(req.sender_id),)).get(int(req.sender_id))
+    if not sender_party:
+        return {"error": "Sender not found", "status": 404}
+    sender, sender_wallet = sender_party.user, sender_party.wallet
+
+    from app.services.ledger_service import issue, record_postings, transfer
+    from app.services.wallet_shard_service import available_karma, credit_karma, debit_karma
+
+    recipient_ids = {int(t.recipient_id) for t in req.transfers}
+    recipients = {
+        tg_id: (user_id, wallet_id, shard_count)
+        for user_id, tg_id, wallet_id, shard_count in (
+            db.query(User.id, User.telegram_user_id, Wallet.id, Wallet.shard_count)
+            .join(Wallet, Wallet.user_id == User.id)
+            .filter(User.telegram_user_id.in_(recipient_ids))
+            .all()
+        )
+    }
+    # Referral bonus once per invitee, same rule as send_karma
+    pending_refs = {
+        invitee_id: ref_id
+        for ref_id, invitee_id in (
+            db.query(Referral.id, Referral.invitee_user_id)
+            .filter(Referral.inviter_user_id == sender.id, Referral.rewarded == False)
+            .all()
+        )
+    }
+
+    available = available_karma(db, sender_wallet)
+    total = 0
+    bonus_total = 0
+    credits: dict = {}
+    sharded_credits: dict = {}
+    tx_rows: list[dict] = []
+    legs = []
+    rewarded_refs: list = []
+    failed: list[dict] = []
+    for index, item in enumerate(req.transfers):
+        recipient = recipients.get(int(item.recipient_id))
+        error = None
+        amount = to_milli(item.amount)
+        if recipient is None:
+            error = "User not found"
+        elif recipient[0] == sender.id:
+            error = "Cannot send to yourself"
+        elif amount < MIN_AMOUNT:
+            error = "Minimum amount is 0.001 Karma"
+        elif amount > available:
+            error = "Insufficient Karma balance"
+        if error:
+            failed.append({"index": index, "recipient_id": item.recipient_id, "error": error})
+            continue
+
+        user_id, wallet_id, shard_count = recipient
+        available -= amount
+        total += amount
+        target = sharded_credits if shard_count else credits
+        target[wallet_id] = target.get(wallet_id, 0) + amount
+        tx_id = uuid4()
+        legs += transfer(tx_id, sender.id, user_id, amount)
+        tx_rows.append({
+            "id": tx_id,
+            "type": TransactionType.SEND,
+            "actor_user_id": sender.id,
+            "from_user_id": sender.id,
+            "to_user_id": user_id,
+            "amount_karma": amount,
+            "meta": {"note": item.note} if item.note else None,
+        })
+        ref_id = pending_refs.pop(user_id, None)
+        if ref_id is not None:
+            available += REFERRAL_BONUS
+            bonus_total += REFERRAL_BONUS
+            rewarded_refs.append(ref_id)
+            tx_id = uuid4()
+            legs += issue(tx_id, sender.id, REFERRAL_BONUS)
+            tx_rows.append({
+                "id": tx_id,
+                "type": TransactionType.REFERRAL_BONUS,
+                "actor_user_id": sender.id,
+                "to_user_id": sender.id,
+                "amount_karma": REFERRAL_BONUS,
+                "meta": {"invitee": item.recipient_id},
+            })
+
+    if tx_rows:
+        if sender_wallet.shard_count:
+            debit_karma(db, sender_wallet, total)
+            if bonus_total:
+                credit_karma(db, sender_wallet, bonus_total)
+        else:
+            update_wallet(db, sender_wallet, karma=bonus_total - total)
+        if credits:
+            _credit_wallets(db, credits)
+        for wallet_id, amount in sharded_credits.items():
+            credit_karma(db, db.get(Wallet, wallet_id), amount)
+        db.execute(insert(Transaction), tx_rows)
+        record_postings(db, legs, wallets=(sender_wallet,))
+        if rewarded_refs:
+            db.execute(
+                update(Referral)
+                .where(Referral.id.in_(rewarded_refs))
+                .values(rewarded=True)
+                .execution_options(synchronize_session=False)
+            )
+
+    sent = len(req.transfers) - len(failed)
+    return {
+        "message": f"{sent} transfers ({to_karma(total)} Karma) sent from {req.sender_id}",
+        "sent": sent,
+        "total_amount": to_karma(total),
+        "failed": failed,
+    }
+
+
+def _credit_wallets(db: Session, credits: dict) -> None:
+    """Bulk credit wallet_id -> amount with one executemany UPDATE (commutative, no version check)."""
+    wallets = Wallet.__table__
+    stmt = (
+        update(wallets)
+        .where(wallets.c.id == bindparam("wallet_id", type_=wallets.c.id.type))
+        .values(
+            karma_balance=wallets.c.karma_balance + bindparam("amount", type_=wallets.c.karma_balance.type),
+            version=wallets.c.version + 1,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    db.execute(stmt, [{"wallet_id": wid, "amount": amt} for wid, amt in credits.items()])
+    for wallet_id in credits:
+        note_balance(db, wallet_id)
+
+
 def mint_karma(db: Session, user_id: str, amount: float) -> dict:
     """Admin: mint Karma to user."""
-    user = db.query(User).filter(User.telegram_user_id == int(user_id)).first()
-    if not user or not user.wallet:
+    return run_with_retries(db, lambda: _mint_once(db, user_id, amount))
+
+
+def _mint_once(db: Session, user_id: str, amount: float) -> dict:
+    party = load_wallet_context(db, int(user_id)).get(int(user_id))
+    if not party:
         return {"error": "User not found", "status": 404}
+    user, w = party.user, party.wallet
 
-    amt = Decimal(str(amount))
+    amt = to_milli(amount)
     if amt < MIN_AMOUNT:
         return {"error": "Minimum amount is 0.001 Karma", "status": 400}
 
-    user.wallet.karma_balance += amt
-    user.wallet.karma_balance = round_karma(user.wallet.karma_balance)
+    from app.services.ledger_service import issue, record_postings
+    from app.services.wallet_shard_service import credit_karma
+
+    credit_karma(db, w, amt)
 
     tx = Transaction(
         type=TransactionType.MINT,
@@ -102,27 +432,31 @@ def mint_karma(db: Session, user_id: str, amount: float) -> dict:
         amount_karma=amt,
     )
     db.add(tx)
-    db.commit()
+    record_postings(db, issue(tx, user.id, amt), wallets=(w,))
     return {"message": f"Minted {amount} Karma to user {user_id}"}
 
 
 def stake_karma(db: Session, user_id: str, amount: float) -> dict:
     """Stake Karma from liquid balance."""
-    user = db.query(User).filter(User.telegram_user_id == int(user_id)).first()
-    if not user or not user.wallet:
+    return run_with_retries(db, lambda: _stake_once(db, user_id, amount))
+
+
+def _stake_once(db: Session, user_id: str, amount: float) -> dict:
+    from app.services.ledger_service import convert, record_postings
+
+    party = load_wallet_context(db, int(user_id), debit=(int(user_id),)).get(int(user_id))
+    if not party:
         return {"error": "User not found", "status": 404}
+    user, w = party.user, party.wallet
 
-    amt = Decimal(str(amount))
+    amt = to_milli(amount)
     if amt < MIN_AMOUNT:
         return {"error": "Minimum amount is 0.001 Karma", "status": 400}
 
-    if user.wallet.karma_balance < amt:
+    if w.karma_balance < amt:
         return {"error": "Insufficient balance", "status": 400}
 
-    user.wallet.karma_balance -= amt
-    user.wallet.karma_balance = round_karma(user.wallet.karma_balance)
-    user.wallet.staked_amount += amt
-    user.wallet.staked_amount = round_karma(user.wallet.staked_amount)
+    update_wallet(db, w, karma=-amt, staked=amt)
 
     tx = Transaction(
         type=TransactionType.STAKE_DEPOSIT,
@@ -131,7 +465,7 @@ def stake_karma(db: Session, user_id: str, amount: float) -> dict:
         amount_karma=amt,
     )
     db.add(tx)
-    db.commit()
+    record_postings(db, convert(tx, user.id, Asset.KARMA, Asset.STAKED, amt), wallets=(w,))
     return {
         "message": f"✅ {amount} Karma deposited successfully.",
         "next_unlock_ts": None,
@@ -140,21 +474,26 @@ def stake_karma(db: Session, user_id: str, amount: float) -> dict:
 
 def unstake_karma(db: Session, user_id: str, amount: float) -> dict:
     """Unstake Karma back to liquid balance."""
-    user = db.query(User).filter(User.telegram_user_id == int(user_id)).first()
-    if not user or not user.wallet:
+    return run_with_retries(db, lambda: _unstake_once(db, user_id, amount))
+
+
+def _unstake_once(db: Session, user_id: str, amount: float) -> dict:
+    from app.services.ledger_service import convert, record_postings
+
+    party = load_wallet_context(db, int(user_id), debit=(int(user_id),)).get(int(user_id))
+    if not party:
         return {"error": "User not found", "status": 404}
+    user, w = party.user, party.wallet
 
-    amt = Decimal(str(amount))
+    amt = to_milli(amount)
     if amt < MIN_AMOUNT:
         return {"error": "Minimum amount is 0.001 Karma", "status": 400}
 
-    if user.wallet.staked_amount < amt:
+    if w.staked_amount < amt:
         return {"error": "Not enough staked Karma", "status": 400}
+    remaining = w.staked_amount - amt
 
-    user.wallet.staked_amount -= amt
-    user.wallet.staked_amount = round_karma(user.wallet.staked_amount)
-    user.wallet.karma_balance += amt
-    user.wallet.karma_balance = round_karma(user.wallet.karma_balance)
+    update_wallet(db, w, karma=amt, staked=-amt)
 
     tx = Transaction(
         type=TransactionType.UNSTAKE_WITHDRAW,
@@ -164,44 +503,45 @@ def unstake_karma(db: Session, user_id: str, amount: float) -> dict:
         amount_karma=amt,
     )
     db.add(tx)
-    db.commit()
+    record_postings(db, convert(tx, user.id, Asset.STAKED, Asset.KARMA, amt), wallets=(w,))
     return {
         "message": f"Unstaked {amount} Karma successfully.",
-        "unstaked_amount": float(round_karma(amt)),
-        "remaining_staked": float(user.wallet.staked_amount),
+        "unstaked_amount": to_karma(amt),
+        "remaining_staked": to_karma(remaining),
     }
 
 
 def swap_karma_chiliz(db: Session, user_id: str, direction: str, amount: float) -> dict:
     """Swap Karma ↔ Chiliz 1:1. direction: karma_to_chiliz | chiliz_to_karma."""
-    user = db.query(User).filter(User.telegram_user_id == int(user_id)).first()
-    if not user or not user.wallet:
+    return run_with_retries(db, lambda: _swap_once(db, user_id, direction, amount))
+
+
+def _swap_once(db: Session, user_id: str, direction: str, amount: float) -> dict:
+    from app.services.ledger_service import convert, record_postings
+
+    party = load_wallet_context(db, int(user_id), debit=(int(user_id),)).get(int(user_id))
+    if not party:
         return {"error": "User not found", "status": 404}
+    user, w = party.user, party.wallet
 
-    amt = Decimal(str(amount))
+    amt = to_milli(amount)
     if amt < MIN_AMOUNT:
         return {"error": "Minimum amount is 0.001", "status": 400}
 
-    w = user.wallet
     if direction == "karma_to_chiliz":
         if w.karma_balance < amt:
             return {"error": "Insufficient Karma balance", "status": 400}
-        w.karma_balance -= amt
-        w.chiliz_balance += amt
         amount_karma = -amt
         amount_chiliz = amt
         msg = f"Swapped {amount} Karma to Chiliz."
     else:  # chiliz_to_karma
         if w.chiliz_balance < amt:
             return {"error": "Insufficient Chiliz balance", "status": 400}
-        w.chiliz_balance -= amt
-        w.karma_balance += amt
         amount_karma = amt
         amount_chiliz = -amt
         msg = f"Swapped {amount} Chiliz to Karma."
 
-    w.karma_balance = round_karma(w.karma_balance)
-    w.chiliz_balance = round_karma(w.chiliz_balance)
+    update_wallet(db, w, karma=amount_karma, chiliz=amount_chiliz)
 
     tx = Transaction(
         type=TransactionType.SWAP,
@@ -209,24 +549,64 @@ def swap_karma_chiliz(db: Session, user_id: str, direction: str, amount: float)
         to_user_id=user.id,
         amount_karma=amount_karma,
         amount_chiliz=amount_chiliz,
-        meta={"direction": direction, "amount": str(amt)},
+        meta={"direction": direction, "amount": str(to_karma(amt))},
     )
     db.add(tx)
-    db.commit()
+    if direction == "karma_to_chiliz":
+        legs = convert(tx, user.id, Asset.KARMA, Asset.CHILIZ, amt)
+    else:
+        legs = convert(tx, user.id, Asset.CHILIZ, Asset.KARMA, amt)
+    record_postings(db, legs, wallets=(w,))
     return {"message": msg}
 
 
-def get_stake_info(db: Session, user_id: str) -> dict | None:
-    """Get stake info for user."""
-    user = db.query(User).filter(User.telegram_user_id == int(user_id)).first()
-    if not user or not user.wallet:
-        return None
+def get_stake_info(db: Session, user_id: str, own: bool = False) -> dict | None:
+    """Get stake info for user (cached balances, else one projection query; see get_balances)."""
+    from app.services.user_service import get_balances
 
-    w = user.wallet
-    total_staked = float(w.staked_amount)
+    found = get_balances(db, int(user_id), own)
+    if not found:
+        return None
+    balances, _ = found
     return {
-        "total_staked": round(total_staked, DISPLAY_DECIMALS),
+        "total_staked": to_karma(balances["staked"]),
         "next_unlock_ts": None,
-        "available_to_unstake": round(total_staked, DISPLAY_DECIMALS),
-        "liquid_karma": round(float(w.karma_balance), DISPLAY_DECIMALS),
+        "available_to_unstake": to_karma(balances["staked"]),
+        "liquid_karma": to_karma(balances["karma"]),
     }
+
+
+# Async variants for AsyncSession routes. The sync logic runs via run_sync, so every
+# statement goes through the async driver and retries/conditional updates stay in one place.
+
+
+# Sender telegram id -> lock queueing this worker's concurrent sends from one wallet (a double
+# tap), which would otherwise only conflict and retry. Entries go away with their last holder.
+_sender_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+
+async def send_karma_async(db: AsyncSession, req: SendRequest) -> dict:
+    """send_karma on an AsyncSession; sends from one wallet run one at a time per worker."""
+    lock = _sender_locks.get(req.sender_id)
+    if lock is None:
+        lock = _sender_locks[req.sender_id] = asyncio.Lock()
+    async with lock:
+        return await run_with_retries_async(db, _send_once, req)
+
+
+async def stake_karma_async(db: AsyncSession, user_id: str, amount: float) -> dict:
+    """stake_karma on an AsyncSession."""
+    return await run_with_retries_async(db, _stake_once, user_id, amount)
+
+
+async def unstake_karma_async(db: AsyncSession, user_id: str, amount: float) -> dict:
+    """unstake_karma on an AsyncSession."""
+    return await run_with_retries_async(db, _unstake_once, user_id, amount)
+
+
+async def get_stake_info_async(db: AsyncSession, user_id: str, own: bool = False) -> dict | None:
+    """get_stake_info on an AsyncSession."""
+    from app.services.user_service import prefetch_balances
+
+    await prefetch_balances(int(user_id), own)
+    return await db.run_sync(get_stake_info, user_id, own)
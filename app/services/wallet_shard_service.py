@@ -0,0 +1,213 @@
+"""Sharded sub-balances for hot system and event wallets.
+
+A sharded wallet keeps part of its karma in K WalletShard rows. Writers pick a
+shard at random, so concurrent credits/debits don't queue on the wallet row.
+The wallet's karma is always the main row plus the sum of its shards; a
+background step consolidates shard balances back into the main row.
+Only system (bucket) and event wallets can be sharded; user-facing stake,
+unstake and swap never touch shards.
+"""
+import random
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models import User, Wallet, WalletShard
+from app.services.balance_cache_service import note_balance
+from app.services.wallet_service import WalletConflictError, update_wallet
+
+MAX_SHARDS = 64
+
+
+def set_wallet_shards(db: Session, telegram_user_id: int, shards: int) -> dict:
+    """Admin: shard a system/event wallet over `shards` sub-rows (0 = unshard). Commits."""
+    if shards < 0 or shards > MAX_SHARDS:
+        return {"error": f"shards must be between 0 and {MAX_SHARDS}", "status": 400}
+    row = (
+        db.query(User, Wallet)
+        .join(Wallet, Wallet.user_id == User.id)
+        .filter(User.telegram_user_id == telegram_user_id)
+        .first()
+    )
+    if not row:
+        return {"error": "User not found", "status": 404}
+    user, wallet = row
+    if not (user.is_system_wallet or user.is_event_wallet):
+        return {"error": "Only system and event wallets can be sharded", "status": 400}
+    ensure_shards(db, wallet, shards)
+    db.commit()
+    return {"message": f"Wallet {telegram_user_id} uses {shards} shards", "shards": shards}
+
+
+def ensure_shards(db: Session, wallet: Wallet, shards: int) -> None:
+    """Create missing shard rows and set shard_count. Shrinking folds shards back first (no commit)."""
+    if shards == wallet.shard_count:
+        return
+    if shards < wallet.shard_count:
+        _consolidate_wallet(db, wallet.id)
+        db.query(WalletShard).filter(
+            WalletShard.wallet_id == wallet.id, WalletShard.shard_no >= shards
+        ).delete(synchronize_session=False)
+    existing = {
+        n for (n,) in db.query(WalletShard.shard_no).filter(WalletShard.wallet_id == wallet.id).all()
+    }
+    for n in range(shards):
+        if n not in existing:
+            db.add(WalletShard(wallet_id=wallet.id, shard_no=n))
+    db.execute(
+        update(Wallet)
+        .where(Wallet.id == wallet.id)
+        .values(shard_count=shards, version=Wallet.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.flush()
+    db.expire(wallet)
+
+
+def shard_balances(db: Session, wallet_ids) -> dict[UUID, int]:
+    """Sum of shard milli-Karma per wallet (wallets without shards are omitted)."""
+    ids = list(wallet_ids)
+    if not ids:
+        return {}
+    rows = (
+        db.query(WalletShard.wallet_id, func.sum(WalletShard.karma_balance))
+        .filter(WalletShard.wallet_id.in_(ids))
+        .group_by(WalletShard.wallet_id)
+        .all()
+    )
+    return {wid: int(total or 0) for wid, total in rows}
+
+
+def total_shard_karma(db: Session) -> int:
+    """Milli-Karma held in shards across all wallets (add to sum(wallets.karma_balance))."""
+    return int(db.query(func.coalesce(func.sum(WalletShard.karma_balance), 0)).scalar() or 0)
+
+
+def available_karma(db: Session, wallet: Wallet) -> int:
+    """Spendable milli-Karma: main row, plus shards for sharded wallets."""
+    if not wallet.shard_count:
+        return wallet.karma_balance
+    return wallet.karma_balance + shard_balances(db, [wallet.id]).get(wallet.id, 0)
+
+
+def credit_karma(db: Session, wallet: Wallet, amount: int) -> None:
+    """Credit karma: a random shard for sharded wallets, else the main row (no version check)."""
+    if not wallet.shard_count:
+        update_wallet(db, wallet, karma=amount, check_version=False)
+        return
+    note_balance(db, wallet.id)
+    db.execute(
+        update(WalletShard)
+        .where(WalletShard.wallet_id == wallet.id, WalletShard.shard_no == random.randrange(wallet.shard_count))
+        .values(
+            karma_balance=WalletShard.karma_balance + amount,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def debit_karma(db: Session, wallet: Wallet, amount: int) -> None:
+    """
+    Debit karma from a sharded wallet without touching the wallet row when possible.
+    Tries one random shard; if it can't cover the amount, takes pieces from the main row
+    and shards in turn, each with a conditional UPDATE. Raises WalletConflictError if the
+    rows changed underneath (callers retry) or the total is short.
+    """
+    if not wallet.shard_count:
+        update_wallet(db, wallet, karma=-amount)
+        return
+    note_balance(db, wallet.id)
+    if _debit_shard(db, wallet.id, random.randrange(wallet.shard_count), amount):
+        return
+
+    remaining = amount
+    main = db.execute(select(Wallet.karma_balance).where(Wallet.id == wallet.id)).scalar() or 0
+    take = min(main, remaining)
+    if take > 0:
+        _debit_main(db, wallet.id, take)
+        remaining -= take
+    shards = db.execute(
+        select(WalletShard.shard_no, WalletShard.karma_balance)
+        .where(WalletShard.wallet_id == wallet.id, WalletShard.karma_balance > 0)
+    ).all()
+    random.shuffle(shards)
+    for shard_no, balance in shards:
+        if remaining <= 0:
+            break
+        take = min(balance, remaining)
+        if not _debit_shard(db, wallet.id, shard_no, take):
+            raise WalletConflictError(str(wallet.id))
+        remaining -= take
+    if remaining > 0:
+        raise WalletConflictError(str(wallet.id))
+
+
+def consolidate_shards(db: Session) -> int:
+    """Background step: fold every shard balance into its wallet's main row. Commits. Returns wallets touched."""
+    wallet_ids = [wid for (wid,) in db.query(Wallet.id).filter(Wallet.shard_count > 0).all()]
+    touched = 0
+    for wid in wallet_ids:
+        if _consolidate_wallet(db, wid):
+            touched += 1
+        db.commit()
+    return touched
+
+
+def _consolidate_wallet(db: Session, wallet_id: UUID) -> bool:
+    """Move each non-zero shard balance into the main row (no commit)."""
+    shards = db.execute(
+        select(WalletShard.shard_no, WalletShard.karma_balance)
+        .where(WalletShard.wallet_id == wallet_id, WalletShard.karma_balance != 0)
+    ).all()
+    moved = 0
+    for shard_no, balance in shards:
+        # Shard may have grown since the read; move exactly what was read
+        if _debit_shard(db, wallet_id, shard_no, balance):
+            moved += balance
+    if moved:
+        db.execute(
+            update(Wallet)
+            .where(Wallet.id == wallet_id)
+            .values(
+                karma_balance=Wallet.karma_balance + moved,
+                version=Wallet.version + 1,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+    return bool(moved)
+
+
+def _debit_shard(db: Session, wallet_id: UUID, shard_no: int, amount: int) -> bool:
+    result = db.execute(
+        update(WalletShard)
+        .where(
+            WalletShard.wallet_id == wallet_id,
+            WalletShard.shard_no == shard_no,
+            WalletShard.karma_balance >= amount,
+        )
+        .values(
+            karma_balance=WalletShard.karma_balance - amount,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _debit_main(db: Session, wallet_id: UUID, amount: int) -> None:
+    result = db.execute(
+        update(Wallet)
+        .where(Wallet.id == wallet_id, Wallet.karma_balance >= amount)
+        .values(
+            karma_balance=Wallet.karma_balance - amount,
+            version=Wallet.version + 1,
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise WalletConflictError(str(wallet_id))
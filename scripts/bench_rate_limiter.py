@@ -0,0 +1,79 @@
+"""Rate limiter microbenchmark: in-process checks per second under many threads.
+
+Usage:
+    python scripts/bench_rate_limiter.py [--threads 16] [--checks 50000] [--keys 1000] [--limit 300]
+
+Runs the same workload against the GCRA limiter (app.core.rate_limit) and against
+the previous list-of-timestamps limiter kept here as a baseline, and prints
+throughput for each. --keys 1 puts every thread on one key (worst-case contention).
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.rate_limit import InMemoryRateLimiter  # noqa: E402
+
+
+class ListWindowLimiter:
+    """Baseline: per-key list of timestamps filtered on every check, one global lock."""
+
+    def __init__(self, window_seconds: int = 60):
+        self.window = window_seconds
+        self._counts: dict[str, list[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def is_allowed(self, key: str, limit: int) -> bool:
+        now = time.time()
+        cutoff = now - self.window
+        with self._lock:
+            self._counts[key] = [t for t in self._counts[key] if t > cutoff]
+            if len(self._counts[key]) >= limit:
+                return False
+            self._counts[key].append(now)
+            return True
+
+
+def run(limiter, threads: int, checks: int, keys: int, limit: int) -> tuple[float, int]:
+    """Return (checks per second, admitted) for threads x checks calls over `keys` keys."""
+    admitted = [0] * threads
+    start_gate = threading.Barrier(threads + 1)
+
+    def worker(n: int) -> None:
+        names = [f"user:10.0.{i // 256}.{i % 256}" for i in range(keys)]
+        start_gate.wait()
+        ok = 0
+        for i in range(checks):
+            ok += limiter.is_allowed(names[(i + n) % keys], limit)
+        admitted[n] = ok
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    start_gate.wait()
+    t0 = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return threads * checks / elapsed, sum(admitted)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--checks", type=int, default=50_000, help="checks per thread")
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=300, help="requests per minute per key")
+    args = parser.parse_args()
+
+    for name, limiter in (("list+global lock", ListWindowLimiter()), ("gcra+striped", InMemoryRateLimiter())):
+        rate, admitted = run(limiter, args.threads, args.checks, args.keys, args.limit)
+        print(f"{name:>18}: {rate:>12,.0f} checks/s  admitted={admitted}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Wallet contention benchmark: concurrent send_karma against a scratch database.
+
+Usage:
+    python scripts/bench_wallet_contention.py [--users 50] [--threads 8] [--sends 200] [--hot] [--pipeline]
+    DATABASE_URL=postgresql://... python scripts/bench_wallet_contention.py
+
+--hot makes every thread send from the same wallet (worst-case contention).
+--pipeline routes sends through the group-commit transfer pipeline.
+Prints sustained tx/min, conflicts retried, 409s, and checks total supply is conserved.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+_scratch = None
+if "DATABASE_URL" not in os.environ:
+    _scratch = Path(tempfile.mkdtemp()) / "bench_wallets.db"
+    os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}"
+os.environ.setdefault("ENVIRONMENT", "bench")
+
+from sqlalchemy import func  # noqa: E402
+
+from app.db.session import SessionLocal, drop_db, init_db  # noqa: E402
+from app.models import Wallet  # noqa: E402
+from app.schemas.user import RegisterRequest  # noqa: E402
+from app.schemas.wallet import SendRequest  # noqa: E402
+from app.services import wallet_service  # noqa: E402
+from app.services.transfer_pipeline import TransferPipeline  # noqa: E402
+from app.services.user_service import register_user  # noqa: E402
+from app.services.wallet_service import mint_karma, send_karma  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sends", type=int, default=200, help="sends per thread")
+    parser.add_argument("--hot", action="store_true", help="all threads send from one wallet")
+    parser.add_argument("--pipeline", action="store_true", help="send through the group-commit pipeline")
+    args = parser.parse_args()
+
+    drop_db()
+    init_db()
+    ids = [str(10_000 + i) for i in range(args.users)]
+    db = SessionLocal()
+    for uid in ids:
+        register_user(db, RegisterRequest(user_id=uid, username=f"bench{uid}"))
+        mint_karma(db, uid, 1_000_000)
+    supply_before = db.query(func.sum(Wallet.karma_balance)).scalar()
+    db.close()
+
+    conflicts = 0
+    conflicts_lock = threading.Lock()
+    original_update = wallet_service.update_wallet
+
+    def counting_update(*a, **kw):
+        nonlocal conflicts
+        try:
+            return original_update(*a, **kw)
+        except wallet_service.WalletConflictError:
+            with conflicts_lock:
+                conflicts += 1
+            raise
+
+    wallet_service.update_wallet = counting_update
+    busy = 0
+    errors = 0
+    pipeline = TransferPipeline() if args.pipeline else None
+    if pipeline:
+        pipeline.start()
+
+    def worker(seed: int) -> None:
+        nonlocal busy, errors
+        rnd = random.Random(seed)
+        session = SessionLocal()
+        try:
+            for _ in range(args.sends):
+                sender = ids[0] if args.hot else rnd.choice(ids)
+                recipient = rnd.choice([i for i in ids if i != sender])
+                req = SendRequest(sender_id=sender, recipient_id=recipient, amount=1)
+                result = pipeline.submit(req).result() if pipeline else send_karma(session, req)
+                if result.get("status") == 409:
+                    busy += 1
+                elif "error" in result:
+                    errors += 1
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if pipeline:
+        pipeline.stop()
+
+    db = SessionLocal()
+    supply_after = db.query(func.sum(Wallet.karma_balance)).scalar()
+    db.close()
+
+    total = args.threads * args.sends
+    ok = total - busy - errors
+    print(f"database:      {os.environ['DATABASE_URL'].split('@')[-1]}")
+    print(f"sends:         {total} ({args.threads} threads, {'hot wallet' if args.hot else 'random pairs'})")
+    print(f"succeeded:     {ok}  busy(409): {busy}  other errors: {errors}")
+    print(f"conflicts:     {conflicts} retried")
+    if pipeline:
+        print(f"batches:       {pipeline.batches} ({pipeline.ops / max(pipeline.batches, 1):.1f} ops/commit)")
+    print(f"elapsed:       {elapsed:.2f}s")
+    print(f"throughput:    {ok / elapsed * 60:,.0f} tx/min")
+    print(f"supply:        {supply_before} -> {supply_after} ({'conserved' if supply_before == supply_after else 'MISMATCH'})")
+    if supply_before != supply_after:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
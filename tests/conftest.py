@@ -32,8 +32,14 @@ def anyio_backend():
 @pytest.fixture(scope="function")
 def db_session():
     """Fresh DB session for each test. Creates/drops tables."""
+    from app.services.user_service import identity_cache
+    from app.services.validator_key_service import validator_keys
+
     drop_db()
     init_db()
+    # Same telegram ids get new UUIDs in every test
+    identity_cache.clear()
+    validator_keys.reset()
     session = SessionLocal()
     try:
         yield session
@@ -85,6 +85,13 @@ class TestAdminUsers:
         assert "chiliz_balance" in u
         assert "staked" in u
 
+    def test_list_users_total_past_last_page(self, client, user_alice_with_balance, user_bob, admin_headers):
+        data = client.get("/v1/admin/users?limit=1", headers=admin_headers).json()
+        assert data["total"] == 2 and len(data["users"]) == 1
+        assert data["users"][0]["user_id"] == "1002"  # newest first
+        data = client.get("/v1/admin/users?offset=5", headers=admin_headers).json()
+        assert data["total"] == 2 and data["users"] == []
+
 
 class TestAdminUnregister:
     """POST /v1/admin/unregister"""
@@ -135,3 +142,185 @@ class TestAdminProtocolRunOnce:
         data = r.json()
         assert data["block_id"] >= 1
         assert data["processed_tx_count"] >= 1
+
+
+class TestWalletShards:
+    """POST /v1/admin/wallets/shards and sharded event-wallet payouts."""
+
+    def _event_wallet(self, client, admin_headers, shards=4):
+        ev = client.post("/v1/admin/event-wallets", headers=admin_headers, json={"name": "Giveaway"}).json()
+        r = client.post(
+            "/v1/admin/wallets/shards",
+            headers=admin_headers,
+            json={"user_id": ev["user_id"], "shards": shards},
+        )
+        assert r.status_code == 200
+        return ev["user_id"]
+
+    def _karma(self, db_session, tg_id):
+        from app.models import User
+        from app.services.wallet_shard_service import available_karma
+
+        db_session.expire_all()
+        w = db_session.query(User).filter(User.telegram_user_id == int(tg_id)).first().wallet
+        return available_karma(db_session, w), w
+
+    def test_regular_user_cannot_be_sharded(self, client, user_alice, admin_headers):
+        """Only system/event wallets can be sharded."""
+        r = client.post("/v1/admin/wallets/shards", headers=admin_headers, json={"user_id": "1001", "shards": 4})
+        assert r.status_code == 400
+
+    def test_sharded_payouts_and_consolidation(self, client, db_session, admin_headers, user_alice, user_bob):
+        """Credits land in shards, debits span shards, consolidation keeps the total."""
+        from app.models import WalletShard
+        from app.services.wallet_service import mint_karma
+        from app.services.wallet_shard_service import consolidate_shards
+
+        ev_id = self._event_wallet(client, admin_headers)
+        for _ in range(8):
+            assert "error" not in mint_karma(db_session, ev_id, 25)
+        total, wallet = self._karma(db_session, ev_id)
+        assert total == 200_000  # milli-Karma
+        assert wallet.karma_balance == 0  # everything went to shards
+
+        r = client.post(
+            "/v1/admin/send/batch",
+            headers=admin_headers,
+            json={"sender_id": ev_id, "transfers": [
+                {"recipient_id": "1001", "amount": 120},
+                {"recipient_id": "1002", "amount": 70},
+            ]},
+        )
+        assert r.json()["sent"] == 2
+        assert self._karma(db_session, ev_id)[0] == 10_000
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 120.0
+
+        assert consolidate_shards(db_session) == 1
+        total, wallet = self._karma(db_session, ev_id)
+        assert total == 10_000
+        assert wallet.karma_balance == 10_000
+        assert all(s.karma_balance == 0 for s in db_session.query(WalletShard).all())
+
+    def test_sharded_wallet_row_is_never_locked(self, client, db_session, admin_headers, user_alice, user_bob, monkeypatch):
+        """Concurrent payouts from a sharded wallet don't queue on any row lock."""
+        from sqlalchemy import event
+
+        from app.db.session import SessionLocal
+        from app.models import User
+        from app.services import wallet_service
+        from app.services.wallet_service import load_wallet_context, mint_karma
+
+        ev_id = self._event_wallet(client, admin_headers)
+        mint_karma(db_session, ev_id, 50)
+        wallet_ids = {
+            u.telegram_user_id: u.wallet.id
+            for u in db_session.query(User).filter(User.telegram_user_id.in_([int(ev_id), 1001, 1002]))
+        }
+        # Record the lock statements Postgres would run (SQLite skips them)
+        monkeypatch.setattr(wallet_service, "_row_locks_supported", lambda db: True)
+
+        locked = []
+
+        def record_locks(state):
+            stmt = state.statement
+            if state.is_select and stmt._for_update_arg is not None:
+                locked.append(stmt)
+
+        payouts = [SessionLocal(), SessionLocal()]
+        for session in payouts:
+            event.listen(session, "do_orm_execute", record_locks)
+        try:
+            # Cold worker: nothing about the event wallet is cached
+            for session, recipient in zip(payouts, (1001, 1002)):
+                parties = load_wallet_context(session, int(ev_id), recipient, debit=(int(ev_id),), lock=True)
+                assert set(parties) == {int(ev_id), recipient}
+            assert locked == []
+
+            # An unsharded sender is locked, the credited recipient is not
+            load_wallet_context(payouts[0], 1001, 1002, debit=(1001,), lock=True)
+            assert len(locked) == 1
+            assert list(locked[0].compile().params["id_1"]) == [wallet_ids[1001]]
+        finally:
+            for session in payouts:
+                session.close()
+
+    def test_stats_include_shard_balances(self, client, db_session, admin_headers):
+        """Supply totals sum shard rows."""
+        from app.services.wallet_service import mint_karma
+
+        ev_id = self._event_wallet(client, admin_headers, shards=2)
+        mint_karma(db_session, ev_id, 40)
+        assert client.get("/v1/admin/stats", headers=admin_headers).json()["total_karma_supply"] == 40.0
+        assert client.get("/v1/stats").json()["available"] == 40.0
+
+
+class TestAdminUserImport:
+    """POST /v1/admin/users/import"""
+
+    def _import(self, client, admin_headers, body: str, fmt: str = "ndjson"):
+        import json
+
+        r = client.post(f"/v1/admin/users/import?format={fmt}", headers=admin_headers, content=body.encode())
+        assert r.status_code == 200
+        return [json.loads(line) for line in r.text.splitlines()]
+
+    def test_import_requires_auth(self, client):
+        r = client.post("/v1/admin/users/import", content=b"")
+        assert r.status_code == 403
+
+    def test_ndjson_import_with_balances_and_referrals(self, client, db_session, admin_headers, monkeypatch):
+        from app.config import get_settings
+
+        monkeypatch.setattr(get_settings(), "user_import_chunk_size", 2)
+        body = "\n".join([
+            '{"user_id": 3001, "username": "carol", "karma": 12.5, "staked": 2}',
+            '{"user_id": "3002", "username": "dave", "invited_by": "3003"}',
+            'not json',
+            '{"user_id": "3003", "username": "erin", "chiliz": 1, "invited_by": "3001"}',
+            '{"user_id": "3001", "username": "carol-dup"}',
+        ])
+        reports = self._import(client, admin_headers, body)
+        final = reports[-1]
+        assert len(reports) == 3  # two chunks, then the final report
+        assert final["done"] is True
+        assert (final["processed"], final["created"], final["skipped"], final["failed"]) == (4, 3, 1, 1)
+        assert final["errors"][0]["line"] == 3
+        # dave's inviter came later in the file: linked at the end
+        assert final["referrals"] == 2 and final["referrals_unresolved"] == 0
+
+        balance = client.get("/v1/users/balance/3001").json()
+        assert (balance["balance"], balance["staked"]) == (12.5, 2.0)
+        assert client.get("/v1/referrals/status/3002").json()["invited_by"] == "3003"
+        assert client.get("/v1/admin/ledger/verify?user_id=3001", headers=admin_headers).json()["ok"] is True
+        assert client.get("/v1/users/search", params={"q": "carol"}).json()["users"][0]["username"] == "carol"
+
+    def test_import_is_idempotent(self, client, admin_headers, user_alice):
+        body = '{"user_id": "1001", "username": "alice2", "karma": 99}\n{"user_id": "3010", "username": "frank"}\n'
+        first = self._import(client, admin_headers, body)[-1]
+        assert (first["created"], first["skipped"]) == (1, 1)
+        second = self._import(client, admin_headers, body)[-1]
+        assert (second["created"], second["skipped"]) == (0, 2)
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 0.0
+
+    def test_csv_import(self, client, admin_headers):
+        body = "user_id,username,karma,invited_by\r\n3020,gina,5,\r\n3021,\"hal, jr\",,3020\r\n3022,,1,\r\n"
+        final = self._import(client, admin_headers, body, fmt="csv")[-1]
+        assert (final["created"], final["failed"], final["referrals"]) == (2, 1, 1)
+        assert client.get("/v1/users/balance/3020").json()["balance"] == 5.0
+        assert client.get("/v1/referrals/status/3021").json()["invited_by"] == "3020"
+
+
+class TestAdminMetrics:
+    """GET /v1/admin/metrics"""
+
+    def test_requires_admin(self, client):
+        assert client.get("/v1/admin/metrics").status_code == 403
+
+    def test_reports_jwt_cache(self, client, admin_headers):
+        data = client.get("/v1/admin/metrics", headers=admin_headers).json()
+        assert set(data["jwt_cache"]) == {"size", "hits", "misses", "hit_rate"}
+
+    def test_reports_rate_limiter_gauges(self, client, admin_headers):
+        data = client.get("/v1/admin/metrics", headers=admin_headers).json()
+        assert data["rate_limit"]["backend"] == "memory"
+        assert {"keys", "capacity", "evictions", "approx_bytes"} <= set(data["rate_limit"])
@@ -0,0 +1,92 @@
+"""Postings ledger tests: double-entry lines written next to each transaction."""
+import pytest
+from sqlalchemy import func
+
+
+@pytest.fixture
+def validator_headers():
+    """Headers for validator-authenticated requests."""
+    return {"Authorization": "Bearer validator-key-1"}
+
+
+def _activity(client):
+    """Alice (500 minted) sends, stakes, unstakes, swaps; Bob refers Alice."""
+    client.post("/v1/referrals", json={"inviter_id": "1002", "new_user_id": "1001"})
+    client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 50})
+    client.post("/v1/stake", json={"user_id": "1001", "amount": 100})
+    client.post("/v1/unstake", json={"user_id": "1001", "amount": 40})
+    client.post("/v1/wallets/swap", json={"user_id": "1001", "direction": "karma_to_chiliz", "amount": 10.5})
+
+
+class TestPostings:
+    """Every transaction writes postings that sum to zero."""
+
+    def test_transactions_balance_to_zero(self, client, db_session, user_alice_with_balance, user_bob):
+        from app.models import Posting, Transaction
+
+        _activity(client)
+        unbalanced = (
+            db_session.query(Posting.tx_id)
+            .group_by(Posting.tx_id)
+            .having(func.sum(Posting.amount) != 0)
+            .all()
+        )
+        assert unbalanced == []
+        posted = {tx_id for (tx_id,) in db_session.query(Posting.tx_id).distinct()}
+        assert posted == {tx_id for (tx_id,) in db_session.query(Transaction.id)}
+
+    def test_running_balances(self, client, db_session, user_alice_with_balance, user_bob):
+        from app.models import Asset, Posting, User
+
+        _activity(client)
+        alice = db_session.query(User).filter(User.telegram_user_id == 1001).one()
+        karma = [
+            b for (b,) in db_session.query(Posting.balance)
+            .filter(Posting.account_id == alice.id, Posting.asset == Asset.KARMA)
+            .order_by(Posting.seq)
+        ]
+        # mint, send, stake, unstake, swap
+        assert karma == [500_000, 450_000, 350_000, 390_000, 379_500]
+
+    def test_verify_endpoint(self, client, admin_headers, user_alice_with_balance, user_bob):
+        _activity(client)
+        for user_id in ("1001", "1002"):
+            r = client.get(f"/v1/admin/ledger/verify?user_id={user_id}", headers=admin_headers)
+            assert r.status_code == 200
+            data = r.json()
+            assert data["ok"] is True, data
+        assert data["assets"]["karma"]["wallet"] == 51.0  # Bob: 1 invite bonus + 50 received
+
+    def test_verify_unknown_user(self, client, admin_headers):
+        r = client.get("/v1/admin/ledger/verify?user_id=424242", headers=admin_headers)
+        assert r.status_code == 404
+
+    def test_restore_starts_from_opening_balances(self, client, admin_headers, user_alice_with_balance, user_bob):
+        _activity(client)
+        backup = client.get("/v1/admin/backup", headers=admin_headers).json()
+        assert client.post("/v1/admin/restore", headers=admin_headers, json=backup).status_code == 200
+        r = client.get("/v1/admin/ledger/verify?user_id=1001", headers=admin_headers)
+        assert r.json()["ok"] is True
+
+
+class TestValidatorPostings:
+    """GET /v1/validator/postings"""
+
+    def test_requires_auth(self, client):
+        r = client.get("/v1/validator/postings")
+        assert r.status_code in (401, 503)
+
+    def test_stream_pages_in_seq_order(self, client, user_alice_with_balance, user_bob, validator_headers):
+        client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 5})
+        r = client.get("/v1/validator/postings?limit=3", headers=validator_headers)
+        assert r.status_code == 200
+        first = r.json()
+        assert len(first["postings"]) == 3
+        assert first["postings"][0]["account_id"] == "1001"  # mint credit
+        assert first["postings"][1]["account_id"] is None  # its issuance leg
+        r = client.get(f"/v1/validator/postings?after_seq={first['next_after_seq']}", headers=validator_headers)
+        rest = r.json()
+        assert rest["next_after_seq"] is None
+        seqs = [p["seq"] for p in first["postings"] + rest["postings"]]
+        assert seqs == sorted(seqs) and len(seqs) == 4
+        assert rest["postings"][-1] == {**rest["postings"][-1], "account_id": "1002", "amount": 5.0, "balance": 5.0}
@@ -54,3 +54,258 @@ class TestTransactionHistory:
         """Non-numeric user_id returns 422."""
         r = client.get("/v1/transactions?user_id=abc")
         assert r.status_code == 422
+
+
+class TestTransactionCursor:
+    """Keyset pagination via cursor / next_cursor."""
+
+    def test_cursor_walks_history_without_gaps(self, client, user_alice_with_balance, user_bob):
+        """Following next_cursor visits every row once, in order; total only on page 1."""
+        for _ in range(6):
+            client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 1})
+        first = client.get("/v1/transactions?user_id=1001&limit=3").json()
+        assert first["total"] == 7
+        seen = [t["id"] for t in first["transactions"]]
+        cursor = first["next_cursor"]
+        while cursor:
+            page = client.get(f"/v1/transactions?user_id=1001&limit=3&cursor={cursor}").json()
+            assert page["total"] is None
+            seen += [t["id"] for t in page["transactions"]]
+            cursor = page["next_cursor"]
+        assert len(seen) == len(set(seen)) == 7
+        full = client.get("/v1/transactions?user_id=1001&limit=10").json()
+        assert [t["id"] for t in full["transactions"]] == seen
+        assert full["next_cursor"] is None
+
+    def test_ascending_cursor(self, client, user_alice_with_balance, user_bob):
+        """sort=asc pages forward from the oldest row."""
+        for _ in range(3):
+            client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 1})
+        page1 = client.get("/v1/transactions?user_id=1001&limit=2&sort=asc").json()
+        assert page1["transactions"][0]["type"] == "mint"
+        page2 = client.get(f"/v1/transactions?user_id=1001&limit=2&sort=asc&cursor={page1['next_cursor']}").json()
+        assert len(page2["transactions"]) == 2
+        assert page2["next_cursor"] is None
+
+    def test_total_can_be_skipped(self, client, user_alice_with_balance):
+        """include_total=false omits the count."""
+        r = client.get("/v1/transactions?user_id=1001&include_total=false")
+        assert r.json()["total"] is None
+        assert len(r.json()["transactions"]) == 1
+
+    def test_invalid_cursor(self, client, user_alice):
+        """Malformed cursor returns 400."""
+        r = client.get("/v1/transactions?user_id=1001&cursor=not-a-cursor")
+        assert r.status_code == 400
+
+
+class TestHistoryQueryPlan:
+    """UNION ALL history query: one index range scan per party column."""
+
+    def test_branches_use_covering_party_indexes(self, db_session):
+        """Each branch searches its (party, created_at, id) index, keyset included."""
+        import uuid
+        from datetime import datetime
+        from sqlalchemy import event
+        from app.db.session import engine
+        from app.services.transaction_service import _user_transaction_ids
+
+        if engine.dialect.name != "sqlite":
+            pytest.skip("EXPLAIN QUERY PLAN is SQLite-specific")
+
+        def explain(conn, cursor, statement, params, context, executemany):
+            return "EXPLAIN QUERY PLAN " + statement, params
+
+        stmt = _user_transaction_ids(db_session, uuid.uuid4(), 51, "desc", (datetime.utcnow(), uuid.uuid4()))
+        event.listen(engine, "before_cursor_execute", explain, retval=True)
+        try:
+            plan = " ".join(row[3] for row in db_session.execute(stmt).cursor.fetchall())
+        finally:
+            event.remove(engine, "before_cursor_execute", explain)
+        for name in ("actor", "from", "to"):
+            assert f"USING COVERING INDEX ix_transactions_{name}_created" in plan
+        assert "SCAN transactions" not in plan
+
+
+class TestHistoryIdentityResolution:
+    """Telegram ids for a history page come from one batched lookup plus the shared cache."""
+
+    def _user_queries(self, client, path):
+        from sqlalchemy import event
+        from app.db.session import async_engine
+
+        engine = async_engine.sync_engine  # the history route runs on the async engine
+        statements = []
+
+        def record(conn, cursor, statement, params, context, executemany):
+            if "FROM users" in statement:
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            r = client.get(path)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert r.status_code == 200
+        return r.json(), statements
+
+    def test_page_resolves_ids_in_one_query_then_from_cache(self, client, user_alice_with_balance, user_bob, admin_headers):
+        from app.services.user_service import identity_cache, telegram_id_cache
+
+        for _ in range(3):
+            client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 1})
+        identity_cache.clear()
+        telegram_id_cache.clear()
+
+        data, statements = self._user_queries(client, "/v1/transactions?user_id=1001")
+        parties = {tx[k] for tx in data["transactions"] for k in ("from_user_id", "to_user_id") if tx.get(k)}
+        assert {"1001", "1002"} <= parties
+        # Owner lookup + one IN query for every party on the page
+        assert len(statements) == 2
+
+        # Owner identity and every party now come from the caches
+        _, statements = self._user_queries(client, "/v1/transactions?user_id=1001")
+        assert statements == []
+        assert telegram_id_cache.hits >= 2
+
+
+class TestArchivedHistory:
+    """Transactions moved to transactions_archive stay visible where a range needs them."""
+
+    @pytest.fixture
+    def archived_mint(self, client, db_session, user_alice_with_balance, user_bob, monkeypatch):
+        """Alice's mint backdated 90 days and archived; her send to Bob stays live."""
+        from datetime import datetime, timedelta
+        from app.config import get_settings
+        from app.models import Transaction, TransactionType
+        from app.services.archive_service import archive_transactions
+
+        client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 5})
+        db_session.query(Transaction).filter(Transaction.type == TransactionType.MINT).update(
+            {Transaction.created_at: datetime.utcnow() - timedelta(days=90)}
+        )
+        db_session.commit()
+        monkeypatch.setattr(get_settings(), "transaction_archive_after_months", 1)
+        result = archive_transactions(db_session)
+        assert result["archived"] == 1
+
+    def test_history_spans_live_and_archive(self, client, archived_mint):
+        data = client.get("/v1/transactions?user_id=1001").json()
+        assert data["total"] == 2
+        assert [tx["type"] for tx in data["transactions"]] == ["send", "mint"]
+
+        data = client.get("/v1/transactions?user_id=1001&sort=asc").json()
+        assert [tx["type"] for tx in data["transactions"]] == ["mint", "send"]
+
+    def test_cursor_crosses_into_archive(self, client, archived_mint):
+        first = client.get("/v1/transactions?user_id=1001&limit=1").json()
+        assert first["transactions"][0]["type"] == "send"
+        second = client.get(f"/v1/transactions?user_id=1001&limit=1&cursor={first['next_cursor']}").json()
+        assert second["transactions"][0]["type"] == "mint"
+        assert second["next_cursor"] is None
+
+    def test_unregister_nulls_archived_parties(self, client, db_session, admin_headers, archived_mint):
+        """Unregister drops the user's UUID from live and archived history and from the id cache."""
+        from datetime import datetime, timedelta
+        from app.config import get_settings
+        from app.models import Transaction
+        from app.services.archive_service import archive_transactions
+        from app.services.user_service import get_identity, telegram_id_cache
+
+        db_session.query(Transaction).update({Transaction.created_at: datetime.utcnow() - timedelta(days=90)})
+        db_session.commit()
+        assert archive_transactions(db_session)["archived"] == 1
+        client.post("/v1/wallets/send", json={"sender_id": "1002", "recipient_id": "1001", "amount": 1})
+        alice_id = get_identity(db_session, 1001).user_id
+        history = client.get("/v1/transactions?user_id=1002").json()["transactions"]
+        assert {(tx["from_user_id"], tx["to_user_id"]) for tx in history} == {("1002", "1001"), ("1001", "1002")}
+        assert alice_id in telegram_id_cache
+
+        r = client.post("/v1/admin/unregister", headers=admin_headers, json={"user_id": "1001"})
+        assert r.status_code == 200
+        assert alice_id not in telegram_id_cache
+        history = client.get("/v1/transactions?user_id=1002").json()["transactions"]
+        assert {(tx["from_user_id"], tx["to_user_id"]) for tx in history} == {("1002", None), (None, "1002")}
+
+    def test_windows_only_read_archive_when_reached(self, db_session, archived_mint):
+        from datetime import datetime, timedelta
+        from app.models import Transaction
+        from app.services.archive_service import transaction_source
+
+        assert transaction_source(db_session, datetime.utcnow() - timedelta(days=30)) is Transaction.__table__
+        assert transaction_source(db_session) is not Transaction.__table__
+
+    def test_stats_and_ledger_include_archived(self, client, admin_headers, archived_mint):
+        assert client.get("/v1/stats").json()["minted"] == 500.0
+        r = client.get("/v1/admin/ledger/verify?user_id=1001", headers=admin_headers)
+        assert r.json()["ok"] is True
+
+
+    def test_archive_job_runs_off_the_event_loop(self, monkeypatch):
+        """The scheduled archival pass runs in a worker thread, not on the loop serving requests."""
+        import asyncio
+        import threading
+        from app import scheduler
+        from app.config import get_settings
+
+        ran_on = []
+        monkeypatch.setattr(get_settings(), "transaction_archive_interval_seconds", 3600)
+        monkeypatch.setattr(scheduler, "ensure_partitions", lambda db: 0)
+        monkeypatch.setattr(scheduler, "archive_transactions", lambda db: ran_on.append(threading.current_thread()))
+
+        async def run_once():
+            task = asyncio.create_task(scheduler._run_transaction_archive_loop())
+            while not ran_on:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run_once())
+        assert ran_on[0] is not threading.main_thread()
+
+
+class TestTransactionExport:
+    """GET /v1/transactions/export streams the whole history in keyset batches."""
+
+    @pytest.fixture
+    def history(self, client, user_alice_with_balance, user_bob, monkeypatch):
+        from app.config import get_settings
+
+        for amount in (1, 2, 3):
+            client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": amount})
+        # Several batches for four rows
+        monkeypatch.setattr(get_settings(), "transaction_export_batch_size", 3)
+
+    def test_csv_export(self, client, history):
+        import csv
+        import io
+
+        r = client.get("/v1/transactions/export?user_id=1001&format=csv")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/csv")
+        assert 'filename="transactions_1001.csv"' in r.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(r.text)))
+        assert [row["type"] for row in rows] == ["send", "send", "send", "mint"]
+        assert [row["amount_karma"] for row in rows[:3]] == ["3.0", "2.0", "1.0"]
+        assert rows[0]["from_user_id"] == "1001" and rows[0]["to_user_id"] == "1002"
+        assert len({row["id"] for row in rows}) == 4
+
+    def test_ndjson_export_matches_history(self, client, history):
+        import json
+
+        r = client.get("/v1/transactions/export?user_id=1001&format=ndjson&sort=asc")
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        exported = [json.loads(line) for line in r.text.splitlines()]
+        page = client.get("/v1/transactions?user_id=1001&sort=asc").json()["transactions"]
+        assert [tx["id"] for tx in exported] == [tx["id"] for tx in page]
+        assert exported[0]["type"] == "mint"
+
+    def test_export_unknown_user(self, client):
+        r = client.get("/v1/transactions/export?user_id=999999")
+        assert r.status_code == 404
+
+    def test_export_invalid_format(self, client, user_alice):
+        r = client.get("/v1/transactions/export?user_id=1001&format=xml")
+        assert r.status_code == 422
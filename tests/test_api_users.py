@@ -27,6 +27,61 @@ class TestRegister:
         r2 = client.get("/v1/users/balance/1001")
         assert r2.status_code == 200
 
+    def test_register_is_one_upsert_without_reads(self, client, db_session, user_alice):
+        """Re-registering runs the user upsert and wallet insert only (no SELECT, no refresh)."""
+        from sqlalchemy import event
+        from app.db.session import engine
+        from app.models import User
+
+        statements = []
+
+        def capture(conn, cursor, statement, params, context, executemany):
+            statements.append(statement.lstrip().split()[0].upper())
+
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            r = client.post("/v1/users/register", json={"user_id": "1001", "username": "alice_renamed"})
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        assert r.json()["status"] == "exists"
+        assert statements == ["INSERT", "INSERT"]
+        db_session.expire_all()
+        user = db_session.query(User).filter(User.telegram_user_id == 1001).one()
+        assert user.username == "alice_renamed" and user.wallet is not None
+
+    def test_register_burst_from_separate_sessions(self, db_session):
+        """Repeated registrations of one id (app-open bursts) never raise duplicate-key errors."""
+        from app.db.session import SessionLocal
+        from app.models import User, Wallet
+        from app.schemas.user import RegisterRequest
+        from app.services.user_service import register_user
+
+        results = []
+        for _ in range(3):
+            session = SessionLocal()
+            try:
+                results.append(register_user(session, RegisterRequest(user_id="9100", username="burst")))
+            finally:
+                session.close()
+        assert [r.created for r in results] == [True, False, False]
+        assert len({r.user_id for r in results}) == 1
+        assert db_session.query(User).filter(User.telegram_user_id == 9100).count() == 1
+        assert db_session.query(Wallet).filter(Wallet.user_id == results[0].user_id).count() == 1
+
+    def test_register_adds_missing_wallet(self, client, db_session, user_alice):
+        """A user left without a wallet gets one on re-register (and its cached identity is dropped)."""
+        from app.models import User, Wallet
+        from app.services.user_service import get_identity
+
+        user = db_session.query(User).filter(User.telegram_user_id == 1001).one()
+        db_session.query(Wallet).filter(Wallet.user_id == user.id).delete()
+        db_session.commit()
+        assert get_identity(db_session, 1001, refresh=True).wallet_id is None
+        r = client.post("/v1/users/register", json={"user_id": "1001", "username": "alice"})
+        assert r.json()["status"] == "exists"
+        assert get_identity(db_session, 1001).wallet_id is not None
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 0.0
+
     def test_register_rejects_non_numeric_user_id(self, client):
         """user_id must be numeric (Pydantic validation)."""
         r = client.post("/v1/users/register", json={"user_id": "abc", "username": "test"})
@@ -95,3 +150,228 @@ class TestSelfUnregister:
     def test_self_unregister_user_not_found(self, client):
         r = client.post("/v1/users/unregister", json={"user_id": "99999"})
         assert r.status_code == 404
+
+
+class TestUserSearch:
+    """GET /v1/users/search: indexed username search for recipient autocomplete."""
+
+    @pytest.fixture
+    def users(self, client, user_alice):
+        for tg_id, name in [("2001", "malice"), ("2002", "alicia"), ("2003", "bob_ali"), ("2004", "charlie")]:
+            client.post("/v1/users/register", json={"user_id": tg_id, "username": name})
+
+    def _names(self, client, q):
+        r = client.get("/v1/users/search", params={"q": q})
+        assert r.status_code == 200
+        return [u["username"] for u in r.json()["users"]]
+
+    def test_prefix_matches_rank_first(self, client, users):
+        assert self._names(client, "ali") == ["alice", "alicia", "malice", "bob_ali"]
+
+    def test_short_query_and_case(self, client, users):
+        assert self._names(client, "AL")[:2] == ["alice", "alicia"]
+        assert "charlie" in self._names(client, "rli")
+
+    def test_rename_updates_index(self, client, users):
+        client.post("/v1/users/register", json={"user_id": "2004", "username": "charles"})
+        assert self._names(client, "charlie") == []
+        assert self._names(client, "charles") == ["charles"]
+
+    def test_idempotent_register_leaves_index_untouched(self, client, users, db_session):
+        from sqlalchemy import text
+        from app.db.session import engine
+
+        if engine.dialect.name != "sqlite":
+            pytest.skip("FTS5 shadow tables are SQLite-specific")
+
+        def segments():
+            return db_session.execute(text("SELECT count(*) FROM users_fts_data")).scalar()
+
+        before = segments()
+        client.post("/v1/users/register", json={"user_id": "2002", "username": "alicia"})
+        assert segments() == before
+        client.post("/v1/users/register", json={"user_id": "2002", "username": "alicja"})
+        assert segments() > before
+
+    def test_unregistered_user_leaves_index(self, client, users, admin_headers):
+        client.post("/v1/users/unregister", json={"user_id": "2002"})
+        assert "alicia" not in self._names(client, "ali")
+
+    def test_like_wildcards_are_literal(self, client, users):
+        assert self._names(client, "b_a") == ["bob_ali"]
+        assert self._names(client, "%%") == []
+
+    def test_sqlite_search_uses_fts_index(self, db_session):
+        from app.db.session import engine
+        from app.services.user_service import _username_search
+
+        if engine.dialect.name != "sqlite":
+            pytest.skip("EXPLAIN QUERY PLAN is SQLite-specific")
+
+        stmt = _username_search(db_session, "alice", 10, None)
+        sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[3] for row in db_session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + sql))
+        assert "SCAN users_fts VIRTUAL TABLE INDEX" in plan
+        assert "SEARCH users USING INDEX" in plan
+
+
+class TestIdentityCache:
+    """Telegram id -> (user, wallet, flags) resolution through the identity cache."""
+
+    def test_cold_balance_read_is_one_query(self, client, user_alice):
+        """Without cached balances, balance is one users/wallets projection SELECT."""
+        from sqlalchemy import event
+        from app.db.session import async_engine
+        from app.services.balance_cache_service import balance_cache
+        from app.services.user_service import identity_cache
+
+        identity_cache.clear()
+        balance_cache.clear()
+        statements = []
+
+        def record(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+
+        engine = async_engine.sync_engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            r = client.get("/v1/users/balance/1001")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert r.status_code == 200
+        assert len(statements) == 1
+        assert "FROM users JOIN wallets" in statements[0]
+        assert 1001 in identity_cache.local
+
+    def test_unregister_invalidates(self, client, user_alice):
+        from app.services.user_service import identity_cache
+
+        client.get("/v1/users/balance/1001")
+        assert 1001 in identity_cache.local
+        client.post("/v1/users/unregister", json={"user_id": "1001"})
+        assert 1001 not in identity_cache.local
+        assert client.get("/v1/users/balance/1001").status_code == 404
+
+    def test_stale_entry_is_refreshed(self, client, db_session, user_alice):
+        """An entry left behind by another worker's unregister resolves to the new account."""
+        from app.services.user_service import identity_cache
+
+        client.get("/v1/users/balance/1001")
+        stale = identity_cache.get(1001)
+        client.post("/v1/users/unregister", json={"user_id": "1001"})
+        client.post("/v1/users/register", json={"user_id": "1001", "username": "alice"})
+        identity_cache.put(1001, stale)
+
+        r = client.get("/v1/users/balance/1001")
+        assert r.status_code == 200
+        assert identity_cache.get(1001) != stale
+
+
+class TestBalanceCache:
+    """Balance reads served from the write-through balance cache."""
+
+    def _statements(self, client, path):
+        from sqlalchemy import event
+        from app.db.session import async_engine
+
+        statements = []
+
+        def record(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+
+        engine = async_engine.sync_engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            r = client.get(path)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert r.status_code == 200
+        return r.json(), statements
+
+    def test_warm_reads_skip_the_database(self, client, user_alice_with_balance):
+        client.get("/v1/users/balance/1001")
+        data, statements = self._statements(client, "/v1/users/balance/1001")
+        assert data["balance"] == 500.0
+        assert statements == []
+        data, statements = self._statements(client, "/v1/stake/info/1001")
+        assert data["liquid_karma"] == 500.0
+        assert statements == []
+
+    def test_mutations_write_through_on_commit(self, client, user_alice_with_balance, user_bob):
+        client.get("/v1/users/balance/1001")
+        client.get("/v1/users/balance/1002")
+        client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 5})
+        client.post("/v1/stake", json={"user_id": "1001", "amount": 20})
+
+        data, statements = self._statements(client, "/v1/users/balance/1001")
+        assert (data["balance"], data["staked"]) == (475.0, 20.0)
+        assert statements == []
+        assert client.get("/v1/users/balance/1002").json()["balance"] == 5.0
+
+    def test_failed_mutation_leaves_cache(self, client, user_alice_with_balance):
+        from app.services.balance_cache_service import balance_cache
+        from app.services.user_service import identity_cache
+
+        client.get("/v1/users/balance/1001")
+        wallet_id = identity_cache.get(1001).wallet_id
+        before = balance_cache.get(wallet_id)
+        r = client.post("/v1/stake", json={"user_id": "1001", "amount": 1000})
+        assert r.status_code == 400
+        assert balance_cache.get(wallet_id) == before
+
+    def test_batch_credits_invalidate(self, client, user_alice_with_balance, user_bob):
+        from app.services.balance_cache_service import get_cached_balance
+        from app.services.user_service import identity_cache
+
+        client.get("/v1/users/balance/1002")
+        bob_wallet = identity_cache.get(1002).wallet_id
+        assert get_cached_balance(bob_wallet) is not None
+        r = client.post("/v1/wallets/send/batch", json={
+            "sender_id": "1001", "transfers": [{"recipient_id": "1002", "amount": 7}],
+        })
+        assert r.status_code == 200
+        assert get_cached_balance(bob_wallet) is None
+        assert client.get("/v1/users/balance/1002").json()["balance"] == 7.0
+
+    def test_read_started_before_a_commit_cannot_overwrite_it(self, client, user_alice_with_balance, user_bob):
+        """A fill carrying an older version loses to the write-through snapshot; tombstones block fills."""
+        from app.services.balance_cache_service import fill_balance, get_cached_balance
+        from app.services.user_service import identity_cache
+
+        client.get("/v1/users/balance/1001")
+        alice_wallet = identity_cache.get(1001).wallet_id
+        stale = dict(get_cached_balance(alice_wallet))
+        client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 5})
+        fill_balance(alice_wallet, stale)
+        cached = get_cached_balance(alice_wallet, own=True)
+        assert cached["version"] == stale["version"] + 1
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 495.0
+
+        client.get("/v1/users/balance/1002")
+        bob_wallet = identity_cache.get(1002).wallet_id
+        stale = dict(get_cached_balance(bob_wallet))
+        client.post("/v1/wallets/send/batch", json={
+            "sender_id": "1001", "transfers": [{"recipient_id": "1002", "amount": 7}],
+        })
+        fill_balance(bob_wallet, stale)
+        assert get_cached_balance(bob_wallet) is None
+        assert client.get("/v1/users/balance/1002").json()["balance"] == 12.0
+
+
+class TestProfileProjection:
+    """get_profile: user and wallet from one projection query."""
+
+    def test_profile(self, db_session, user_alice_with_balance):
+        from app.services.user_service import get_profile
+
+        data = get_profile(db_session, 1001)
+        assert data["username"] == "alice"
+        assert data["balance"] == 500.0 and data["staked"] == 0.0
+        assert get_profile(db_session, 999999) is None
+
+    def test_account_row_is_slotted(self, db_session, user_alice):
+        from app.services.user_service import load_account
+
+        account = load_account(db_session, 1001)
+        assert not hasattr(account, "__dict__")
+        assert account.telegram_user_id == 1001 and account.karma == 0
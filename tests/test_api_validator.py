@@ -129,3 +129,82 @@ class TestValidator503WhenNotConfigured:
             r = client.get("/v1/validator/snapshot", headers={"Authorization": "Bearer any-key"})
         assert r.status_code == 503
         assert "not configured" in r.json()["detail"].lower()
+
+
+class TestValidatorKeyCache:
+    """DB validator keys are checked against an in-memory set kept current on create/revoke."""
+
+    def _create_key(self, client, admin_headers):
+        r = client.post("/v1/admin/validator-keys", json={"name": "node-1"}, headers=admin_headers)
+        assert r.status_code == 200
+        return r.json()
+
+    def test_key_check_is_one_version_query(self, client, db_session, admin_headers):
+        """Accepting a DB key costs one aggregate query; rejecting an unknown key none."""
+        from fastapi import HTTPException
+        from sqlalchemy import event
+        from app.core.dependencies import require_validator
+        from app.db.session import engine
+
+        key = self._create_key(client, admin_headers)["key"]
+        statements = []
+
+        def capture(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            require_validator(f"Bearer {key}")
+            assert len(statements) == 1 and "count" in statements[0].lower()
+            statements.clear()
+            with pytest.raises(HTTPException) as exc:
+                require_validator("Bearer vk_unknown")
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        assert exc.value.status_code == 401
+        assert statements == []
+
+    def test_revocation_on_another_worker_applies_immediately(self, client, db_session, admin_headers, monkeypatch):
+        """A key revoked by a peer (no Redis, before any poll) fails on this worker's next check."""
+        from fastapi import HTTPException
+        from app.core.dependencies import require_validator
+        from app.models.validator_key import hash_key
+        from app.services import validator_key_service
+        from app.services.validator_key_service import revoke_validator_key, validator_keys
+
+        created = self._create_key(client, admin_headers)
+        require_validator(f"Bearer {created['key']}")
+        # The peer's commit: revoke without touching this worker's registry
+        with monkeypatch.context() as m:
+            m.setattr(validator_key_service, "validator_keys", validator_key_service.ValidatorKeyRegistry())
+            assert "error" not in revoke_validator_key(db_session, created["id"])
+        assert hash_key(created["key"]) in validator_keys.active_hashes()
+        with pytest.raises(HTTPException) as exc:
+            require_validator(f"Bearer {created['key']}")
+        assert exc.value.status_code == 401
+
+    def test_new_key_works_and_revoked_key_fails_immediately(self, client, db_session, admin_headers):
+        """The acting worker sees a create or revoke on the very next request."""
+        created = self._create_key(client, admin_headers)
+        headers = {"Authorization": f"Bearer {created['key']}"}
+        assert client.get("/v1/validator/leaderboard", headers=headers).status_code == 200
+
+        r = client.post("/v1/admin/validator-keys/revoke", json={"key_id": created["id"]}, headers=admin_headers)
+        assert r.status_code == 200
+        r = client.get("/v1/validator/leaderboard", headers=headers)
+        assert r.status_code == 401
+        assert r.json()["detail"]["code"] == "INVALID_VALIDATOR_KEY"
+
+    def test_other_worker_picks_up_revocation_on_refresh(self, client, db_session, admin_headers):
+        """A peer registry reloads when the key-set version moves and not otherwise."""
+        from app.models.validator_key import hash_key
+        from app.services.validator_key_service import ValidatorKeyRegistry, revoke_validator_key
+
+        created = self._create_key(client, admin_headers)
+        peer = ValidatorKeyRegistry()
+        assert hash_key(created["key"]) in peer.active_hashes()
+        assert peer.refresh() is False
+
+        assert "error" not in revoke_validator_key(db_session, created["id"])
+        assert peer.refresh() is True
+        assert hash_key(created["key"]) not in peer.active_hashes()
@@ -56,3 +56,356 @@ class TestSend:
             },
         )
         assert r.status_code == 200
+
+
+class TestOptimisticConcurrency:
+    """Conditional wallet UPDATEs (version column) and bounded retries."""
+
+    def test_send_bumps_wallet_version(self, client, db_session, user_alice_with_balance, user_bob):
+        """Every balance update increments wallets.version."""
+        from app.models import User
+
+        alice = db_session.query(User).filter(User.telegram_user_id == 1001).first()
+        before = alice.wallet.version
+        client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 5})
+        db_session.expire_all()
+        assert alice.wallet.version == before + 1
+
+    def test_stale_version_conflicts(self, db_session, user_alice_with_balance):
+        """UPDATE with a stale version matches no row and raises WalletConflictError."""
+        from app.models import User
+        from app.services.wallet_service import WalletConflictError, update_wallet
+
+        wallet = db_session.query(User).filter(User.telegram_user_id == 1001).first().wallet
+        update_wallet(db_session, wallet, karma=-1000)
+        db_session.commit()
+        stale = type("StaleWallet", (), {"id": wallet.id, "version": wallet.version - 1})()
+        with pytest.raises(WalletConflictError):
+            update_wallet(db_session, stale, karma=-1000)
+        db_session.rollback()
+
+    def test_debit_guarded_by_balance(self, db_session, user_alice_with_balance):
+        """Debit larger than the balance matches no row even with the right version."""
+        from app.models import User
+        from app.services.wallet_service import WalletConflictError, update_wallet
+
+        wallet = db_session.query(User).filter(User.telegram_user_id == 1001).first().wallet
+        with pytest.raises(WalletConflictError):
+            update_wallet(db_session, wallet, karma=-501_000)
+        db_session.rollback()
+
+    def test_emission_payouts_are_delta_updates(self, client, db_session, admin_headers, user_alice_with_balance, user_bob):
+        """Stake and usage rewards are applied as in-place increments that bump the version."""
+        from app.models import User
+
+        client.post("/v1/stake", json={"user_id": "1001", "amount": 100})
+        client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 50})
+        alice, bob = (
+            db_session.query(User).filter(User.telegram_user_id == tg).first().wallet for tg in (1001, 1002)
+        )
+        before = {w.id: (w.version, w.karma_balance, w.rewards_earned) for w in (alice, bob)}
+        r = client.post("/v1/admin/protocol/run-once", headers=admin_headers)
+        assert r.status_code == 200
+        assert r.json()["stakers_distributed"] > 0 and r.json()["eligible_distributed"] > 0
+        db_session.expire_all()
+        for w in (alice, bob):
+            version, karma, rewards = before[w.id]
+            assert w.version == version + 1
+            assert w.karma_balance - karma == w.rewards_earned - rewards > 0
+        for tg in (1001, 1002):
+            assert client.get(f"/v1/admin/ledger/verify?user_id={tg}", headers=admin_headers).json()["ok"] is True
+
+    def test_persistent_conflict_returns_busy(self, db_session):
+        """Retries are bounded; exhausting them yields 409."""
+        from app.services.wallet_service import WalletConflictError, run_with_retries
+
+        attempts = []
+
+        def always_conflict():
+            attempts.append(1)
+            raise WalletConflictError("w")
+
+        result = run_with_retries(db_session, always_conflict)
+        assert result["status"] == 409
+        assert len(attempts) == 5
+
+    def test_retries_back_off_with_jitter(self, db_session, monkeypatch):
+        """Conflicts wait a jittered, doubling delay before each retry (none after the last)."""
+        from app.services import wallet_service
+        from app.services.wallet_service import WalletConflictError, run_with_retries
+
+        delays = []
+        monkeypatch.setattr(wallet_service.time, "sleep", delays.append)
+
+        def conflict():
+            raise WalletConflictError("w")
+
+        run_with_retries(db_session, conflict)
+        assert len(delays) == 4
+        assert all(0 <= d <= 0.005 * 2 ** n for n, d in enumerate(delays))
+
+
+class TestBatchSend:
+    """POST /v1/wallets/send/batch and /v1/admin/send/batch"""
+
+    def test_batch_send_with_partial_failures(self, client, user_alice_with_balance, user_bob):
+        """Valid entries are applied in one transaction; invalid ones are reported."""
+        client.post("/v1/users/register", json={"user_id": "1003", "username": "carol"})
+        r = client.post(
+            "/v1/wallets/send/batch",
+            json={
+                "sender_id": "1001",
+                "transfers": [
+                    {"recipient_id": "1002", "amount": 100, "note": "prize"},
+                    {"recipient_id": "99999", "amount": 5},
+                    {"recipient_id": "1003", "amount": 50},
+                    {"recipient_id": "1002", "amount": 1000},
+                ],
+            },
+        )
+        assert r.status_code == 200
+        data = r.json()
+        assert data["sent"] == 2
+        assert data["total_amount"] == 150.0
+        assert [f["index"] for f in data["failed"]] == [1, 3]
+        assert "insufficient" in data["failed"][1]["error"].lower()
+
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 350.0
+        assert client.get("/v1/users/balance/1002").json()["balance"] == 100.0
+        assert client.get("/v1/users/balance/1003").json()["balance"] == 50.0
+        history = client.get("/v1/transactions?user_id=1002").json()
+        assert history["transactions"][0]["meta"] == {"note": "prize"}
+
+    def test_batch_send_referral_bonus(self, client, user_alice_with_balance, user_bob):
+        """First transfer to an invitee pays the inviter the referral bonus once."""
+        client.post("/v1/referrals", json={"inviter_id": "1001", "new_user_id": "1002"})
+        r = client.post(
+            "/v1/wallets/send/batch",
+            json={"sender_id": "1001", "transfers": [
+                {"recipient_id": "1002", "amount": 10},
+                {"recipient_id": "1002", "amount": 10},
+            ]},
+        )
+        assert r.json()["sent"] == 2
+        # 500 + 1 (invite) - 20 + 3 (bonus)
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 484.0
+        assert client.get("/v1/referrals/status/1002").json()["rewarded"] is True
+
+    def test_batch_amount_bounds_match_send(self, client, user_alice_with_balance, user_bob):
+        """Entries take the same minimum as a single send: 0.001 passes, less is a 422."""
+        def batch(amount):
+            return client.post(
+                "/v1/wallets/send/batch",
+                json={"sender_id": "1001", "transfers": [{"recipient_id": "1002", "amount": amount}]},
+            )
+
+        assert batch(0.0001).status_code == 422
+        assert batch(0).status_code == 422
+        r = batch(0.001)
+        assert r.status_code == 200 and r.json()["sent"] == 1
+
+    def test_batch_send_sender_not_found(self, client):
+        """Unknown sender returns 404."""
+        r = client.post(
+            "/v1/wallets/send/batch",
+            json={"sender_id": "4242", "transfers": [{"recipient_id": "1002", "amount": 1}]},
+        )
+        assert r.status_code == 404
+
+    def test_admin_batch_from_event_wallet(self, client, db_session, admin_headers, user_alice, user_bob):
+        """Admin airdrop from an event wallet (negative ID)."""
+        from app.services.wallet_service import mint_karma
+
+        ev = client.post("/v1/admin/event-wallets", headers=admin_headers, json={"name": "Launch"}).json()
+        mint_karma(db_session, ev["user_id"], 100)
+        r = client.post(
+            "/v1/admin/send/batch",
+            headers=admin_headers,
+            json={"sender_id": ev["user_id"], "transfers": [
+                {"recipient_id": "1001", "amount": 30},
+                {"recipient_id": "1002", "amount": 30},
+            ]},
+        )
+        assert r.status_code == 200
+        assert r.json()["sent"] == 2
+        assert client.get("/v1/users/balance/1001").json()["balance"] == 30.0
+        assert client.get("/v1/users/balance/1002").json()["balance"] == 30.0
+
+
+class TestWalletContextLoader:
+    """load_wallet_context: users, wallets and referral in one SELECT."""
+
+    def test_send_uses_single_select(self, db_session, user_alice_with_balance, user_bob):
+        """send_karma reads all of its context in one round trip."""
+        from sqlalchemy import event
+        from app.db.session import engine
+        from app.schemas.wallet import SendRequest
+        from app.services.wallet_service import send_karma
+
+        statements = []
+
+        def capture(conn, cursor, statement, params, context, executemany):
+            statements.append(statement.lstrip().split()[0].upper())
+
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            result = send_karma(db_session, SendRequest(sender_id="1001", recipient_id="1002", amount=5))
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        assert "error" not in result
+        assert statements.count("SELECT") == 1
+
+    def test_loader_returns_referral(self, client, db_session, user_alice, user_bob):
+        """Invitee referral is loaded alongside the wallet."""
+        from app.services.wallet_service import load_wallet_context
+
+        client.post("/v1/referrals", json={"inviter_id": "1001", "new_user_id": "1002"})
+        parties = load_wallet_context(db_session, 1001, 1002)
+        assert parties[1001].referral is None
+        assert parties[1002].referral.inviter_user_id == parties[1001].user.id
+        assert parties[1002].wallet.user_id == parties[1002].user.id
+
+
+class TestTransferPipeline:
+    """Group-commit pipeline: sends applied in micro-batches, one commit per batch."""
+
+    def test_concurrent_sends_share_commits(self, db_session, user_alice_with_balance, user_bob):
+        """Queued sends resolve after commit; fewer commits than ops, balances exact."""
+        from app.schemas.wallet import SendRequest
+        from app.services.transfer_pipeline import TransferPipeline
+
+        pipeline = TransferPipeline(max_batch=50, max_wait_ms=50)
+        pipeline.start()
+        try:
+            futures = [
+                pipeline.submit(SendRequest(sender_id="1001", recipient_id="1002", amount=10))
+                for _ in range(20)
+            ]
+            results = [f.result(timeout=10) for f in futures]
+        finally:
+            pipeline.stop()
+        assert all("error" not in r for r in results)
+        assert pipeline.ops == 20
+        assert pipeline.batches < 20
+        db_session.expire_all()
+        from app.services.user_service import get_wallet_balance
+
+        assert get_wallet_balance(db_session, 1001)["balance"] == 300.0
+        assert get_wallet_balance(db_session, 1002)["balance"] == 200.0
+
+    def test_balance_checks_see_earlier_ops_in_batch(self, db_session, user_alice_with_balance, user_bob):
+        """Ops apply in order: once the batch drains the sender, later sends fail."""
+        from app.schemas.wallet import SendRequest
+        from app.services.transfer_pipeline import TransferPipeline
+
+        pipeline = TransferPipeline(max_batch=10, max_wait_ms=50)
+        pipeline.start()
+        try:
+            futures = [
+                pipeline.submit(SendRequest(sender_id="1001", recipient_id="1002", amount=200))
+                for _ in range(3)
+            ]
+            results = [f.result(timeout=10) for f in futures]
+        finally:
+            pipeline.stop()
+        assert "error" not in results[0] and "error" not in results[1]
+        assert results[2]["error"] == "Insufficient Karma balance"
+
+    def test_cancelled_and_failed_batches_keep_committer_alive(self, db_session, user_alice_with_balance, user_bob):
+        """A cancelled caller's send is dropped; a failing batch fails its futures, not the thread."""
+        from app.db.session import SessionLocal
+        from app.schemas.wallet import SendRequest
+        from app.services.transfer_pipeline import TransferPipeline
+
+        calls = []
+
+        def flaky_session():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("database unavailable")
+            return SessionLocal()
+
+        req = SendRequest(sender_id="1001", recipient_id="1002", amount=10)
+        pipeline = TransferPipeline(session_factory=flaky_session, max_batch=1, max_wait_ms=0)
+        cancelled = pipeline.submit(req)
+        assert cancelled.cancel()
+        failed = pipeline.submit(req)
+        pipeline.start()
+        try:
+            with pytest.raises(RuntimeError):
+                failed.result(timeout=10)
+            assert "error" not in pipeline.submit(req).result(timeout=10)
+        finally:
+            pipeline.stop()
+        assert pipeline.ops == 1
+
+    def test_conflicting_sender_fails_only_its_own_sends(self, db_session, user_alice_with_balance, user_bob, monkeypatch):
+        """A batch that keeps conflicting falls back to single sends; only the hot sender gets 409."""
+        from app.schemas.wallet import SendRequest
+        from app.services import transfer_pipeline, wallet_service
+        from app.services.wallet_service import WalletConflictError
+
+        real_send_once = wallet_service._send_once
+
+        def send_once(db, req):
+            if req.sender_id == "1002":
+                raise WalletConflictError()
+            return real_send_once(db, req)
+
+        monkeypatch.setattr(transfer_pipeline, "_send_once", send_once)
+        monkeypatch.setattr(wallet_service, "_send_once", send_once)
+        monkeypatch.setattr(wallet_service, "retry_delay", lambda n: 0)
+        monkeypatch.setattr(transfer_pipeline, "retry_delay", lambda n: 0)
+
+        pipeline = transfer_pipeline.TransferPipeline(max_batch=10, max_wait_ms=50)
+        futures = [
+            pipeline.submit(SendRequest(sender_id="1001", recipient_id="1002", amount=10)),
+            pipeline.submit(SendRequest(sender_id="1002", recipient_id="1001", amount=1)),
+            pipeline.submit(SendRequest(sender_id="1001", recipient_id="1002", amount=10)),
+        ]
+        pipeline.start()
+        try:
+            results = [f.result(timeout=10) for f in futures]
+        finally:
+            pipeline.stop()
+        assert "error" not in results[0] and "error" not in results[2]
+        assert results[1]["status"] == 409
+        db_session.expire_all()
+        from app.services.user_service import get_wallet_balance
+
+        assert get_wallet_balance(db_session, 1002)["balance"] == 20.0
+
+    def test_send_route_uses_pipeline(self, client, user_alice_with_balance, user_bob, monkeypatch):
+        """POST /send goes through the running pipeline when enabled."""
+        from app.services import transfer_pipeline
+
+        pipeline = transfer_pipeline.TransferPipeline()
+        pipeline.start()
+        monkeypatch.setattr(transfer_pipeline, "_pipeline", pipeline)
+        try:
+            r = client.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 5})
+        finally:
+            pipeline.stop()
+        assert r.status_code == 200
+        assert pipeline.ops == 1
+        assert client.get("/v1/users/balance/1002").json()["balance"] == 5.0
+
+
+class TestAsyncRoutes:
+    """Hot routes run on the event loop with an AsyncSession."""
+
+    async def test_concurrent_sends_on_event_loop(self, db_session, user_alice_with_balance, user_bob):
+        """Concurrent async sends all apply and conserve balances."""
+        import asyncio
+        from httpx import ASGITransport, AsyncClient
+        from app.main import app
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            responses = await asyncio.gather(*(
+                ac.post("/v1/wallets/send", json={"sender_id": "1001", "recipient_id": "1002", "amount": 10})
+                for _ in range(10)
+            ))
+            assert all(r.status_code == 200 for r in responses)
+            alice = (await ac.get("/v1/users/balance/1001")).json()["balance"]
+            bob = (await ac.get("/v1/users/balance/1002")).json()["balance"]
+        assert (alice, bob) == (400.0, 100.0)
@@ -74,3 +74,57 @@ class TestJWT:
     def test_decode_invalid_returns_none(self):
         """Invalid JWT returns None."""
         assert decode_jwt("invalid", "secret", "HS256") is None
+
+
+class TestJWTCache:
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, monkeypatch):
+        from app.core import auth
+
+        monkeypatch.setattr(auth, "jwt_cache", auth.LRUCache(100))
+        decodes = []
+        real_decode = auth.decode_jwt
+
+        def counting_decode(*args):
+            decodes.append(1)
+            return real_decode(*args)
+
+        monkeypatch.setattr(auth, "decode_jwt", counting_decode)
+        return decodes
+
+    def test_token_is_decoded_once(self, fresh_cache):
+        from app.core.auth import jwt_cache_stats, verify_jwt
+
+        token = create_jwt("1001", "alice", "secret", "HS256", 60)
+        for _ in range(5):
+            assert verify_jwt(token, "secret", "HS256")["sub"] == "1001"
+        assert len(fresh_cache) == 1
+        assert jwt_cache_stats() == {"size": 1, "hits": 4, "misses": 1, "hit_rate": 0.8}
+
+    def test_rotated_secret_does_not_reuse_entries(self, fresh_cache):
+        from app.core.auth import verify_jwt
+
+        token = create_jwt("1001", "alice", "old-secret", "HS256", 60)
+        assert verify_jwt(token, "old-secret", "HS256") is not None
+        assert verify_jwt(token, "new-secret", "HS256") is None
+        assert verify_jwt(token, "new-secret", "HS256") is None  # failures are not cached
+        assert len(fresh_cache) == 3
+
+    def test_entries_end_at_token_exp(self, fresh_cache, monkeypatch):
+        import time
+        from app.core import auth
+
+        token = create_jwt("1001", "alice", "secret", "HS256", 1)
+        assert auth.verify_jwt(token, "secret", "HS256") is not None
+        now = time.time()
+        monkeypatch.setattr(auth.time, "time", lambda: now + 120)
+        monkeypatch.setattr(auth, "decode_jwt", lambda *a: None)  # jose would reject the expired token
+        assert auth.verify_jwt(token, "secret", "HS256") is None
+        assert len(auth.jwt_cache) == 0
+
+    def test_cached_payload_is_a_copy(self, fresh_cache):
+        from app.core.auth import verify_jwt
+
+        token = create_jwt("1001", "alice", "secret", "HS256", 60)
+        verify_jwt(token, "secret", "HS256")["sub"] = "9999"
+        assert verify_jwt(token, "secret", "HS256")["sub"] == "1001"
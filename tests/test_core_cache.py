@@ -0,0 +1,186 @@
+"""Unit tests for the in-process caches."""
+from app.core.cache import LRUCache
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1  # "b" is now least recently used
+        cache.put("c", 3)
+        assert "b" not in cache
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_get_many_splits_hits_and_misses(self):
+        cache = LRUCache(10)
+        cache.put_many({"a": 1, "b": 2})
+        found, missing = cache.get_many(["a", "b", "x"])
+        assert found == {"a": 1, "b": 2}
+        assert missing == ["x"]
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_zero_size_disables_caching(self):
+        cache = LRUCache(0)
+        cache.put("a", 1)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_ttl_expires_entries(self, monkeypatch):
+        import app.core.cache as cache_module
+
+        now = [100.0]
+        monkeypatch.setattr(cache_module, "monotonic", lambda: now[0])
+        cache = LRUCache(10, ttl=5)
+        cache.put("a", 1)
+        now[0] += 4
+        assert cache.get("a") == 1
+        now[0] += 2
+        assert cache.get("a") is None
+        assert "a" not in cache and len(cache) == 0
+
+    def test_put_if_compares_with_the_live_entry(self):
+        cache = LRUCache(10)
+        assert cache.put_if("a", 2, lambda current: current < 2)  # absent
+        assert not cache.put_if("a", 1, lambda current: current < 1)
+        assert cache.get("a") == 2
+        assert cache.put_if("a", 3, lambda current: current < 3)
+        assert cache.get("a") == 3
+
+    def test_delete(self):
+        cache = LRUCache(10)
+        cache.put_many({"a": 1, "b": 2})
+        cache.delete("a", "missing")
+        assert "a" not in cache and cache.get("b") == 2
+
+
+class TestTieredCache:
+    def test_local_only_without_redis(self):
+        from app.core.cache import TieredCache
+
+        cache = TieredCache(LRUCache(10), redis_url=None, prefix="t:")
+        cache.put(1, "one")
+        assert cache.get(1) == "one"
+        cache.delete(1)
+        assert cache.get(1, "default") == "default"
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the redis client calls TieredCache makes; records calling threads."""
+
+    def __init__(self):
+        import threading
+
+        self.data = {}
+        self.threads = set()
+        self.release = threading.Event()
+        self.release.set()
+
+    def _call(self):
+        import threading
+
+        self.threads.add(threading.current_thread().name)
+        self.release.wait(5)
+
+    def get(self, name):
+        self._call()
+        return self.data.get(name)
+
+    def mget(self, names):
+        self._call()
+        return [self.data.get(n) for n in names]
+
+    def set(self, name, value, ex=None):
+        self._call()
+        self.data[name] = value
+
+    def delete(self, *names):
+        self._call()
+        for n in names:
+            self.data.pop(n, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, name):
+        pass
+
+    def unwatch(self):
+        pass
+
+    def get(self, name):
+        return self.redis.get(name)
+
+    def multi(self):
+        pass
+
+    def set(self, name, value, ex=None):
+        self.ops.append((name, value))
+
+    def execute(self):
+        for name, value in self.ops:
+            self.redis.set(name, value)
+
+
+class TestTieredCacheRedisTier:
+    def _cache(self):
+        from app.core.cache import TieredCache
+
+        cache = TieredCache(LRUCache(10), redis_url=None, prefix="t:")
+        cache._redis = FakeRedis()
+        return cache
+
+    def test_writes_reach_redis_from_the_writer_thread(self):
+        cache = self._cache()
+        cache.put(1, "one")
+        cache.put_if(2, {"version": 2}, lambda cur: cur["version"] < 2)
+        cache.delete(1)
+        assert cache.local.get(2) == {"version": 2}  # local tier updated inline
+        cache.flush()
+        assert cache._redis.data == {"t:2": '{"version": 2}'}
+        assert cache._redis.threads == {"t:redis-writer"}
+
+    def test_queued_write_is_read_locally(self):
+        cache = self._cache()
+        cache._redis.data["t:1"] = '"old"'
+        cache._redis.release.clear()  # hold the writer
+        cache.put(1, "new")
+        assert cache.get(1, shared_first=True) == "new"
+        cache._redis.release.set()
+        cache.flush()
+        assert cache._redis.data["t:1"] == '"new"'
+        assert cache.get(1, shared_first=True) == "new"
+
+    def test_redis_put_if_keeps_a_newer_shared_entry(self):
+        cache = self._cache()
+        cache._redis.data["t:1"] = '{"version": 5}'
+        cache.put_if(1, {"version": 3}, lambda cur: cur["version"] < 3)
+        cache.flush()
+        assert cache._redis.data["t:1"] == '{"version": 5}'
+
+    def test_event_loop_reads_stay_local_until_prefetched(self):
+        import asyncio
+
+        cache = self._cache()
+        cache._redis.data["t:1"] = '"shared"'
+
+        async def read():
+            before = cache.get(1, "miss")
+            await cache.prefetch([1])
+            return before, cache.get(1, "miss")
+
+        assert asyncio.run(read()) == ("miss", "shared")
+        assert "MainThread" not in cache._redis.threads
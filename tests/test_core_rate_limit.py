@@ -0,0 +1,188 @@
+"""Unit tests for the in-process rate limiter."""
+import threading
+
+import pytest
+
+import app.core.rate_limit as rate_limit_module
+from app.core.rate_limit import HybridRateLimiter, InMemoryRateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit_module, "monotonic", lambda: now[0])
+    return now
+
+
+class TestInMemoryRateLimiter:
+    def test_allows_limit_then_rejects(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60)
+        assert [limiter.is_allowed("user:1.2.3.4", 7) for _ in range(8)] == [True] * 7 + [False]
+        assert limiter.remaining("user:1.2.3.4", 7) == 0
+
+    def test_refills_evenly_over_the_window(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60)
+        for _ in range(6):
+            assert limiter.is_allowed("k", 6)
+        assert not limiter.is_allowed("k", 6)
+        clock[0] += 10  # one emission interval
+        assert limiter.remaining("k", 6) == 1
+        assert limiter.is_allowed("k", 6)
+        assert not limiter.is_allowed("k", 6)
+        clock[0] += 60
+        assert limiter.remaining("k", 6) == 6
+
+    def test_keys_are_independent(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60, stripes=1)
+        assert limiter.is_allowed("a", 1)
+        assert not limiter.is_allowed("a", 1)
+        assert limiter.is_allowed("b", 1)
+
+    def test_state_is_one_float_per_key(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60, stripes=4)
+        for _ in range(500):
+            limiter.is_allowed("hot", 1000)
+        assert sum(len(s.tat) for s in limiter._stripes) == 1
+
+    def test_concurrent_checks_admit_exactly_the_limit(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60)
+        allowed = []
+
+        def worker():
+            allowed.append(sum(limiter.is_allowed("shared", 100) for _ in range(200)))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sum(allowed) == 100
+
+    def test_full_stripe_drops_least_recently_checked_key(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60, stripes=1, max_keys=2)
+        limiter.is_allowed("a", 10)
+        limiter.is_allowed("b", 10)
+        limiter.is_allowed("a", 10)  # "b" is now least recently checked
+        limiter.is_allowed("c", 10)
+        assert list(limiter._stripes[0].tat) == ["a", "c"]
+        assert limiter.stats()["evictions"] == 1
+
+    def test_sweep_drops_only_refilled_keys(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60)
+        limiter.is_allowed("quiet", 60)  # refilled after 1s
+        for _ in range(30):
+            limiter.is_allowed("busy", 60)  # refilled after 30s
+        clock[0] += 5
+        assert limiter.sweep() == 1
+        stats = limiter.stats()
+        assert (stats["keys"], stats["expired"]) == (1, 1)
+        assert limiter.remaining("busy", 60) == 35
+        clock[0] += 30
+        assert limiter.sweep() == 1
+        assert limiter.stats()["keys"] == 0
+
+    def test_memory_stays_bounded_under_key_churn(self, clock):
+        limiter = InMemoryRateLimiter(window_seconds=60, stripes=8, max_keys=1000)
+        for i in range(20_000):
+            limiter.is_allowed(f"user:10.{i // 65536}.{i // 256 % 256}.{i % 256}", 60)
+        stats = limiter.stats()
+        assert stats["keys"] <= stats["capacity"] == 1000
+        assert stats["evictions"] >= 19_000
+
+
+class FakeCluster:
+    """Stands in for Redis: the same GCRA step as the Lua script, on a shared dict."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.tat: dict[str, float] = {}
+        self.down = False
+        self.pushes = 0
+
+    def push(self, limiter, batch):
+        if self.down:
+            raise ConnectionError("redis down")
+        self.pushes += 1
+        now = self.clock[0]
+        backlogs = []
+        for key, admitted, interval in batch:
+            tat = min(max(self.tat.get(key, now), now) + admitted * interval, now + limiter.window)
+            self.tat[key] = tat
+            backlogs.append(tat - now)
+        return backlogs
+
+
+class TestHybridRateLimiter:
+    @pytest.fixture
+    def cluster(self, clock):
+        return FakeCluster(clock)
+
+    def _worker(self, cluster, monkeypatch, **kw):
+        limiter = HybridRateLimiter("redis://127.0.0.1:1/0", window_seconds=60, **kw)
+        monkeypatch.setattr(limiter, "_push", lambda batch: cluster.push(limiter, batch))
+        return limiter
+
+    def test_admits_without_a_round_trip(self, cluster, monkeypatch):
+        worker = self._worker(cluster, monkeypatch)
+        assert all(worker.is_allowed("user:1.2.3.4", 10) for _ in range(5))
+        assert cluster.pushes == 0
+        assert worker.sync() == 1
+        assert cluster.pushes == 1
+        assert cluster.tat["user:1.2.3.4"] == pytest.approx(1000.0 + 30)
+
+    def test_workers_converge_on_the_cluster_limit(self, cluster, monkeypatch):
+        a = self._worker(cluster, monkeypatch)
+        b = self._worker(cluster, monkeypatch)
+        assert all(a.is_allowed("k", 10) for _ in range(6))
+        a.sync()
+        assert all(b.is_allowed("k", 10) for _ in range(6))
+        b.sync()
+        assert not b.is_allowed("k", 10)
+        # a learns the cluster backlog with its next batch
+        assert a.is_allowed("k", 10)
+        a.sync()
+        assert not a.is_allowed("k", 10)
+        assert a.remaining("k", 10) == b.remaining("k", 10) == 0
+
+    def test_backlog_of_a_batch_in_flight_is_kept(self, cluster, monkeypatch):
+        worker = self._worker(cluster, monkeypatch)
+        cluster.tat["k"] = 1000.0 + 30  # other workers used 5 of 10
+        worker.is_allowed("k", 10)
+
+        def push_with_concurrent_admit(batch):
+            worker.is_allowed("k", 10)  # lands while the batch is on the wire
+            return cluster.push(worker, batch)
+
+        monkeypatch.setattr(worker, "_push", push_with_concurrent_admit)
+        worker.sync()
+        # cluster: 5 others + 1 synced; plus the 1 still unsent
+        assert worker.remaining("k", 10) == 3
+
+    def test_hot_key_wakes_the_sync_thread(self, cluster, monkeypatch):
+        worker = self._worker(cluster, monkeypatch, sync_tokens=3)
+        worker.is_allowed("k", 100)
+        worker.is_allowed("k", 100)
+        assert not worker._wake.is_set()
+        worker.is_allowed("k", 100)
+        assert worker._wake.is_set()
+
+    def test_falls_back_to_local_limits_when_redis_is_down(self, cluster, monkeypatch):
+        worker = self._worker(cluster, monkeypatch)
+        cluster.down = True
+        assert all(worker.is_allowed("k", 3) for _ in range(3))
+        assert worker.sync() == 0
+        assert worker.stats()["redis_connected"] is False
+        assert not worker.is_allowed("k", 3)  # the local limit still holds
+
+        cluster.down = False
+        worker.is_allowed("other", 3)
+        assert worker.sync() == 1
+        assert worker.stats()["redis_connected"] is True
+        assert "k" not in cluster.tat  # counts from the outage were dropped, not replayed
+
+    def test_unreachable_redis_does_not_fail_requests(self, clock):
+        worker = HybridRateLimiter("redis://127.0.0.1:1/0", window_seconds=60)
+        assert worker.is_allowed("k", 5)
+        assert worker.sync() == 0
+        assert worker.redis_connected is False
+        assert worker.is_allowed("k", 5)
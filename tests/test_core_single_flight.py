@@ -0,0 +1,147 @@
+"""Unit tests for single-flight request coalescing."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.single_flight import SingleFlight, request_key, single_flight
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_computation(self):
+        """Identical concurrent calls run fn once and all get its result."""
+        group = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return {"value": 42}
+
+        results = []
+
+        def caller():
+            results.append(group.do(("k",), compute))
+
+        threads = [threading.Thread(target=caller) for _ in range(8)]
+        threads[0].start()
+        started.wait(1)
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(calls) == 1
+        assert results == [{"value": 42}] * 8
+        assert group.in_flight() == 0
+
+    def test_result_not_cached_after_completion(self):
+        """Sequential calls recompute (no stale data beyond one computation)."""
+        group = SingleFlight()
+        counter = iter(range(10))
+        assert group.do(("k",), lambda: next(counter)) == 0
+        assert group.do(("k",), lambda: next(counter)) == 1
+
+    def test_error_propagates_to_leader(self):
+        """Leader exception is raised and the key is released."""
+        group = SingleFlight()
+
+        def boom():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            group.do(("k",), boom)
+        assert group.in_flight() == 0
+
+
+class TestAsyncSingleFlight:
+    async def test_follower_takes_over_when_leader_is_cancelled(self):
+        """A cancelled leader does not fail followers; one of them recomputes for the rest."""
+        from app.core.single_flight import AsyncSingleFlight
+
+        group = AsyncSingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        leader = asyncio.create_task(group.do(("k",), compute))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(group.do(("k",), compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await asyncio.gather(*followers) == [2, 2, 2]
+        assert leader.cancelled()
+        assert len(calls) == 2
+        assert group.in_flight() == 0
+
+    async def test_cancelled_follower_does_not_cancel_leader(self):
+        """Cancelling one follower leaves the shared computation running."""
+        from app.core.single_flight import AsyncSingleFlight
+
+        group = AsyncSingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        leader = asyncio.create_task(group.do(("k",), compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(group.do(("k",), compute))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        assert await leader == "ok"
+        assert follower.cancelled()
+
+
+class TestRequestKey:
+    def test_normalizes_param_order_and_skips_objects(self):
+        """Key ignores param order and non-plain values (e.g. DB sessions)."""
+        a = request_key("/x", {"limit": "10", "sort_by": "total", "db": object()})
+        b = request_key("/x", {"sort_by": "total", "limit": "10"})
+        assert a == b
+
+    def test_key_params_restricts_key(self):
+        """key_params selects which params form the key."""
+        a = request_key("/x", {"limit": "10", "trace": "1"}, key_params=["limit"])
+        b = request_key("/x", {"limit": "10", "trace": "2"}, key_params=["limit"])
+        assert a == b
+
+
+class TestDecorator:
+    def test_disabled_route_calls_through(self):
+        """enabled=False bypasses coalescing."""
+        calls = []
+
+        @single_flight("/x", enabled=False)
+        def endpoint(limit: str = "10"):
+            calls.append(limit)
+            return limit
+
+        assert endpoint(limit="5") == "5"
+        assert calls == ["5"]
+
+    async def test_async_endpoint_coalesces(self):
+        """Coroutine endpoints share one in-flight await."""
+        calls = []
+
+        @single_flight("/y")
+        async def endpoint(limit: str = "10"):
+            calls.append(limit)
+            await asyncio.sleep(0.05)
+            return {"limit": limit}
+
+        results = await asyncio.gather(*(endpoint(limit="10") for _ in range(5)))
+        assert len(calls) == 1
+        assert all(r == {"limit": "10"} for r in results)
+
+
+def test_stats_route_still_served(client):
+    """Decorated /v1/stats keeps its response shape."""
+    r = client.get("/v1/stats")
+    assert r.status_code == 200
+    assert r.json()["network_status"] == "operational"
@@ -53,3 +53,35 @@ def test_get_db_context(db_session):
         user = get_user_by_telegram_id(db, 1001)
         # May be None if no user - that's ok
         assert db is not None
+
+
+@pytest.mark.parametrize(
+    "url,expected",
+    [
+        ("sqlite:///./karma.db", "sqlite+aiosqlite:///./karma.db"),
+        ("postgresql://u:p@db/karma", "postgresql+asyncpg://u:p@db/karma"),
+        ("postgresql+psycopg2://u:p@db/karma", "postgresql+asyncpg://u:p@db/karma"),
+    ],
+)
+def test_async_database_url(url, expected):
+    """async_database_url swaps in the async driver."""
+    from app.config import Settings
+
+    assert Settings(database_url=url).async_database_url == expected
+
+
+async def test_get_async_db(db_session):
+    """get_async_db yields an AsyncSession on the same database."""
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.db.session import get_async_db
+    from app.models import User
+    from app.schemas.user import RegisterRequest
+    from app.services.user_service import register_user
+
+    register_user(db_session, RegisterRequest(user_id="1001", username="alice"))
+    db_session.commit()
+    async for db in get_async_db():
+        assert isinstance(db, AsyncSession)
+        user = (await db.execute(select(User).where(User.telegram_user_id == 1001))).scalar_one()
+        assert user.username == "alice"